@@ -0,0 +1,95 @@
+"""
+Benchmark: adaptive concurrency limit under upstream overload.
+
+A local mock upstream serves at most --capacity concurrent calls; calls beyond that get
+an immediate 429, and time-to-first-token grows with the number of active calls.
+--clients callers hammer it through one limiter pool (retrying 429s after a short
+pause), first with a static limit and then with the adaptive one. Prints the limit,
+goodput and 429 rate per second; the adaptive limit should settle near the capacity
+with few 429s, while the static limit keeps overloading the upstream.
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_adaptive_limiter.py --capacity 8 --clients 200 --seconds 10
+"""
+import argparse
+import asyncio
+import time
+
+from orchestrallm.shared.concurrency import AdaptiveLimiter
+
+
+class MockUpstream:
+    def __init__(self, capacity: int, base_latency_s: float):
+        self.capacity = capacity
+        self.base_latency_s = base_latency_s
+        self.active = 0
+        self.ok = 0
+        self.throttled = 0
+
+    async def call(self, permit) -> int:
+        if self.active >= self.capacity:
+            self.throttled += 1
+            await asyncio.sleep(0.002)
+            return 429
+        self.active += 1
+        try:
+            await asyncio.sleep(self.base_latency_s * (1 + self.active / self.capacity))
+            permit.first_token()
+            await asyncio.sleep(self.base_latency_s)  # rest of the stream
+            self.ok += 1
+            return 200
+        finally:
+            self.active -= 1
+
+
+async def _run(limiter: AdaptiveLimiter, upstream: MockUpstream, clients: int, seconds: float) -> None:
+    stop = time.monotonic() + seconds
+
+    async def client():
+        while time.monotonic() < stop:
+            async with limiter.slot() as permit:
+                status = await upstream.call(permit)
+                if status == 429:
+                    permit.throttled()
+            if status == 429:
+                await asyncio.sleep(0.05)
+
+    tasks = [asyncio.create_task(client()) for _ in range(clients)]
+    print(f"{'t s':>4} | {'limit':>5} | {'in flight':>9} | {'ok/s':>6} | {'429/s':>6} | {'wait ms':>8}")
+    last_ok, last_thr = 0, 0
+    for sec in range(1, int(seconds) + 1):
+        await asyncio.sleep(1.0)
+        s = limiter.stats()
+        print(
+            f"{sec:>4} | {s['limit']:>5} | {s['in_flight']:>9} | {upstream.ok - last_ok:>6} | "
+            f"{upstream.throttled - last_thr:>6} | {s['wait_ms_avg']:>8.0f}"
+        )
+        last_ok, last_thr = upstream.ok, upstream.throttled
+    await asyncio.gather(*tasks)
+    total = upstream.ok + upstream.throttled
+    print(f"total ok {upstream.ok} | 429s {upstream.throttled} ({upstream.throttled / max(1, total):.0%} of calls)\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive limiter convergence under overload")
+    parser.add_argument("--capacity", type=int, default=8, help="Concurrent calls the mock upstream accepts")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--static-limit", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"static limit {args.static_limit}")
+    asyncio.run(_run(
+        AdaptiveLimiter("static", initial=args.static_limit, max_limit=args.static_limit, adaptive=False),
+        MockUpstream(args.capacity, args.latency_ms / 1000.0), args.clients, args.seconds,
+    ))
+    print(f"adaptive (starting at {args.static_limit})")
+    asyncio.run(_run(
+        AdaptiveLimiter("adaptive", initial=args.static_limit),
+        MockUpstream(args.capacity, args.latency_ms / 1000.0), args.clients, args.seconds,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cross-worker event bus check and latency benchmark.
+
+Starts two worker processes with EVENT_BUS_BACKEND=mongo against the given MongoDB:
+the subscriber process subscribes to a task, the publisher process publishes events for
+it, and the subscriber reports how many arrived and the publish->receive latency.
+Exits non-zero if any event is missing.
+
+Requires a reachable MongoDB, e.g. the compose service:
+  docker compose up -d mongo   (and expose 27017) or any local mongod
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_cross_worker_bus.py --mongo-uri mongodb://127.0.0.1:27017
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import sys
+import time
+import uuid
+
+
+def _configure(mongo_uri: str, db_name: str) -> None:
+    os.environ["EVENT_BUS_BACKEND"] = "mongo"
+    os.environ["MONGO_URI"] = mongo_uri
+    os.environ["MONGO_DB"] = db_name
+
+
+def _subscriber(mongo_uri: str, db_name: str, task_id: str, n_events: int, ready, results) -> None:
+    _configure(mongo_uri, db_name)
+    from orchestrallm.shared.eventbus.events import EVENT_BUS
+
+    async def run():
+        q = await EVENT_BUS.subscribe(task_id)
+        # Give the relay reader time to open its tailable cursor.
+        await asyncio.sleep(1.0)
+        ready.set()
+        latencies = []
+        try:
+            while len(latencies) < n_events:
+                ev = await asyncio.wait_for(q.get(), timeout=10.0)
+                latencies.append(time.time() - ev["sent_at"])
+        except asyncio.TimeoutError:
+            pass
+        await EVENT_BUS.close()
+        results.put(latencies)
+
+    asyncio.run(run())
+
+
+def _publisher(mongo_uri: str, db_name: str, task_id: str, n_events: int, ready) -> None:
+    _configure(mongo_uri, db_name)
+    from orchestrallm.shared.eventbus.events import EVENT_BUS
+
+    async def run():
+        ready.wait()
+        for i in range(n_events):
+            await EVENT_BUS.publish({"task_id": task_id, "type": "token", "seq": i + 1, "content": "x", "sent_at": time.time()})
+            if i % 50 == 0:
+                await asyncio.sleep(0)
+        await asyncio.sleep(1.0)
+        await EVENT_BUS.close()
+
+    asyncio.run(run())
+
+
+def _pct(values, p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-worker event bus check")
+    parser.add_argument("--mongo-uri", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    db_name = f"bench_bus_{uuid.uuid4().hex[:8]}"
+    task_id = str(uuid.uuid4())
+    ready, results = ctx.Event(), ctx.Queue()
+
+    sub = ctx.Process(target=_subscriber, args=(args.mongo_uri, db_name, task_id, args.events, ready, results))
+    pub = ctx.Process(target=_publisher, args=(args.mongo_uri, db_name, task_id, args.events, ready))
+    sub.start()
+    pub.start()
+    latencies = results.get(timeout=120)
+    sub.join()
+    pub.join()
+
+    from pymongo import MongoClient
+    MongoClient(args.mongo_uri).drop_database(db_name)
+
+    print(f"received {len(latencies)}/{args.events} events across workers")
+    print(f"latency p50 {_pct(latencies, 0.5) * 1000:.1f} ms | p99 {_pct(latencies, 0.99) * 1000:.1f} ms")
+    sys.exit(0 if len(latencies) == args.events else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark: end-to-end load on a running API.
+
+Fires a mix of concurrent chat, RAG, ingest, travel and recipe tasks over HTTP and
+follows each one on its WebSocket stream until 'done' or 'error'. Reports, per task
+type, p50/p99 time to first token (from the POST to the first token event) and
+end-to-end latency, plus event throughput and, with --mongo-uri, the Mongo operations
+the run caused (serverStatus opcounters).
+
+Without network access, run the API against benchmarks/mock_openai.py:
+  PYTHONPATH=src python benchmarks/mock_openai.py --port 8900 &
+  OPENAI_API_KEY=sk-mock OPENAI_BASE_URL=http://127.0.0.1:8900/v1 uvicorn orchestrallm.app:app --port 8076 &
+RAG users get a document ingested from the mock server first (--doc-url). Travel and
+recipe tasks also run web searches, which fail fast (and are included) when offline.
+
+Requires:
+  pip install websockets
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_e2e_load.py --tasks 200 --concurrency 50 \\
+      --mix chat=6,rag=3,ingest=1 --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+
+_QUERIES = {
+    "chat": ["Tell me a short story about a lighthouse.", "Summarize the benefits of unit tests.", "What did I ask before?"],
+    "rag": ["What does the document say about the budget?", "Which places are mentioned?", "Summarize the notes on food."],
+    "travel": ["Plan a three day trip to Lisbon on a low budget."],
+    "recipes": ["Suggest a dish with minced meat."],
+}
+
+
+def _parse_mix(text: str) -> Dict[str, int]:
+    mix: Dict[str, int] = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ("chat", "rag", "ingest", "travel", "recipes"):
+            raise SystemExit(f"unknown task type in --mix: {name}")
+        mix[name] = int(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def _pct(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def _ms(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v * 1000:.0f}"
+
+
+def _payload(kind: str, user: str, doc_url: str) -> Dict[str, Any]:
+    session = f"{user}-s"
+    if kind == "ingest":
+        return {"user_id": user, "document_url": doc_url, "document_id": f"load-{uuid.uuid4().hex[:8]}"}
+    payload = {"user_id": user, "session_id": session, "query": random.choice(_QUERIES[kind])}
+    if kind == "rag":
+        payload["related_document_id"] = f"load-doc-{user}"
+    return payload
+
+
+async def _run_task(http: httpx.AsyncClient, ws_base: str, kind: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    result: Dict[str, Any] = {"kind": kind, "ttft": None, "e2e": None, "events": 0, "error": None}
+    try:
+        r = await http.post(f"/v1/tasks/{kind}", json=payload)
+        r.raise_for_status()
+        task_id = r.json()["task_id"]
+        async with websockets.connect(f"{ws_base}/v1/stream/{task_id}?since=0", ping_interval=None) as ws:
+            while True:
+                msg = await asyncio.wait_for(ws.recv(), timeout=timeout)
+                try:
+                    events = json.loads(msg)
+                except (TypeError, ValueError):
+                    continue
+                for ev in events if isinstance(events, list) else [events]:
+                    result["events"] += 1
+                    typ = ev.get("type")
+                    if typ == "token" and result["ttft"] is None:
+                        result["ttft"] = time.perf_counter() - t0
+                    elif typ == "error":
+                        result["error"] = ev.get("message") or "error"
+                    if typ in ("done", "error"):
+                        result["e2e"] = time.perf_counter() - t0
+                        return result
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _opcounters(mongo_uri: Optional[str]) -> Optional[Dict[str, int]]:
+    if not mongo_uri:
+        return None
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=3000)
+    try:
+        return dict(client.admin.command("serverStatus")["opcounters"])
+    finally:
+        client.close()
+
+
+async def _main(args: argparse.Namespace) -> None:
+    mix = _parse_mix(args.mix)
+    users = [f"load-user-{i}" for i in range(args.users)]
+    base = args.base_url.rstrip("/")
+    ws_base = base.replace("https://", "wss://").replace("http://", "ws://")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base, timeout=30.0, limits=limits) as http:
+        if "rag" in mix:
+            t0 = time.perf_counter()
+            warm = [
+                _run_task(http, ws_base, "ingest", {"user_id": u, "document_url": args.doc_url, "document_id": f"load-doc-{u}"}, args.timeout)
+                for u in users
+            ]
+            failed = [r for r in await asyncio.gather(*warm) if r["error"]]
+            print(f"ingested RAG documents for {len(users)} users in {time.perf_counter() - t0:.1f}s ({len(failed)} failed)")
+
+        before = _opcounters(args.mongo_uri)
+        kinds = random.choices(list(mix), weights=list(mix.values()), k=args.tasks)
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(kind: str) -> Dict[str, Any]:
+            async with sem:
+                return await _run_task(http, ws_base, kind, _payload(kind, random.choice(users), args.doc_url), args.timeout)
+
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(one(k) for k in kinds))
+        wall = time.perf_counter() - t0
+        after = _opcounters(args.mongo_uri)
+
+    print(f"\n{args.tasks} tasks, concurrency {args.concurrency}, {wall:.1f}s wall")
+    print(f"{'type':<8} | {'n':>5} | {'errors':>6} | {'ttft p50':>8} | {'ttft p99':>8} | {'e2e p50':>8} | {'e2e p99':>8} (ms)")
+    for kind in mix:
+        rs = [r for r in results if r["kind"] == kind]
+        ttft = [r["ttft"] for r in rs if r["ttft"] is not None]
+        e2e = [r["e2e"] for r in rs if r["e2e"] is not None and not r["error"]]
+        print(
+            f"{kind:<8} | {len(rs):>5} | {sum(1 for r in rs if r['error']):>6} | {_ms(_pct(ttft, 50)):>8} | "
+            f"{_ms(_pct(ttft, 99)):>8} | {_ms(_pct(e2e, 50)):>8} | {_ms(_pct(e2e, 99)):>8}"
+        )
+    events = sum(r["events"] for r in results)
+    print(f"events: {events} ({events / wall:,.0f}/s) | tasks/s: {len(results) / wall:.1f}")
+    errors = [r["error"] for r in results if r["error"]]
+    if errors:
+        print(f"first error: {errors[0]}")
+    if before and after:
+        delta = {k: after[k] - before.get(k, 0) for k in after}
+        per_task = {k: round(v / max(1, len(results)), 1) for k, v in delta.items()}
+        print(f"mongo opcounters: {delta}")
+        print(f"mongo ops per task: {per_task}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test over HTTP + WebSocket")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8076")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--mix", default="chat=6,rag=3,ingest=1", help="Weights per task type: chat, rag, ingest, travel, recipes")
+    parser.add_argument("--doc-url", default="http://127.0.0.1:8900/docs/sample.txt", help="Document to ingest (reachable from the API)")
+    parser.add_argument("--mongo-uri", default=None, help="Report Mongo opcounters of this server (needs serverStatus access)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the next event of a task")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
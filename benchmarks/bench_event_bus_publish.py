@@ -0,0 +1,79 @@
+"""
+Micro-benchmark: InProcEventBus publish throughput with many concurrent tasks.
+
+Every task has one subscriber draining its queue and publishes --events token events.
+The previous bus (bus-wide asyncio.Lock + list copy per publish) is compared with the
+current copy-on-write registry.
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_event_bus_publish.py --tasks 10 100 1000
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from orchestrallm.shared.eventbus.bus import InProcEventBus
+
+
+class LockedEventBus:
+    """The previous implementation, kept here for comparison."""
+
+    def __init__(self) -> None:
+        self._subs: Dict[str, List[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        async with self._lock:
+            self._subs.setdefault(task_id, []).append(q)
+        return q
+
+    async def publish(self, ev: Dict[str, Any]) -> None:
+        task_id = ev.get("task_id")
+        if not task_id:
+            return
+        async with self._lock:
+            queues = list(self._subs.get(task_id, []))
+        for q in queues:
+            try:
+                q.put_nowait(ev)
+            except asyncio.QueueFull:
+                pass
+
+
+async def _run(bus, n_tasks: int, n_events: int) -> float:
+    async def consumer(q: asyncio.Queue):
+        for _ in range(n_events):
+            await q.get()
+
+    async def producer(task_id: str):
+        for i in range(n_events):
+            await bus.publish({"task_id": task_id, "type": "token", "seq": i + 1, "content": "x"})
+            if i % 8 == 0:
+                await asyncio.sleep(0)
+
+    task_ids = [f"task-{i}" for i in range(n_tasks)]
+    consumers = [asyncio.create_task(consumer(await bus.subscribe(t))) for t in task_ids]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(producer(t) for t in task_ids))
+    elapsed = time.perf_counter() - t0
+    await asyncio.gather(*consumers)
+    return n_tasks * n_events / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event bus publish throughput")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--events", type=int, default=500, help="Events published per task")
+    args = parser.parse_args()
+
+    print(f"{'tasks':>6} | {'locked ev/s':>12} | {'cow ev/s':>12} | {'gain':>5}")
+    for n in args.tasks:
+        locked = asyncio.run(_run(LockedEventBus(), n, args.events))
+        cow = asyncio.run(_run(InProcEventBus(), n, args.events))
+        print(f"{n:>6} | {locked:>12,.0f} | {cow:>12,.0f} | {cow / locked:>4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
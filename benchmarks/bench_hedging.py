@@ -0,0 +1,87 @@
+"""
+Benchmark: hedged requests against a heavy-tailed upstream.
+
+A mock upstream answers most calls in about --base-ms, but a fraction (--tail-rate) of
+calls take --tail-ms, independently of each other, as with a slow replica or a queued
+request. --calls calls are made by --clients callers, first plainly and then through a
+Hedger. Prints p50/p95/p99 latency and the extra upstream calls hedging cost; p99
+should drop to roughly the hedge delay plus the base latency while the extra load stays
+within the budget.
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_hedging.py --calls 2000 --tail-rate 0.03 --budget 0.05
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from orchestrallm.shared.llm.hedging import Hedger
+
+
+class MockUpstream:
+    def __init__(self, base_s: float, tail_s: float, tail_rate: float):
+        self.base_s = base_s
+        self.tail_s = tail_s
+        self.tail_rate = tail_rate
+        self.calls = 0
+
+    async def call(self) -> str:
+        self.calls += 1
+        slow = random.random() < self.tail_rate
+        await asyncio.sleep((self.tail_s if slow else self.base_s) * random.uniform(0.8, 1.2))
+        return "ok"
+
+
+def _pct(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+async def _run(name: str, hedger: Hedger, upstream: MockUpstream, calls: int, clients: int) -> None:
+    latencies: List[float] = []
+    queue = list(range(calls))
+
+    async def client():
+        while queue:
+            queue.pop()
+            t0 = time.perf_counter()
+            await hedger.call("bench", upstream.call)
+            latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    extra = upstream.calls - calls
+    print(
+        f"{name:<8} | {_pct(latencies, 50) * 1000:>7.1f} | {_pct(latencies, 95) * 1000:>7.1f} | "
+        f"{_pct(latencies, 99) * 1000:>7.1f} | {max(latencies) * 1000:>7.1f} | {extra:>6} ({extra / calls:.1%})"
+    )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    print(f"{'mode':<8} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'max ms':>7} | extra calls")
+    for name, enabled in (("plain", False), ("hedged", True)):
+        random.seed(args.seed)
+        hedger = Hedger(enabled=enabled, percentile=args.percentile, min_delay_s=args.min_delay_ms / 1000.0, budget_ratio=args.budget)
+        upstream = MockUpstream(args.base_ms / 1000.0, args.tail_ms / 1000.0, args.tail_rate)
+        await _run(name, hedger, upstream, args.calls, args.clients)
+        if enabled:
+            print(f"hedger: {hedger.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged vs. plain calls against a heavy-tailed upstream")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--base-ms", type=float, default=40.0)
+    parser.add_argument("--tail-ms", type=float, default=800.0)
+    parser.add_argument("--tail-rate", type=float, default=0.03)
+    parser.add_argument("--percentile", type=float, default=95.0)
+    parser.add_argument("--min-delay-ms", type=float, default=50.0)
+    parser.add_argument("--budget", type=float, default=0.05, help="Hedges allowed per call")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
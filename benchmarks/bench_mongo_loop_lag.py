@@ -0,0 +1,139 @@
+"""
+Benchmark: event loop lag caused by Mongo calls on task paths.
+
+Runs many concurrent simulated chat tasks, each doing the persistence work of a real one
+(task record, status updates, history load, two history appends), once with the blocking
+pymongo functions called inside the coroutines and once with their async twins running
+on the Mongo thread pool. A probe coroutine measures how late the loop wakes it up.
+
+Runs against mongomock by default with a simulated round trip per call (--rtt-ms), or
+against a real server with --mongo-uri.
+
+Requires:
+  pip install mongomock   (only without --mongo-uri)
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_mongo_loop_lag.py --tasks 10 100 --rtt-ms 2
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List
+
+from orchestrallm.shared import history
+from orchestrallm.shared.persistence import mongo
+
+
+class _SlowCollection:
+    def __init__(self, coll, rtt_s: float):
+        self._coll = coll
+        self._rtt_s = rtt_s
+
+    def __getattr__(self, name):
+        attr = getattr(self._coll, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self._rtt_s)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class _SlowDB:
+    def __init__(self, db, rtt_s: float):
+        self._db = db
+        self._rtt_s = rtt_s
+
+    def get_collection(self, name):
+        return _SlowCollection(self._db.get_collection(name), self._rtt_s)
+
+    def __getitem__(self, name):
+        return self.get_collection(name)
+
+    def __getattr__(self, name):
+        return self.get_collection(name)
+
+
+def _make_db(mongo_uri: str, rtt_s: float):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri)[f"bench_{uuid.uuid4().hex[:8]}"]
+    import mongomock
+    return _SlowDB(mongomock.MongoClient()["bench"], rtt_s)
+
+
+async def _blocking_task(task_id: str) -> None:
+    mongo.create_task_record(task_id, "chat", user_id="u", session_id=task_id)
+    mongo.set_task_status(task_id, "running")
+    history.load_history(user_id="u", session_id=task_id, limit=10)
+    history.append_message(user_id="u", session_id=task_id, role="user", content="hello")
+    await asyncio.sleep(0.01)  # stands in for the LLM call
+    history.append_message(user_id="u", session_id=task_id, role="assistant", content="hi")
+    mongo.set_task_status(task_id, "done")
+
+
+async def _async_task(task_id: str) -> None:
+    await mongo.create_task_record_async(task_id, "chat", user_id="u", session_id=task_id)
+    await mongo.set_task_status_async(task_id, "running")
+    await history.load_history_async(user_id="u", session_id=task_id, limit=10)
+    await history.append_message_async(user_id="u", session_id=task_id, role="user", content="hello")
+    await asyncio.sleep(0.01)
+    await history.append_message_async(user_id="u", session_id=task_id, role="assistant", content="hi")
+    await mongo.set_task_status_async(task_id, "done")
+
+
+async def _run(task_fn, n_tasks: int, probe_interval_s: float = 0.005):
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def probe():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(probe_interval_s)
+            lags.append(time.perf_counter() - t0 - probe_interval_s)
+
+    p = asyncio.create_task(probe())
+    await asyncio.sleep(probe_interval_s * 2)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(task_fn(str(uuid.uuid4())) for _ in range(n_tasks)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await p
+    return elapsed, lags
+
+
+def _pct(values, p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event loop lag: blocking vs pooled Mongo calls")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="Simulated round trip per call (mongomock only)")
+    parser.add_argument("--mongo-uri", default="", help="Use a real MongoDB instead of mongomock")
+    args = parser.parse_args()
+
+    mongo._db = _make_db(args.mongo_uri, args.rtt_ms / 1000.0)
+    history._coll = None
+
+    print(f"{'tasks':>6} | {'mode':>8} | {'wall s':>7} | {'lag p50 ms':>10} | {'lag p99 ms':>10} | {'lag max ms':>10}")
+    for n in args.tasks:
+        for label, fn in (("blocking", _blocking_task), ("async", _async_task)):
+            elapsed, lags = asyncio.run(_run(fn, n))
+            print(
+                f"{n:>6} | {label:>8} | {elapsed:>7.2f} | {_pct(lags, 0.5) * 1000:>10.1f} | "
+                f"{_pct(lags, 0.99) * 1000:>10.1f} | {max(lags or [0]) * 1000:>10.1f}"
+            )
+
+    if args.mongo_uri:
+        mongo._db.client.drop_database(mongo._db.name)
+
+
+if __name__ == "__main__":
+    main()
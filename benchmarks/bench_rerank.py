@@ -0,0 +1,94 @@
+"""
+Benchmark: cost and effect of the local RAG reranker (RAG_RERANK_MODE=local).
+
+Cost: reranks --candidates synthetic chunks of about --chunk-chars characters --runs
+times and prints the median and p99 time per call and per 100 candidates.
+
+Effect: a synthetic retrieval task where, per query, --relevant of the candidates
+contain the query's rare terms and the dense scores only weakly prefer them (relevance
+plus Gaussian noise, --noise). Prints precision@k of the dense order and of the
+blended order.
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_rerank.py --candidates 100 --runs 200
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from orchestrallm.features.rag.domain.rerank import LocalReranker
+
+_WORDS = (
+    "the plan covers transport lodging food and budget for each day with short notes on museums "
+    "parks markets and local dishes worth trying along the way while the report lists prices "
+    "opening hours contacts routes and seasonal events across several districts of the city"
+).split()
+
+
+def _chunk(rng: random.Random, chars: int, extra: List[str] = ()) -> str:
+    words: List[str] = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(_WORDS))
+    for term in extra:
+        words.insert(rng.randrange(len(words)), term)
+    return " ".join(words)
+
+
+def _cost(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    hits = [{"text": _chunk(rng, args.chunk_chars), "score": rng.random()} for _ in range(args.candidates)]
+    reranker = LocalReranker(budget_ms=0)  # no budget: measure the full cost
+    query = "budget for museums and local dishes"
+    times = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        reranker.rerank(query, hits, args.keep)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    med = statistics.median(times)
+    p99 = times[min(len(times) - 1, int(0.99 * len(times)))]
+    print(f"rerank of {args.candidates} candidates (~{args.chunk_chars} chars each), {args.runs} runs")
+    print(f"  median {med * 1000:.2f} ms | p99 {p99 * 1000:.2f} ms | {med * 1000 * 100 / args.candidates:.2f} ms per 100 candidates")
+
+
+def _precision(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    reranker = LocalReranker(dense_weight=args.dense_weight, budget_ms=0)
+    totals: Dict[str, float] = {"dense": 0.0, "blended": 0.0}
+    for q in range(args.queries):
+        code = f"zx{q:04d}"
+        terms = [code, f"district{q}"]
+        hits = []
+        for i in range(args.candidates):
+            relevant = i < args.relevant
+            text = _chunk(rng, args.chunk_chars, terms if relevant else [])
+            hits.append({"text": text, "score": (0.1 if relevant else 0.0) + rng.gauss(0, args.noise), "relevant": relevant})
+        hits.sort(key=lambda h: h["score"], reverse=True)
+        query = f"what does the report say about {code} in district{q}"
+        for name, ranked in (("dense", hits[:args.keep]), ("blended", reranker.rerank(query, hits, args.keep))):
+            totals[name] += sum(1 for h in ranked if h["relevant"]) / args.keep
+    print(f"\nprecision@{args.keep} over {args.queries} queries ({args.relevant} relevant of {args.candidates} candidates)")
+    for name, total in totals.items():
+        print(f"  {name:<8} {total / args.queries:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local RAG reranker cost and precision")
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--chunk-chars", type=int, default=750)
+    parser.add_argument("--keep", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--relevant", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.1, help="Std. dev. of the dense score noise")
+    parser.add_argument("--dense-weight", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    _cost(args)
+    _precision(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: parsing a streamed chat completion.
+
+Builds an OpenAI-style SSE body of --tokens chunks, cuts it into network-sized pieces
+and parses it with
+  - the previous stream_chat loop: resp.aiter_lines() + json.loads per line,
+  - the SSEDecoder on resp.aiter_bytes() with the stdlib json,
+  - the SSEDecoder with orjson (when installed).
+Prints tokens parsed per second for each; all variants must yield the same text.
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_sse_decode.py --tokens 200000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from orchestrallm.shared.llm import sse
+from orchestrallm.shared.llm.sse import aiter_sse
+
+
+def _build_body(tokens: int) -> bytes:
+    words = ["the", " quick", " brown", " fox", " jumps", " over", " lazy", " dog", "ğüşiöç", "\n"]
+    base = {
+        "id": "chatcmpl-9xYz0123456789abcdef",
+        "object": "chat.completion.chunk",
+        "created": 1718000000,
+        "model": "gpt-4o-mini-2024-07-18",
+        "system_fingerprint": "fp_0123456789",
+    }
+    parts = []
+    for i in range(tokens):
+        chunk = dict(base, choices=[{"index": 0, "delta": {"content": words[i % len(words)]}, "logprobs": None, "finish_reason": None}])
+        parts.append(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+    final = dict(base, choices=[{"index": 0, "delta": {}, "logprobs": None, "finish_reason": "stop"}])
+    parts.append(b"data: " + json.dumps(final).encode() + b"\n\n")
+    usage = dict(base, choices=[], usage={"prompt_tokens": 12, "completion_tokens": tokens, "total_tokens": tokens + 12})
+    parts.append(b"data: " + json.dumps(usage).encode() + b"\n\n")
+    parts.append(b"data: [DONE]\n\n")
+    return b"".join(parts)
+
+
+def _split(body: bytes, seed: int = 7):
+    rng = random.Random(seed)
+    pieces, pos = [], 0
+    while pos < len(body):
+        n = rng.randint(64, 4096)
+        pieces.append(body[pos:pos + n])
+        pos += n
+    return pieces
+
+
+def _response(pieces) -> httpx.Response:
+    async def stream():
+        for p in pieces:
+            yield p
+    return httpx.Response(200, content=stream())
+
+
+async def _legacy(pieces) -> str:
+    out = []
+    async for line in _response(pieces).aiter_lines():
+        if not line or not line.startswith("data: "):
+            continue
+        data = line[len("data: "):].strip()
+        if data == "[DONE]":
+            continue
+        try:
+            j = json.loads(data)
+            tok = j["choices"][0].get("delta", {}).get("content")
+            if tok:
+                out.append(tok)
+        except Exception:
+            continue
+    return "".join(out)
+
+
+async def _decoder(pieces) -> str:
+    out = []
+    async for data in aiter_sse(_response(pieces).aiter_bytes()):
+        if data == b"[DONE]":
+            continue
+        j = sse.loads(data)
+        choices = j.get("choices")
+        if not choices:
+            continue
+        tok = (choices[0].get("delta") or {}).get("content")
+        if tok:
+            out.append(tok)
+    return "".join(out)
+
+
+def _bench(name: str, fn, pieces, tokens: int, repeat: int):
+    best = float("inf")
+    text = ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        text = asyncio.run(fn(pieces))
+        best = min(best, time.perf_counter() - t0)
+    print(f"{name:<28} | {best * 1000:>9.1f} | {tokens / best:>12,.0f}")
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE parsing throughput of stream_chat")
+    parser.add_argument("--tokens", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pieces = _split(_build_body(args.tokens))
+    print(f"{'parser':<28} | {'best ms':>9} | {'tokens/s':>12}")
+    expected = _bench("aiter_lines + json", _legacy, pieces, args.tokens, args.repeat)
+
+    orjson = sse.orjson
+    sse.orjson = None
+    try:
+        got = _bench("SSEDecoder + json", _decoder, pieces, args.tokens, args.repeat)
+    finally:
+        sse.orjson = orjson
+    assert got == expected, "SSEDecoder + json produced different text"
+    if orjson is not None:
+        got = _bench("SSEDecoder + orjson", _decoder, pieces, args.tokens, args.repeat)
+        assert got == expected, "SSEDecoder + orjson produced different text"
+    else:
+        print("orjson not installed; skipping the orjson variant")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: Mongo queries per second issued by WebSocket stream followers.
+
+Compares the former per-socket 250 ms polling loop with the shared StreamTailer for a
+growing number of open sockets. Runs against mongomock by default, or against a real
+server with --mongo-uri (change streams are used automatically on a replica set).
+
+Requires:
+  pip install mongomock   (only without --mongo-uri)
+
+Usage:
+  PYTHONPATH=src python benchmarks/bench_stream_tailer.py --sockets 10 100 1000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List
+
+from orchestrallm.shared.persistence import mongo
+
+
+class _CountingCollection:
+    def __init__(self, coll):
+        self._coll = coll
+        self.finds = 0
+
+    def find(self, *args, **kwargs):
+        self.finds += 1
+        return self._coll.find(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._coll, name)
+
+
+class _CountingDB:
+    def __init__(self, db):
+        self._db = db
+        self.streams = _CountingCollection(db.streams)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+def _make_db(mongo_uri: str):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri)[f"bench_{uuid.uuid4().hex[:8]}"]
+    import mongomock
+    return mongomock.MongoClient()["bench"]
+
+
+async def _legacy(task_ids: List[str], duration: float, change_streams: bool) -> None:
+    """The previous pump_db loop, one per socket."""
+    db = mongo.get_db()
+
+    async def pump_db(task_id: str):
+        last_seq = 0
+        while True:
+            for ev in db.streams.find({"task_id": task_id, "seq": {"$gt": last_seq}}).sort("seq", 1):
+                last_seq = max(last_seq, int(ev.get("seq", 0)))
+            await asyncio.sleep(0.25)
+
+    pumps = [asyncio.create_task(pump_db(t)) for t in task_ids]
+    await asyncio.sleep(duration)
+    for p in pumps:
+        p.cancel()
+
+
+async def _shared(task_ids: List[str], duration: float, change_streams: bool) -> None:
+    from orchestrallm.shared.eventbus.tailer import StreamTailer
+
+    tailer = StreamTailer(interval_s=0.25, use_change_streams=change_streams)
+    queues = [(t, await tailer.subscribe(t, 0)) for t in task_ids]
+    await asyncio.sleep(duration)
+    for t, q in queues:
+        await tailer.unsubscribe(t, q)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream follower query rate benchmark")
+    parser.add_argument("--sockets", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds measured per run")
+    parser.add_argument("--mongo-uri", default="", help="Use a real MongoDB instead of mongomock")
+    args = parser.parse_args()
+
+    print(f"{'sockets':>8} | {'legacy q/s':>11} | {'shared q/s':>11}")
+    for n in args.sockets:
+        rates = []
+        for runner in (_legacy, _shared):
+            db = _CountingDB(_make_db(args.mongo_uri))
+            mongo._db = db
+            task_ids = [f"task-{i}" for i in range(n)]
+            db.streams.insert_many([{"task_id": t, "seq": 1, "type": "status", "message": "x"} for t in task_ids])
+            t0 = time.perf_counter()
+            asyncio.run(runner(task_ids, args.duration, bool(args.mongo_uri)))
+            rates.append(db.streams.finds / (time.perf_counter() - t0))
+        print(f"{n:>8} | {rates[0]:>11.1f} | {rates[1]:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Local OpenAI-compatible stand-in for load tests without network access.
+
+Serves
+  POST /v1/chat/completions   streamed (SSE) or plain completions,
+  POST /v1/embeddings         deterministic pseudo-random unit vectors per input text,
+  GET  /docs/sample.txt       a generated text document to ingest,
+  GET  /stats                 request and error counters.
+Latency, token rate and errors are configurable: time to first token, tokens per second
+and reply length for chat; a fixed latency plus a per-input cost for embeddings; a
+fraction of 500s, a fraction of 429s with Retry-After, and 429s above a concurrency cap.
+
+Point the API at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1 (any OPENAI_API_KEY).
+
+Usage:
+  PYTHONPATH=src python benchmarks/mock_openai.py --port 8900 --ttft-ms 300 --tokens-per-s 80
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+_WORDS = (
+    "the plan covers transport lodging food and budget for each day with short notes "
+    "on museums parks markets and local dishes worth trying along the way"
+).split()
+
+
+class MockConfig:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.ttft_s = args.ttft_ms / 1000.0
+        self.token_interval_s = 1.0 / args.tokens_per_s if args.tokens_per_s > 0 else 0.0
+        self.reply_tokens = args.reply_tokens
+        self.embed_latency_s = args.embed_latency_ms / 1000.0
+        self.embed_per_input_s = args.embed_per_input_ms / 1000.0
+        self.dims = args.dims
+        self.error_rate = args.error_rate
+        self.throttle_rate = args.throttle_rate
+        self.max_concurrency = args.max_concurrency
+        self.doc_paragraphs = args.doc_paragraphs
+
+
+def build_app(cfg: MockConfig) -> FastAPI:
+    app = FastAPI(title="mock-openai")
+    state: Dict[str, Any] = {"active": 0, "chat": 0, "embeddings": 0, "embedded_inputs": 0, "throttled": 0, "errors": 0}
+
+    def _reject() -> Optional[JSONResponse]:
+        if (cfg.max_concurrency and state["active"] >= cfg.max_concurrency) or random.random() < cfg.throttle_rate:
+            state["throttled"] += 1
+            return JSONResponse({"error": {"message": "rate limited", "type": "rate_limit"}}, status_code=429, headers={"Retry-After": "1"})
+        if random.random() < cfg.error_rate:
+            state["errors"] += 1
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=500)
+        return None
+
+    def _reply_tokens(max_tokens: int) -> List[str]:
+        n = max(1, min(cfg.reply_tokens, max_tokens or cfg.reply_tokens))
+        return [(" " if i else "") + _WORDS[i % len(_WORDS)] for i in range(n)]
+
+    @app.post("/v1/chat/completions")
+    async def chat(req: Request):
+        body = await req.json()
+        rejected = _reject()
+        if rejected is not None:
+            return rejected
+        state["chat"] += 1
+        model = body.get("model") or "mock"
+        tokens = _reply_tokens(int(body.get("max_tokens") or 0))
+        finish = "length" if len(tokens) == body.get("max_tokens") else "stop"
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages") or []) // 4 + 1
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+        base = {"id": f"chatcmpl-{state['chat']}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+
+        if not body.get("stream"):
+            state["active"] += 1
+            try:
+                await asyncio.sleep(cfg.ttft_s + cfg.token_interval_s * len(tokens))
+            finally:
+                state["active"] -= 1
+            msg = {"role": "assistant", "content": "".join(tokens)}
+            return dict(base, object="chat.completion", choices=[{"index": 0, "message": msg, "finish_reason": finish}], usage=usage)
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events():
+            state["active"] += 1
+            try:
+                await asyncio.sleep(cfg.ttft_s)
+                for tok in tokens:
+                    chunk = dict(base, choices=[{"index": 0, "delta": {"content": tok}, "finish_reason": None}])
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if cfg.token_interval_s:
+                        await asyncio.sleep(cfg.token_interval_s)
+                yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': finish}]))}\n\n"
+                if include_usage:
+                    yield f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                state["active"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(req: Request):
+        body = await req.json()
+        rejected = _reject()
+        if rejected is not None:
+            return rejected
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        dims = int(body.get("dimensions") or cfg.dims)
+        state["embeddings"] += 1
+        state["embedded_inputs"] += len(inputs)
+        state["active"] += 1
+        try:
+            await asyncio.sleep(cfg.embed_latency_s + cfg.embed_per_input_s * len(inputs))
+        finally:
+            state["active"] -= 1
+        data = []
+        for i, text in enumerate(inputs):
+            seed = int.from_bytes(hashlib.sha256(str(text).encode("utf-8")).digest()[:8], "little")
+            vec = np.random.default_rng(seed).standard_normal(dims).astype(np.float32)
+            vec /= np.linalg.norm(vec) or 1.0
+            data.append({"object": "embedding", "index": i, "embedding": vec.tolist()})
+        tokens = sum(len(str(t)) for t in inputs) // 4 + 1
+        return {"object": "list", "data": data, "model": body.get("model"), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.get("/docs/sample.txt")
+    async def sample_doc():
+        rng = random.Random(42)
+        paragraphs = [
+            " ".join(rng.choice(_WORDS) for _ in range(rng.randint(60, 140))).capitalize() + "."
+            for _ in range(cfg.doc_paragraphs)
+        ]
+        return PlainTextResponse("\n\n".join(paragraphs))
+
+    @app.get("/stats")
+    async def stats():
+        return state
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Delay before the first chat token")
+    parser.add_argument("--tokens-per-s", type=float, default=80.0, help="Chat token rate (0 = as fast as possible)")
+    parser.add_argument("--reply-tokens", type=int, default=120, help="Tokens per chat reply (capped by max_tokens)")
+    parser.add_argument("--embed-latency-ms", type=float, default=80.0)
+    parser.add_argument("--embed-per-input-ms", type=float, default=0.2)
+    parser.add_argument("--dims", type=int, default=1536, help="Embedding size when the request sets no 'dimensions'")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Answer 429 above this many active requests (0 = no cap)")
+    parser.add_argument("--doc-paragraphs", type=int, default=200, help="Paragraphs in /docs/sample.txt")
+    args = parser.parse_args()
+
+    uvicorn.run(build_app(MockConfig(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,16 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from orchestrallm.shared.config.settings import settings
 from orchestrallm.shared.logging.logger import setup_logging
-from orchestrallm.shared.persistence.mongo import ensure_indexes
+from orchestrallm.shared.persistence.mongo import ensure_indexes, shutdown_db_executor
+from orchestrallm.shared.eventbus.events import EVENT_BUS
+from orchestrallm.shared.eventbus.writer import STREAM_WRITER
+from orchestrallm.shared.llm.http import LLM_HTTP
+from orchestrallm.features.rag.infra.qdrant_util import QDRANT
 
 from orchestrallm.shared.api.health import router as health_router
+from orchestrallm.shared.api.metrics import router as metrics_router
 from orchestrallm.shared.eventbus.api import router as stream_router
+from orchestrallm.shared.llm.api import router as llm_router
 from orchestrallm.features.chat.api.routes import router as chat_router
 from orchestrallm.features.documents.api.routes import router as documents_router
 from orchestrallm.features.rag.api.routes import router as rag_router
@@ -49,12 +55,15 @@ def create_app() -> FastAPI:
 
     # Routers
     app.include_router(health_router)
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics_router)
     app.include_router(chat_router,      prefix="/v1")
     app.include_router(documents_router, prefix="/v1")
     app.include_router(rag_router,       prefix="/v1")
     app.include_router(recipes_router,   prefix="/v1")
     app.include_router(travel_router,    prefix="/v1")
     app.include_router(stream_router,    prefix="/v1")
+    app.include_router(llm_router,       prefix="/v1")
 
     @app.on_event("startup")
     async def _on_startup():
@@ -62,6 +71,15 @@ def create_app() -> FastAPI:
             ensure_indexes()
         except Exception:
             log.warning("ensure_indexes failed or is a no-op")
+        LLM_HTTP.get_async()
+
+    @app.on_event("shutdown")
+    async def _on_shutdown():
+        await STREAM_WRITER.flush_all()
+        await EVENT_BUS.close()
+        await LLM_HTTP.aclose()
+        await QDRANT.aclose()
+        shutdown_db_executor()
 
     return app
 
@@ -8,8 +8,9 @@ from typing import List, Dict
 import httpx
 from orchestrallm.shared.config.settings import settings
 from orchestrallm.shared.eventbus.events import send_token, send_error, send_done, send_status
-from orchestrallm.shared.history import load_history, append_message 
+from orchestrallm.shared.history import load_history_async, append_message_async
 from orchestrallm.shared.llm.openai_client import stream_chat
+from orchestrallm.shared.llm.prompt import assemble_chat_messages
 
 from orchestrallm.features.chat.domain.prompts import BASIC_CHATBOT_PROMPT
 
@@ -30,22 +31,16 @@ async def run_chat_task(task_id: str, user_id: str, session_id: str, query: str)
     try:
         await send_status(task_id, "History is being loaded...")
         history_limit = getattr(settings, "HISTORY_MAX_TURNS", 10) or 10
-        recent = load_history(user_id=user_id, session_id=session_id, limit=history_limit)
+        recent = await load_history_async(user_id=user_id, session_id=session_id, limit=history_limit)
 
         try:
-            append_message(user_id=user_id, session_id=session_id, role="user", content=query)
+            await append_message_async(user_id=user_id, session_id=session_id, role="user", content=query)
         except Exception as e:
             logger.warning(f"history append (user) failed: {e}")
 
-        messages: List[Dict[str, str]] = [{"role": "system", "content": BASIC_CHATBOT_PROMPT}]
-        for m in recent or []:
-            role = m.get("role")
-            content = m.get("content")
-            if role in ("user", "assistant") and content:
-                messages.append({"role": role, "content": content})
-        messages.append({"role": "user", "content": query})
+        messages, prompt = assemble_chat_messages(BASIC_CHATBOT_PROMPT, query, history=recent)
 
-        await send_status(task_id, "Yanıt oluşturuluyor...")
+        await send_status(task_id, "Yanıt oluşturuluyor...", prompt=prompt)
         final_chunks: List[str] = []
         async for tok in stream_chat(messages):
             final_chunks.append(tok)
@@ -53,7 +48,7 @@ async def run_chat_task(task_id: str, user_id: str, session_id: str, query: str)
         final_text = "".join(final_chunks).strip()
 
         try:
-            append_message(user_id=user_id, session_id=session_id, role="assistant", content=final_text)
+            await append_message_async(user_id=user_id, session_id=session_id, role="assistant", content=final_text)
         except Exception as e:
             logger.warning(f"history append (assistant) failed: {e}")
 
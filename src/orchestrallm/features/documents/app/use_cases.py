@@ -9,12 +9,13 @@ from urllib.parse import urlparse
 
 import httpx
 from pypdf import PdfReader
-from qdrant_client import QdrantClient
 
 from orchestrallm.shared.config.settings import settings
 from orchestrallm.shared.eventbus.events import send_status, send_error, send_done
-from orchestrallm.shared.llm.openai_client import embed_texts_sync
+from orchestrallm.shared.llm.embeddings import EMBEDDINGS
+from orchestrallm.features.rag.domain.hybrid import sparse_vector
 from orchestrallm.features.rag.infra.qdrant_util import ensure_collection, upsert_points
+from orchestrallm.features.rag.infra.retrieval_cache import RETRIEVAL_CACHE
 from orchestrallm.features.documents.domain.chunking import chunk_text
 
 logger = logging.getLogger(__name__)
@@ -88,11 +89,11 @@ async def run_ingest_task(
             return
 
         await send_status(task_id, "Computing embeddings...")
-        vectors = await asyncio.to_thread(embed_texts_sync, chunks)
+        vectors = await EMBEDDINGS.embed(chunks)
 
         await send_status(task_id, "Writing to Qdrant...")
-        qc = QdrantClient(url=settings.QDRANT_URL, api_key=getattr(settings, "QDRANT_API_KEY", None))
-        ensure_collection(qc, settings.QDRANT_COLLECTION, settings.EMBEDDING_DIMENSIONS)
+        hybrid = settings.RAG_SEARCH_MODE.strip().lower() == "hybrid"
+        has_sparse = await ensure_collection(settings.QDRANT_COLLECTION, len(vectors[0]), sparse=hybrid)
 
         doc_id = document_id or document_url
         payloads: List[Dict[str, Any]] = []
@@ -108,13 +109,14 @@ async def run_ingest_task(
                 }
             )
 
-        upsert_points(
-            qc,
+        await upsert_points(
             collection_name=settings.QDRANT_COLLECTION,
             vectors=vectors,
             payloads=payloads,
             document_id=doc_id,
+            sparse_vectors=[sparse_vector(c) for c in chunks] if has_sparse else None,
         )
+        await RETRIEVAL_CACHE.invalidate(user_id, doc_id)
 
         await send_status(task_id, f"Completed. {len(chunks)} chunks added.")
         await send_done(task_id)
@@ -4,13 +4,12 @@ This module provides core functionalities for Retrieval-Augmented Generation (RA
 
 from typing import List, Dict, Any, Optional
 
-from qdrant_client import QdrantClient
 from orchestrallm.shared.config.settings import settings
-from orchestrallm.features.rag.infra.qdrant_util import ensure_collection, search
-from orchestrallm.shared.llm.openai_client import embed_query_sync
+from orchestrallm.features.rag.infra.qdrant_util import build_filter, ensure_collection, search
+from orchestrallm.shared.llm.openai_client import embed_query
 
 
-def retrieve_passages(
+async def retrieve_passages(
     user_id: str,
     query: str,
     related_document_id: Optional[str] = None,
@@ -19,20 +18,17 @@ def retrieve_passages(
     """
     This function retrieves relevant passages from the Qdrant vector database based on the input query.
     """
-    v = embed_query_sync(query)
+    v = await embed_query(query)
     if not v:
         return []
 
-    client = QdrantClient(url=settings.QDRANT_URL)
-    ensure_collection(client, settings.QDRANT_COLLECTION, vector_size=len(v), distance="Cosine")
+    await ensure_collection(settings.QDRANT_COLLECTION, vector_size=len(v))
 
-    hits = search(
-        client=client,
+    hits = await search(
         collection_name=settings.QDRANT_COLLECTION,
         query_vector=v,
-        top_k=top_k or settings.RAG_TOP_K,
-        user_id=user_id,
-        related_document_id=related_document_id,
+        limit=top_k or settings.RAG_TOPK,
+        query_filter=build_filter(user_id=user_id, related_document_id=related_document_id),
         with_payload=True,
     )
 
@@ -2,25 +2,35 @@
 This module defines a task for handling Retrieval-Augmented Generation (RAG) using Qdrant and OpenAI.
 """
 
+import asyncio
 import logging
 from datetime import datetime, timezone
 from typing import List, Dict, Optional
 
 import httpx
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
 
 from orchestrallm.shared.config.settings import settings
 from orchestrallm.shared.eventbus.events import send_token, send_error, send_done, send_status
-from orchestrallm.shared.history import load_history, append_message 
+from orchestrallm.shared.history import load_history_async, append_message_async
 from orchestrallm.features.rag.domain.prompts import RAG_SYSTEM_PROMPT
+from orchestrallm.features.rag.domain.hybrid import query_sparse_vector, rrf_fuse
+from orchestrallm.features.rag.domain.rerank import RERANKER
+from orchestrallm.features.rag.infra.qdrant_util import build_filter, ensure_collection, search, search_sparse
+from orchestrallm.features.rag.infra.retrieval_cache import RETRIEVAL_CACHE
 
-from orchestrallm.shared.llm.openai_client import stream_chat
+from orchestrallm.shared.llm.openai_client import embed_query, stream_chat
+from orchestrallm.shared.llm.prompt import assemble_chat_messages
+from orchestrallm.shared.metrics import RAG_RERANK_SECONDS
 
 _LOG_LEVEL = getattr(settings, "LOG_LEVEL", "INFO")
 logging.basicConfig(level=getattr(logging, _LOG_LEVEL.upper(), logging.INFO))
 logger = logging.getLogger("rag")
 
+_SEARCH_MODE = settings.RAG_SEARCH_MODE.strip().lower()
+_RERANK_MODE = settings.RAG_RERANK_MODE.strip().lower()
+if _RERANK_MODE == "api":
+    logger.warning("RAG_RERANK_MODE=api is not supported; passages are not reranked")
+
 
 def _format_snippets(snippets: List[str]) -> str:
     """
@@ -38,30 +48,63 @@ async def _embed_query(text: str) -> List[float]:
     """
     Embed the query text using OpenAI embeddings API.
     """
-    headers = {
-        "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-        "Content-Type": "application/json",
+    return await embed_query(text)
+
+
+def _hit_to_dict(hit) -> Dict:
+    pl = hit.payload or {}
+    return {
+        "id": str(hit.id),
+        "text": pl.get("text", ""),
+        "score": hit.score,
+        "document_id": pl.get("document_id"),
+        "chunk_index": pl.get("chunk_index"),
     }
-    payload = {"model": settings.EMBEDDING_MODEL, "input": text}
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(f"{settings.OPENAI_BASE_URL}/embeddings", headers=headers, json=payload)
-        r.raise_for_status()
-        j = r.json()
-        return j["data"][0]["embedding"]
 
 
-def _qdrant() -> QdrantClient:
+async def _search_passages(query: str, q_vec: List[float], query_filter, limit: int) -> List[Dict]:
     """
-    Create and return a Qdrant client.
+    Dense search, or in hybrid mode dense and sparse searches run concurrently and
+    fused by reciprocal rank.
     """
-    return QdrantClient(url=settings.QDRANT_URL, prefer_grpc=False)
-
+    hybrid = _SEARCH_MODE == "hybrid"
+    has_sparse = await ensure_collection(settings.QDRANT_COLLECTION, len(q_vec), sparse=hybrid)
+    indices, values = query_sparse_vector(query) if has_sparse else ([], [])
+    if not indices:
+        res = await search(
+            collection_name=settings.QDRANT_COLLECTION,
+            query_vector=q_vec,
+            limit=limit,
+            query_filter=query_filter,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return [_hit_to_dict(hit) for hit in res]
 
-def _build_filter(user_id: str, related_document_id: Optional[str]) -> Filter:
-    must = [FieldCondition(key="user_id", match=MatchValue(value=user_id))]
-    if related_document_id:
-        must.append(FieldCondition(key="document_id", match=MatchValue(value=related_document_id)))
-    return Filter(must=must)
+    per_leg = max(limit, settings.RAG_HYBRID_CANDIDATES)
+    dense, sparse = await asyncio.gather(
+        search(
+            collection_name=settings.QDRANT_COLLECTION,
+            query_vector=q_vec,
+            limit=per_leg,
+            query_filter=query_filter,
+            with_payload=True,
+            with_vectors=False,
+        ),
+        search_sparse(
+            collection_name=settings.QDRANT_COLLECTION,
+            indices=indices,
+            values=values,
+            limit=per_leg,
+            query_filter=query_filter,
+        ),
+    )
+    return rrf_fuse(
+        [[_hit_to_dict(hit) for hit in dense], [_hit_to_dict(hit) for hit in sparse]],
+        [settings.RAG_RRF_DENSE_WEIGHT, settings.RAG_RRF_SPARSE_WEIGHT],
+        k=settings.RAG_RRF_K,
+        limit=limit,
+    )
 
 
 async def run_rag_task(
@@ -83,37 +126,50 @@ async def run_rag_task(
 
     try:
         history_limit = getattr(settings, "HISTORY_MAX_TURNS", 10) or 10
-        recent_msgs = load_history(user_id=user_id, session_id=session_id, limit=history_limit)
-
-        await send_status(task_id, "Query is being embedded...")
-        q_vec = await _embed_query(query)
-
-        await send_status(task_id, "Qdrant search is being performed...")
-        client = _qdrant()
-        res = client.search(
-            collection_name=settings.QDRANT_COLLECTION,
-            query_vector=q_vec,
-            limit=getattr(settings, "RAG_TOPK", 5) or 5,
-            query_filter=_build_filter(user_id=user_id, related_document_id=related_document_id),
-            with_payload=True,
-            with_vectors=False,
+        recent_msgs = await load_history_async(user_id=user_id, session_id=session_id, limit=history_limit)
+
+        rerank = _RERANK_MODE == "local"
+        top_k = getattr(settings, "RAG_TOPK", 5) or 5
+        # With reranking, a larger candidate pool is fetched and the best top_k of it kept.
+        pool = max(top_k, settings.RAG_RERANK_TOPK) if rerank else top_k
+        cached = await RETRIEVAL_CACHE.get(
+            user_id, related_document_id, query,
+            collection=settings.QDRANT_COLLECTION, model=settings.EMBEDDING_MODEL, top_k=top_k, pool=pool,
+            search=_SEARCH_MODE, rerank=_RERANK_MODE if rerank else "none",
         )
-        snippets = [hit.payload.get("text", "") for hit in res]
-
-        context_text = _format_snippets(snippets)
-        system_prompt = RAG_SYSTEM_PROMPT + "\n" + f"CONTEXT TEXT: {context_text}"
-
-        messages: List[Dict[str, str]] = [{"role": "system", "content": system_prompt}]
-        for m in recent_msgs or []:
-            role = m.get("role")
-            content = m.get("content")
-            if role in ("user", "assistant") and content:
-                messages.append({"role": role, "content": content})
-
-        messages.append({"role": "user", "content": query})        
+        if cached.hits is not None:
+            await send_status(task_id, "Retrieved passages from cache.")
+            hits = cached.hits
+        else:
+            q_vec = cached.vector
+            if q_vec is None:
+                await send_status(task_id, "Query is being embedded...")
+                q_vec = await _embed_query(query)
+
+            await send_status(task_id, "Qdrant search is being performed...")
+            hits = await _search_passages(
+                query,
+                q_vec,
+                build_filter(user_id=user_id, related_document_id=related_document_id),
+                pool,
+            )
+            if rerank:
+                with RAG_RERANK_SECONDS.time():
+                    hits = RERANKER.rerank(query, hits, top_k)
+            await RETRIEVAL_CACHE.put(cached, q_vec, hits)
+        snippets = [h["text"] for h in hits]
+
+        messages, prompt = assemble_chat_messages(
+            RAG_SYSTEM_PROMPT,
+            query,
+            history=recent_msgs,
+            context=snippets,
+            format_context=lambda kept: "\n" + f"CONTEXT TEXT: {_format_snippets(kept)}",
+        )
+        await send_status(task_id, "Answer is being generated...", prompt=prompt)
 
         try:
-            append_message(user_id=user_id, session_id=session_id, role="user", content=query)
+            await append_message_async(user_id=user_id, session_id=session_id, role="user", content=query)
         except Exception as e:
             logger.warning(f"history append (user) failed: {e}")
 
@@ -132,7 +188,7 @@ async def run_rag_task(
         final_text = "".join(final_chunks).strip()
 
         try:
-            append_message(user_id=user_id, session_id=session_id, role="assistant", content=final_text)
+            await append_message_async(user_id=user_id, session_id=session_id, role="assistant", content=final_text)
         except Exception as e:
             logger.warning(f"history append (assistant) failed: {e}")
 
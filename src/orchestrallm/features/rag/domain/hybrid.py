@@ -0,0 +1,86 @@
+"""
+Sparse term vectors and reciprocal rank fusion for hybrid RAG search (RAG_SEARCH_MODE=hybrid).
+
+Chunks are indexed with a sparse vector of hashed terms: the index is the CRC32 of the
+term and the value a saturated term frequency (BM25's tf part), so exact tokens such as
+product codes and names can be matched by Qdrant's sparse index. Queries use weight 1
+per distinct term; common function words are dropped on both sides since the sparse
+index has no IDF. The dense and sparse hit lists are fused by rank:
+  score(d) = sum over lists of weight / (k + rank of d in that list).
+"""
+from __future__ import annotations
+
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+from orchestrallm.features.rag.domain.rerank import tokenize
+
+SparseVector = Tuple[List[int], List[float]]
+
+_K1 = 1.2
+
+# English and Turkish function words; they would otherwise dominate the unweighted sparse scores.
+STOP_WORDS = frozenset(
+    """
+    a an and are as at be but by can do does for from had has have how i if in into is it its me my
+    of on or our so than that the their them then there these they this to was we were what when
+    where which who why will with you your about did say says
+    ve ile bir bu şu o da de mi mı mu mü ne ki ama için gibi çok daha en her hangi nasıl neden
+    nedir nerede kim ya veya ise olan olarak sonra önce bana beni ben sen biz siz onlar
+    """.split()
+)
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in tokenize(text) if t not in STOP_WORDS]
+
+
+def _index(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _to_sparse(weights: Dict[int, float]) -> SparseVector:
+    indices = sorted(weights)
+    return indices, [weights[i] for i in indices]
+
+
+def sparse_vector(text: str) -> SparseVector:
+    """
+    Sparse (indices, values) vector of a chunk.
+    """
+    weights: Dict[int, float] = {}
+    for term, tf in Counter(_terms(text)).items():
+        i = _index(term)
+        # Hash collisions merge into one index, which must be unique.
+        weights[i] = weights.get(i, 0.0) + tf * (_K1 + 1.0) / (tf + _K1)
+    return _to_sparse(weights)
+
+
+def query_sparse_vector(query: str) -> SparseVector:
+    """
+    Sparse (indices, values) vector of a query; empty if it has no content terms.
+    """
+    return _to_sparse({_index(t): 1.0 for t in _terms(query)})
+
+
+def rrf_fuse(
+    rankings: Sequence[List[Dict[str, Any]]],
+    weights: Sequence[float],
+    *,
+    k: int = 60,
+    limit: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked hit lists (dicts with an "id") by weighted reciprocal rank. A fused hit
+    keeps the fields of its first occurrence and gets the fused "score".
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    scores: Dict[Any, float] = {}
+    for hits, weight in zip(rankings, weights):
+        for rank, hit in enumerate(hits, 1):
+            key = hit["id"]
+            fused.setdefault(key, hit)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    order = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [dict(fused[key], score=scores[key]) for key in order]
@@ -0,0 +1,108 @@
+"""
+Local lexical reranking of RAG candidates (RAG_RERANK_MODE=local).
+
+The dense search over-fetches candidates; each is scored with BM25 against the query,
+computed with NumPy over a (query term x candidate) frequency matrix, and the min-max
+normalized BM25 and dense scores are blended. Exact terms such as names, codes and
+numbers that embeddings blur thereby move up, without any model to download. The
+latency budget is checked between the stages of a rerank (tokenizing each candidate,
+scoring, ordering); once it has run out, the dense order is kept.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from orchestrallm.shared.config.settings import settings
+
+log = logging.getLogger("rag.rerank")
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.casefold())
+
+
+def bm25_scores(query_terms: Sequence[str], docs: Sequence[Sequence[str]], *, k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """
+    BM25 score of each tokenized doc for the query terms, with IDF taken over docs.
+    """
+    vocab = {t: i for i, t in enumerate(dict.fromkeys(query_terms))}
+    n = len(docs)
+    if not vocab or not n:
+        return np.zeros(n, dtype=np.float64)
+    lengths = np.fromiter((len(toks) for toks in docs), dtype=np.int64, count=n)
+    # Vocabulary index of every token (-1 for non-query terms) and the doc it belongs to;
+    # the (term x doc) counts are then one bincount over the matching pairs.
+    rows = np.fromiter((vocab.get(t, -1) for toks in docs for t in toks), dtype=np.int64, count=int(lengths.sum()))
+    cols = np.repeat(np.arange(n), lengths)
+    hit = rows >= 0
+    tf = np.bincount(rows[hit] * n + cols[hit], minlength=len(vocab) * n).reshape(len(vocab), n).astype(np.float64)
+    lengths = lengths.astype(np.float64)
+    df = np.count_nonzero(tf, axis=1)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    avgdl = lengths.mean() or 1.0
+    norm = k1 * (1.0 - b + b * lengths / avgdl)
+    return (idf[:, None] * tf * (k1 + 1.0) / (tf + norm)).sum(axis=0)
+
+
+def _minmax(x: np.ndarray) -> np.ndarray:
+    lo, hi = float(x.min()), float(x.max())
+    if hi - lo <= 1e-12:
+        return np.zeros_like(x)
+    return (x - lo) / (hi - lo)
+
+
+class LocalReranker:
+    def __init__(self, *, dense_weight: float = 0.5, budget_ms: float = 25.0) -> None:
+        self.dense_weight = min(1.0, max(0.0, dense_weight))
+        self.budget_s = max(0.0, budget_ms) / 1000.0
+        self.calls = 0
+        self.over_budget = 0
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], keep: int) -> List[Dict[str, Any]]:
+        """
+        Return the best keep hits ({"text", "score", ...}) by blended score, each with a
+        "rerank_score". Falls back to the dense order if the latency budget runs out.
+        """
+        self.calls += 1
+        if len(hits) <= 1:
+            return hits[:keep]
+        deadline = time.perf_counter() + self.budget_s
+        docs: List[List[str]] = []
+        for h in hits:
+            docs.append(tokenize(h.get("text") or ""))
+            if self._over(deadline):
+                return self._dense_order(hits, keep)
+
+        lexical = _minmax(bm25_scores(tokenize(query), docs))
+        if self._over(deadline):
+            return self._dense_order(hits, keep)
+        dense = _minmax(np.array([float(h.get("score") or 0.0) for h in hits]))
+        blended = self.dense_weight * dense + (1.0 - self.dense_weight) * lexical
+        order = np.argsort(-blended, kind="stable")[:keep]
+        if self._over(deadline):
+            return self._dense_order(hits, keep)
+        return [dict(hits[i], rerank_score=round(float(blended[i]), 4)) for i in order]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "over_budget": self.over_budget}
+
+    def _over(self, deadline: float) -> bool:
+        return bool(self.budget_s) and time.perf_counter() > deadline
+
+    def _dense_order(self, hits: List[Dict[str, Any]], keep: int) -> List[Dict[str, Any]]:
+        self.over_budget += 1
+        log.debug("rerank of %d candidates over budget; keeping dense order", len(hits))
+        return hits[:keep]
+
+
+RERANKER = LocalReranker(
+    dense_weight=settings.RAG_RERANK_DENSE_WEIGHT,
+    budget_ms=settings.RAG_RERANK_BUDGET_MS,
+)
@@ -1,20 +1,146 @@
+"""
+Qdrant access for RAG and ingestion.
+
+One AsyncQdrantClient per worker process (QDRANT), so searches and upserts reuse pooled
+connections and never block the event loop; QDRANT_USE_GRPC switches it to gRPC.
+Collections are checked once per worker: after a collection has been found or created,
+ensure_collection returns without a round trip until an operation on it fails.
+
+Points hold the dense embedding as the collection's unnamed vector and, for hybrid
+search, a sparse term vector named SPARSE_VECTOR.
+"""
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from qdrant_client import QdrantClient
+import httpx
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http import models as qm
 
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.metrics import QDRANT_SECONDS
 from orchestrallm.shared.utils.id_utils import make_point_uuid
 
-def ensure_collection(client: QdrantClient, name: str, vector_size: int) -> None:
-    try:
-        client.get_collection(name)
-    except Exception:
-        client.recreate_collection(
-            collection_name=name,
-            vectors_config=qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
-        )
+log = logging.getLogger("qdrant")
+
+SPARSE_VECTOR = "text"
+
+
+class QdrantStore:
+    def __init__(
+        self,
+        *,
+        url: str,
+        api_key: Optional[str] = None,
+        prefer_grpc: bool = False,
+        grpc_port: int = 6334,
+        timeout_s: int = 30,
+        pool_size: int = 32,
+    ) -> None:
+        self.url = url
+        self.api_key = api_key or None
+        self.prefer_grpc = prefer_grpc
+        self.grpc_port = grpc_port
+        self.timeout_s = timeout_s
+        self.pool_size = max(1, int(pool_size))
+        self.collection_checks = 0
+        self._client: Optional[AsyncQdrantClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        # name -> whether it has the sparse vector (None: not checked yet)
+        self._verified: Dict[str, Optional[bool]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def client(self) -> AsyncQdrantClient:
+        """
+        Return the worker's shared AsyncQdrantClient. Must be called from a running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop or self._pid != os.getpid():
+            self._client = AsyncQdrantClient(
+                url=self.url,
+                api_key=self.api_key,
+                prefer_grpc=self.prefer_grpc,
+                grpc_port=self.grpc_port,
+                timeout=self.timeout_s,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+            self._loop = loop
+            self._pid = os.getpid()
+            self._locks.clear()
+        return self._client
+
+    async def ensure_collection(self, name: str, vector_size: int, *, sparse: bool = False) -> bool:
+        """
+        Make sure the collection exists, creating it (with the sparse vector if sparse is
+        set) when missing. Returns whether it has the sparse vector; a collection created
+        without one keeps serving dense search only.
+        """
+        if name in self._verified and not (sparse and self._verified[name] is None):
+            return bool(self._verified[name])
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name in self._verified and not (sparse and self._verified[name] is None):
+                return bool(self._verified[name])
+            client = self.client()
+            self.collection_checks += 1
+            with QDRANT_SECONDS.time(op="collection_exists"):
+                exists = await client.collection_exists(name)
+            has_sparse: Optional[bool] = None
+            if not exists:
+                try:
+                    await client.create_collection(
+                        collection_name=name,
+                        vectors_config=qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
+                        sparse_vectors_config={SPARSE_VECTOR: qm.SparseVectorParams()} if sparse else None,
+                    )
+                    has_sparse = sparse
+                except Exception:
+                    # Another worker may have created it in the meantime.
+                    if not await client.collection_exists(name):
+                        raise
+            if sparse and has_sparse is None:
+                info = await client.get_collection(name)
+                has_sparse = SPARSE_VECTOR in (info.config.params.sparse_vectors or {})
+                if not has_sparse:
+                    log.warning("collection %s has no sparse vector '%s'; hybrid search falls back to dense", name, SPARSE_VECTOR)
+            self._verified[name] = has_sparse
+            return bool(has_sparse)
+
+    def forget_collection(self, name: str) -> None:
+        self._verified.pop(name, None)
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.close()
+        self._client = None
+        self._loop = None
+        self._verified.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "transport": "grpc" if self.prefer_grpc else "http",
+            "pool_size": self.pool_size,
+            "verified_collections": sorted(self._verified),
+            "collection_checks": self.collection_checks,
+        }
+
+
+QDRANT = QdrantStore(
+    url=settings.QDRANT_URL,
+    api_key=settings.QDRANT_API_KEY,
+    prefer_grpc=settings.QDRANT_USE_GRPC,
+    grpc_port=settings.QDRANT_GRPC_PORT,
+    timeout_s=settings.QDRANT_TIMEOUT_S,
+    pool_size=settings.QDRANT_POOL_SIZE,
+)
+
+
+async def ensure_collection(name: str, vector_size: int, *, sparse: bool = False) -> bool:
+    return await QDRANT.ensure_collection(name, vector_size, sparse=sparse)
 
 def build_filter(*, user_id: Optional[str] = None, related_document_id: Optional[str] = None) -> Optional[qm.Filter]:
     must: List[qm.FieldCondition] = []
@@ -24,24 +150,33 @@ def build_filter(*, user_id: Optional[str] = None, related_document_id: Optional
         must.append(qm.FieldCondition(key="document_id", match=qm.MatchValue(value=related_document_id)))
     return qm.Filter(must=must) if must else None
 
-def upsert_points(
-    client: QdrantClient,
+async def upsert_points(
     *,
     collection_name: str,
     vectors: List[List[float]],
     payloads: List[Dict[str, Any]],
     document_id: str,
+    sparse_vectors: Optional[Sequence[Tuple[List[int], List[float]]]] = None,
 ) -> List[str]:
     assert len(vectors) == len(payloads), "vectors/payloads length mismatch"
     points: List[qm.PointStruct] = []
     for idx, (vec, pl) in enumerate(zip(vectors, payloads)):
         pid = make_point_uuid(document_id, idx)
-        points.append(qm.PointStruct(id=pid, vector=vec, payload=pl))
-    client.upsert(collection_name=collection_name, points=points)
+        vector: Any = vec
+        if sparse_vectors is not None:
+            indices, values = sparse_vectors[idx]
+            vector = {"": vec, SPARSE_VECTOR: qm.SparseVector(indices=indices, values=values)}
+        points.append(qm.PointStruct(id=pid, vector=vector, payload=pl))
+    try:
+        with QDRANT_SECONDS.time(op="upsert"):
+            await QDRANT.client().upsert(collection_name=collection_name, points=points)
+    except Exception:
+        # The collection may have been dropped: check it again next time.
+        QDRANT.forget_collection(collection_name)
+        raise
     return [str(p.id) for p in points]
 
-def search(
-    client: QdrantClient,
+async def search(
     *,
     collection_name: str,
     query_vector: List[float],
@@ -49,12 +184,39 @@ def search(
     query_filter: Optional[qm.Filter] = None,
     with_payload: bool = True,
     with_vectors: bool = False,
-):
-    return client.search(
-        collection_name=collection_name,
-        query_vector=query_vector,
-        query_filter=query_filter,
-        limit=limit,
-        with_payload=with_payload,
-        with_vectors=with_vectors,
-    )
+) -> List[qm.ScoredPoint]:
+    try:
+        with QDRANT_SECONDS.time(op="search"):
+            return await QDRANT.client().search(
+                collection_name=collection_name,
+                query_vector=query_vector,
+                query_filter=query_filter,
+                limit=limit,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+    except Exception:
+        QDRANT.forget_collection(collection_name)
+        raise
+
+async def search_sparse(
+    *,
+    collection_name: str,
+    indices: List[int],
+    values: List[float],
+    limit: int = 5,
+    query_filter: Optional[qm.Filter] = None,
+    with_payload: bool = True,
+) -> List[qm.ScoredPoint]:
+    try:
+        with QDRANT_SECONDS.time(op="search_sparse"):
+            return await QDRANT.client().search(
+                collection_name=collection_name,
+                query_vector=qm.NamedSparseVector(name=SPARSE_VECTOR, vector=qm.SparseVector(indices=indices, values=values)),
+                query_filter=query_filter,
+                limit=limit,
+                with_payload=with_payload,
+            )
+    except Exception:
+        QDRANT.forget_collection(collection_name)
+        raise
@@ -0,0 +1,156 @@
+"""
+Cache of RAG retrievals: the query vector and the search hits of a question.
+
+Entries are keyed by user, related document and the normalized query (case and
+whitespace folded), so a repeated follow-up question skips both the query embedding and
+the Qdrant search. Hits are only served while the version they were retrieved under is
+current: run_ingest_task bumps a per-document version and a per-user version (for
+searches over all of a user's documents) in Mongo, shared by all workers. The query
+vector does not depend on the indexed documents and stays valid across versions.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.persistence.mongo import get_db, run_in_db
+
+log = logging.getLogger("rag.retrieval_cache")
+
+
+class RetrievalLookup:
+    """
+    Result of RetrievalCache.get: the cached vector and hits, if any, and the version to
+    store fresh hits under.
+    """
+
+    def __init__(self, key: str, scope: str, version: Optional[int]) -> None:
+        self.key = key
+        self.scope = scope
+        self.version = version
+        self.vector: Optional[List[float]] = None
+        self.hits: Optional[List[Dict[str, Any]]] = None
+
+
+class RetrievalCache:
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        ttl_s: float = 600.0,
+        max_entries: int = 5000,
+        collection: str = "rag_versions",
+    ) -> None:
+        self.enabled = enabled
+        self.ttl_s = float(ttl_s)
+        self.max_entries = max(1, int(max_entries))
+        self.collection = collection
+        self.hits = 0
+        self.vector_hits = 0
+        self.misses = 0
+        # key -> (expires_ts, version, vector, hits)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[int], List[float], List[Dict[str, Any]]]]" = OrderedDict()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.casefold().split()).strip(" ?!.")
+
+    @staticmethod
+    def scope(user_id: str, related_document_id: Optional[str]) -> str:
+        if related_document_id:
+            return "doc:" + json.dumps([user_id, related_document_id])
+        return "user:" + json.dumps([user_id])
+
+    def key(self, user_id: str, related_document_id: Optional[str], query: str, **params: Any) -> str:
+        raw = json.dumps(
+            {"user": user_id, "doc": related_document_id or "", "q": self.normalize(query), **params},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, user_id: str, related_document_id: Optional[str], query: str, **params: Any) -> RetrievalLookup:
+        """
+        Look up a retrieval. params holds whatever else shapes the hits (collection,
+        top-k, embedding model, ...).
+        """
+        scope = self.scope(user_id, related_document_id)
+        lookup = RetrievalLookup(self.key(user_id, related_document_id, query, **params), scope, None)
+        if not self.enabled:
+            return lookup
+        # Read before searching, so hits stored under it are never newer than it says.
+        lookup.version = await run_in_db(self._load_version, scope)
+        entry = self._entries.get(lookup.key)
+        if entry is not None and entry[0] <= time.time():
+            self._entries.pop(lookup.key, None)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return lookup
+
+        self._entries.move_to_end(lookup.key)
+        lookup.vector = entry[2]
+        if lookup.version is not None and entry[1] == lookup.version:
+            lookup.hits = entry[3]
+            self.hits += 1
+        else:
+            self.vector_hits += 1
+        return lookup
+
+    async def put(self, lookup: RetrievalLookup, vector: List[float], hits: List[Dict[str, Any]]) -> None:
+        """
+        Store a fresh retrieval. Hits are stored under the version read before the search,
+        so an ingest that finished during it invalidates them.
+        """
+        if not self.enabled or not vector:
+            return
+        self._entries[lookup.key] = (time.time() + self.ttl_s, lookup.version, list(vector), list(hits))
+        self._entries.move_to_end(lookup.key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, user_id: str, document_id: str) -> None:
+        """
+        Mark retrievals over this document, and over all of the user's documents, stale.
+        """
+        await run_in_db(self._bump_versions, [self.scope(user_id, document_id), self.scope(user_id, None)])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.vector_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "vector_hits": self.vector_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _load_version(self, scope: str) -> Optional[int]:
+        try:
+            doc = get_db()[self.collection].find_one({"_id": scope}, {"v": 1})
+        except PyMongoError as e:
+            log.warning("retrieval cache version lookup failed: %s", e)
+            return None
+        return int(doc.get("v", 0)) if doc else 0
+
+    def _bump_versions(self, scopes: List[str]) -> None:
+        try:
+            for scope in scopes:
+                get_db()[self.collection].update_one({"_id": scope}, {"$inc": {"v": 1}}, upsert=True)
+        except PyMongoError as e:
+            log.warning("retrieval cache invalidation failed: %s", e)
+
+
+RETRIEVAL_CACHE = RetrievalCache(
+    enabled=settings.RAG_CACHE,
+    ttl_s=settings.RAG_CACHE_TTL_S,
+    max_entries=settings.RAG_CACHE_MAX_ENTRIES,
+)
@@ -1,7 +1,7 @@
 from __future__ import annotations
-import asyncio, time, uuid
+import asyncio, uuid
 from fastapi import APIRouter
-from orchestrallm.shared.persistence.mongo import get_db
+from orchestrallm.shared.persistence.mongo import create_task_record_async, set_task_status_async
 from orchestrallm.shared.eventbus.events import publish_event_async
 from .schemas import RecipePayload
 from orchestrallm.features.recipes.app.use_cases import run_recipe_task
@@ -11,17 +11,12 @@ router = APIRouter(tags=["tasks:recipes"])
 @router.post("/tasks/recipes")
 async def create_recipe_task(payload: RecipePayload):
     task_id = str(uuid.uuid4())
-    get_db().tasks.update_one(
-        {"task_id": task_id},
-        {"$set": {"type":"recipes","status":"queued","user_id":payload.user_id,"session_id":payload.session_id,"created_at":time.time()}},
-        upsert=True,
-    )
+    await create_task_record_async(task_id, "recipes", user_id=payload.user_id, session_id=payload.session_id)
     asyncio.create_task(_run(task_id, payload))
     return {"task_id": task_id, "status": "queued"}
 
 async def _run(task_id: str, payload: RecipePayload):
-    db = get_db()
-    db.tasks.update_one({"task_id": task_id}, {"$set": {"status": "running"}})
+    await set_task_status_async(task_id, "running")
     try:
         await run_recipe_task(
             task_id,
@@ -29,8 +24,8 @@ async def _run(task_id: str, payload: RecipePayload):
             payload.session_id,
             payload.query or ""
         )
-        db.tasks.update_one({"task_id": task_id}, {"$set": {"status": "done"}})
+        await set_task_status_async(task_id, "done")
         await publish_event_async({"task_id": task_id, "type": "done"})
     except Exception as e:
-        db.tasks.update_one({"task_id": task_id}, {"$set": {"status": "error","error": str(e)}})
+        await set_task_status_async(task_id, "error", error=str(e))
         await publish_event_async({"task_id": task_id, "type": "error", "message": str(e)})
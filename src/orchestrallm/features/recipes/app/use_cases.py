@@ -8,7 +8,7 @@ from typing import Any, Dict, List
 from orchestrallm.features.recipes.infra.recipes_web import search_and_extract_recipe, parse_recipe_from_text
 from orchestrallm.shared.llm.openai_client import stream_chat, complete_chat
 from orchestrallm.shared.eventbus.events import send_status, send_token, send_error, send_done
-from orchestrallm.shared.history import append_message
+from orchestrallm.shared.history import append_message_async
 from orchestrallm.features.recipes.domain.prompts import RECIPE_RECOMMENDER_PROMPT, RECIPE_WRITER_PROMPT
 
 _RE_JSON = re.compile(r'\{(?:[^{}]|\{[^{}]*\})*\}')
@@ -117,7 +117,7 @@ async def run_recipe_task(task_id: str, user_id: str, session_id: str, prompt: s
     """
     try:
         if lang.startswith("tr"):
-            append_message(
+            await append_message_async(
                 user_id=user_id,
                 session_id=session_id,
                 role="user",
@@ -127,7 +127,7 @@ async def run_recipe_task(task_id: str, user_id: str, session_id: str, prompt: s
             status_collecting = "Kaynaklar toplanıyor..."
             error_prefix = "Hata"
         else:
-            append_message(
+            await append_message_async(
                 user_id=user_id,
                 session_id=session_id,
                 role="user",
@@ -167,7 +167,7 @@ async def run_recipe_task(task_id: str, user_id: str, session_id: str, prompt: s
         async for tok in _stream_story(enriched, lang):
             await send_token(task_id, tok)
 
-        append_message(user_id=user_id, session_id=session_id, role="assistant", content=outline)
+        await append_message_async(user_id=user_id, session_id=session_id, role="assistant", content=outline)
 
         await send_done(task_id)
     except Exception as e:
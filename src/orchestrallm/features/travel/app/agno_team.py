@@ -1,10 +1,12 @@
 from __future__ import annotations
 import json
-from typing import AsyncGenerator, Dict, List
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
 from orchestrallm.shared.llm.openai_client import stream_chat
+from orchestrallm.shared.llm.prompt import MESSAGE_OVERHEAD_TOKENS, assemble_sections
+from orchestrallm.shared.llm.tokens import estimate_tokens
 from orchestrallm.shared.websearch.ddg import ddg_search
-from orchestrallm.features.travel.infra.memory import load_last_state, save_travel_state
+from orchestrallm.features.travel.infra.memory import load_last_state_async, save_travel_state_async
 from orchestrallm.features.travel.domain.prompts import (TRAVEL_PLANNER_SYSTEM_PROMPT, 
                            TRAVEL_SEARCHER_SYSTEM_PROMPT,  
                            TRAVEL_WRITER_SYSTEM_PROMPT)
@@ -19,12 +21,32 @@ def _as_str(x) -> str:
     except Exception:
         return str(x)
 
+_REPLY_TOKENS = 4096
+
+OnPrompt = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+async def _fit_sections(
+    stage: str,
+    system_text: str,
+    sections: Sequence[Tuple[str, str, int]],
+    on_prompt: Optional[OnPrompt],
+) -> Dict[str, str]:
+    """
+    Fit the sections of an agent's user message into the prompt budget, next to its system prompt.
+    """
+    # System prompt, both message wrappers and the section headers.
+    reserved = estimate_tokens(system_text) + 2 * MESSAGE_OVERHEAD_TOKENS + 32
+    fitted, report = assemble_sections(sections, reserved=reserved, reply_tokens=_REPLY_TOKENS)
+    if on_prompt is not None:
+        await on_prompt(stage, report)
+    return fitted
+
 async def _collect_stream(messages: List[Dict], temperature: float = 0.2) -> str:
     """
     Collect streamed tokens into a single string.
     """
     buf: List[str] = []
-    async for tok in stream_chat(messages, temperature=temperature, max_tokens=4096):
+    async for tok in stream_chat(messages, temperature=temperature, max_tokens=_REPLY_TOKENS):
         if tok:
             buf.append(tok)
     return "".join(buf).strip()
@@ -45,12 +67,14 @@ async def stream_travel_plan(
     session_id: str,
     query: str,
     context_id: str | None = None,
+    on_prompt: Optional[OnPrompt] = None,
 ) -> AsyncGenerator[str, None]:
     """
     This function coordinates multiple agents to research, plan, and write a travel itinerary.
-    It streams the final written itinerary back as tokens.
+    It streams the final written itinerary back as tokens. Each agent's prompt is fitted into
+    the token budget; on_prompt(stage, report) receives the resulting token counts.
     """
-    last_state = load_last_state(user_id=user_id, session_id=session_id) or {}
+    last_state = await load_last_state_async(user_id=user_id, session_id=session_id) or {}
     current_plan_text = last_state.get("plan_text", "") or ""
     current_final_text = last_state.get("final_text", "") or ""
     has_current = bool(current_plan_text or current_final_text)
@@ -59,38 +83,55 @@ async def stream_travel_plan(
     search_json = json.dumps(results, ensure_ascii=False, indent=2)
 
     # --- Researcher ---
+    fit = await _fit_sections("research", TRAVEL_SEARCHER_SYSTEM_PROMPT, [
+        ("query", query, 0),
+        ("current_plan", current_plan_text if has_current else "", 1),
+        ("search_results", search_json, 2),
+    ], on_prompt)
     researcher_user = _as_str(
-        f"USER DEMAND: {query}\n\n"
-        f"[CURRENT PLAN]\n{current_plan_text if has_current else '(yok)'}\n\n"
-        f"[SEARCH RESULTS]\n{search_json}"
+        f"USER DEMAND: {fit['query']}\n\n"
+        f"[CURRENT PLAN]\n{fit['current_plan'] or '(yok)'}\n\n"
+        f"[SEARCH RESULTS]\n{fit['search_results']}"
     )
     research_text = await _collect_stream(_mk_msgs(TRAVEL_SEARCHER_SYSTEM_PROMPT, researcher_user), temperature=0.1)
 
     # --- Planner ---
+    fit = await _fit_sections("planning", TRAVEL_PLANNER_SYSTEM_PROMPT, [
+        ("query", query, 0),
+        ("current_plan", current_plan_text if has_current else "", 1),
+        ("research", research_text, 2),
+    ], on_prompt)
     planner_user = _as_str(
-        f"USER DEMAND: {query}\n\n"
-        f"[CURRENT PLAN]\n{current_plan_text if has_current else '(yok)'}\n\n"
-        f"[SEARCH RESULTS]\n{research_text}"
+        f"USER DEMAND: {fit['query']}\n\n"
+        f"[CURRENT PLAN]\n{fit['current_plan'] or '(yok)'}\n\n"
+        f"[SEARCH RESULTS]\n{fit['research']}"
     )
     plan_text = await _collect_stream(_mk_msgs(TRAVEL_PLANNER_SYSTEM_PROMPT, planner_user), temperature=0.2)
 
+    # --- Writer ---
+    fit = await _fit_sections("writing", TRAVEL_WRITER_SYSTEM_PROMPT, [
+        ("query", query, 0),
+        ("current_plan", current_plan_text if has_current else "", 1),
+        ("research", research_text, 2),
+        ("plan", plan_text, 3),
+    ], on_prompt)
     writer_user = _as_str(
-        f"USER DEMAND: {query}\n\n"
-        f"[CURRENT PLAN]\n{current_plan_text if has_current else '(yok)'}\n\n"
-        f"[NEW PLAN EXAMPLE]\n{plan_text}\n\n"
-        f"[DETAILED RESEARCH RESULT]\n{research_text}"
+        f"USER DEMAND: {fit['query']}\n\n"
+        f"[CURRENT PLAN]\n{fit['current_plan'] or '(yok)'}\n\n"
+        f"[NEW PLAN EXAMPLE]\n{fit['plan']}\n\n"
+        f"[DETAILED RESEARCH RESULT]\n{fit['research']}"
         f"[IMPORTANT NOTE: Always respond in the same language as the USER DEMAND.]"
     )
 
     final_buf: List[str] = []
-    async for tok in stream_chat(_mk_msgs(TRAVEL_WRITER_SYSTEM_PROMPT, writer_user), temperature=0.15, max_tokens=4096):
+    async for tok in stream_chat(_mk_msgs(TRAVEL_WRITER_SYSTEM_PROMPT, writer_user), temperature=0.15, max_tokens=_REPLY_TOKENS):
         if tok:
             final_buf.append(tok)
             yield tok
     final_text = "".join(final_buf).strip()
 
 
-    save_travel_state(
+    await save_travel_state_async(
         user_id=user_id,
         session_id=session_id,
         payload={"research_text": research_text, "plan_text": plan_text, "final_text": final_text, "query": query},
@@ -27,11 +27,15 @@ async def run_travel_task(
         await send_status(task_id, "[travel] planning is being initiated")
         await send_status(task_id, "[travel] writing is being initiated")
 
+        async def on_prompt(stage: str, report: dict) -> None:
+            await send_status(task_id, f"[travel] {stage} prompt assembled", prompt=report)
+
         async for tok in stream_travel_plan(
             user_id=user_id,
             session_id=session_id,
             query=query,
             context_id=task_id,
+            on_prompt=on_prompt,
         ):
             if tok:
                 await send_token(task_id, tok)
@@ -3,7 +3,7 @@ from __future__ import annotations
 import time
 from typing import Any, Dict, Optional
 
-from orchestrallm.shared.persistence.mongo import get_db
+from orchestrallm.shared.persistence.mongo import get_db, run_in_db
 
 _CONTEXT = "travel"
 _META_KEYS = {"_id", "context", "user_id", "session_id", "updated_at"}
@@ -53,3 +53,17 @@ def load_last_state(user_id: str, session_id: str) -> Dict[str, Any]:
     if not doc:
         return {}
     return {k: v for k, v in doc.items() if k not in _META_KEYS}
+
+
+async def save_travel_state_async(user_id: str, session_id: str, state: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+    """
+    Async variant of save_travel_state; runs on the Mongo thread pool.
+    """
+    return await run_in_db(save_travel_state, user_id, session_id, state, **kwargs)
+
+
+async def load_last_state_async(user_id: str, session_id: str) -> Dict[str, Any]:
+    """
+    Async variant of load_last_state; runs on the Mongo thread pool.
+    """
+    return await run_in_db(load_last_state, user_id, session_id)
@@ -1,4 +1,245 @@
+"""
+Adaptive concurrency limits for upstream LLM calls.
+
+Each (endpoint, model) pair gets its own pool whose limit follows AIMD: it grows by about
+one slot per limit's worth of successful calls, and shrinks multiplicatively on 429s,
+upstream errors, or when time-to-first-token rises well above its observed baseline.
+Decreases are spaced by the smoothed latency so one burst of throttling counts once.
+With LLM_LIMIT_MODE=static the pools keep a fixed limit of LLM_MAX_CONCURRENCY.
+"""
+from __future__ import annotations
+
 import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
 from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.metrics import LLM_QUEUE_WAIT
+
+
+class SlotAbandoned(Exception):
+    """
+    Raised by slot() when its abandon event fires while the caller is still queued.
+    """
+
+
+class Permit:
+    """
+    One acquired slot. The holder reports how the call went; a call left unreported
+    counts as a success, or as an error if it raised.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.ttft: Optional[float] = None
+        self.outcome: Optional[str] = None
+        self.wait_s = 0.0
+
+    def first_token(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started
+
+    def throttled(self) -> None:
+        self.outcome = "throttled"
+
+    def failed(self) -> None:
+        self.outcome = "error"
+
+    def neutral(self) -> None:
+        """The call failed for reasons unrelated to upstream load (e.g. a 400)."""
+        self.outcome = "neutral"
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        backoff: float = 0.7,
+        latency_tolerance: float = 2.0,
+        adaptive: bool = True,
+    ) -> None:
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.throttled = 0
+        self.errors = 0
+        self.decreases = 0
+        self.completed = 0
+        self.wait_ewma_s = 0.0
+        self.wait_max_s = 0.0
+        self._baseline_s: Optional[float] = None
+        self._latency_ewma_s: Optional[float] = None
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def queued(self) -> int:
+        """Callers waiting for a slot."""
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, abandon: Optional[asyncio.Event] = None) -> AsyncIterator[Permit]:
+        """
+        Hold one slot for the duration of the block. If abandon is set while the caller is
+        still waiting for a slot, the wait ends with SlotAbandoned.
+        """
+        permit = Permit()
+        await self._acquire(permit, abandon)
+        LLM_QUEUE_WAIT.observe(permit.wait_s, pool=self.name)
+        try:
+            yield permit
+        except (asyncio.CancelledError, GeneratorExit):
+            permit.outcome = permit.outcome or "neutral"
+            raise
+        except BaseException:
+            permit.outcome = permit.outcome or "error"
+            raise
+        finally:
+            self._release(permit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "wait_ms_avg": round(self.wait_ewma_s * 1000, 1),
+            "wait_ms_max": round(self.wait_max_s * 1000, 1),
+            "ttft_ms_baseline": round(self._baseline_s * 1000, 1) if self._baseline_s else None,
+            "completed": self.completed,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "decreases": self.decreases,
+        }
+
+    async def _acquire(self, permit: Permit, abandon: Optional[asyncio.Event] = None) -> None:
+        t0 = time.monotonic()
+        if self._waiters or self.in_flight >= self.current_limit:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                if abandon is None:
+                    await fut
+                else:
+                    watcher = asyncio.ensure_future(abandon.wait())
+                    try:
+                        await asyncio.wait((fut, watcher), return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        watcher.cancel()
+                    if not fut.done():
+                        # Granting a slot pops and resolves the future in one step, so an
+                        # unresolved future is still queued.
+                        self._waiters.remove(fut)
+                        fut.cancel()
+                        raise SlotAbandoned(self.name)
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # The slot was granted just as we were cancelled: hand it on.
+                    self.in_flight -= 1
+                    self._wake()
+                elif fut in self._waiters:
+                    self._waiters.remove(fut)
+                raise
+        else:
+            self.in_flight += 1
+        permit.wait_s = time.monotonic() - t0
+        permit.started = time.monotonic()
+        self.wait_ewma_s += 0.1 * (permit.wait_s - self.wait_ewma_s)
+        self.wait_max_s = max(self.wait_max_s, permit.wait_s)
+
+    def _release(self, permit: Permit) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        if self.adaptive:
+            self._adapt(permit)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.current_limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+
+    def _adapt(self, permit: Permit) -> None:
+        if permit.outcome == "throttled":
+            self.throttled += 1
+            self._decrease()
+            return
+        if permit.outcome == "error":
+            self.errors += 1
+            self._decrease()
+            return
+        if permit.outcome == "neutral":
+            return
+
+        sample = permit.ttft if permit.ttft is not None else time.monotonic() - permit.started
+        if self._baseline_s is None:
+            self._baseline_s = self._latency_ewma_s = sample
+        else:
+            # The baseline tracks the lowest latency seen, drifting up slowly so that a
+            # lasting shift (another model version, another region) is eventually accepted.
+            self._baseline_s = min(sample, self._baseline_s + 0.01 * (sample - self._baseline_s))
+            self._latency_ewma_s += 0.2 * (sample - self._latency_ewma_s)
+        if sample > self.latency_tolerance * self._baseline_s:
+            self._decrease()
+        elif self.in_flight + 1 >= self.current_limit or self._waiters:
+            # Only grow while the limit is actually the bottleneck.
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < max(0.1, self._latency_ewma_s or 0.0):
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+
+
+class LimiterRegistry:
+    """
+    One AdaptiveLimiter per (upstream, endpoint, model), created on first use.
+    max_limit caps the pool of an upstream with its own concurrency limit.
+    """
+
+    def __init__(self, **defaults: Any) -> None:
+        self.defaults = defaults
+        self._pools: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, endpoint: str, model: str, *, upstream: str = "", max_limit: Optional[int] = None) -> AdaptiveLimiter:
+        name = f"{upstream}/{endpoint}:{model}" if upstream else f"{endpoint}:{model}"
+        pool = self._pools.get(name)
+        if pool is None:
+            options = dict(self.defaults)
+            if max_limit:
+                options["max_limit"] = min(options.get("max_limit", max_limit), max_limit)
+                options["initial"] = min(options.get("initial", max_limit), max_limit)
+            pool = self._pools[name] = AdaptiveLimiter(name, **options)
+        return pool
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
 
-LLM_STREAM_SEMAPHORE = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+LLM_LIMITERS = LimiterRegistry(
+    initial=settings.LLM_MAX_CONCURRENCY,
+    min_limit=settings.LLM_LIMIT_MIN,
+    max_limit=settings.LLM_LIMIT_MAX,
+    backoff=settings.LLM_LIMIT_BACKOFF,
+    latency_tolerance=settings.LLM_LIMIT_LATENCY_TOLERANCE,
+    adaptive=(settings.LLM_LIMIT_MODE.lower() == "adaptive"),
+)
@@ -6,6 +6,7 @@ import logging
 class Settings(BaseSettings):
     # General
     LOG_LEVEL: str = Field(default="INFO", description="Application log level")
+    METRICS_ENABLED: bool = Field(default=True, description="Record Prometheus metrics and serve them on /metrics")
     BIND: str = Field(default="0.0.0.0:8076", description="API bind address")
 
     # CORS
@@ -17,13 +18,46 @@ class Settings(BaseSettings):
     # LLM
     OPENAI_API_KEY: str = Field(default="", description="OpenAI API key")
     OPENAI_BASE_URL: str = Field(default="https://api.openai.com/v1", description="OpenAI base URL")
+    OPENAI_UPSTREAMS: str = Field(default="", description="JSON list of OpenAI-compatible upstreams to balance chat and embeddings across; empty uses OPENAI_BASE_URL")
     CHAT_MODEL: str = Field(default="gpt-4o-mini", description="Chat model ID")
     EMBEDDING_MODEL: str = Field(default="text-embedding-3-small", description="Embedding model ID")
     EMBEDDING_DIMENSIONS: int = Field(default=1536)
+    EMBED_BATCH_MAX_TOKENS: int = Field(default=20000, description="Estimated token budget of one embedding request")
+    EMBED_BATCH_MAX_ITEMS: int = Field(default=512, description="Maximum texts in one embedding request")
+    EMBED_CONCURRENCY: int = Field(default=4, description="Embedding requests in flight per bulk embedding call")
+    EMBED_MAX_RETRIES: int = Field(default=6, description="Retries of a failed embedding request (429, 5xx, network errors)")
+    EMBEDDING_CACHE: bool = Field(default=True, description="Cache embeddings by model and text hash")
+    EMBEDDING_CACHE_MAX_MB: int = Field(default=256, description="Memory budget of the in-process embedding cache (MB)")
+    EMBEDDING_CACHE_PERSIST: bool = Field(default=True, description="Also keep cached embeddings in Mongo, shared by all workers")
+    EMBEDDING_CACHE_COLLECTION: str = Field(default="embedding_cache", description="Mongo collection of the persistent embedding cache")
+    EMBEDDING_CACHE_TTL_DAYS: float = Field(default=30.0, description="TTL of persisted embeddings (days); 0 keeps them forever")
+    EMBEDDING_CACHE_FLOAT32: bool = Field(default=True, description="Store cached embeddings as float32 (half the size, ~7 significant digits); false keeps the API's float64 values")
     MAX_TOKENS: int = Field(default=4096, description="Maximum token count")
     TEMPERATURE: float = Field(default=0.0, description="Temperature")
-    LLM_MAX_CONCURRENCY: int = Field(default=10, description="Maximum concurrency for LLM requests")
+    LLM_MAX_CONCURRENCY: int = Field(default=10, description="Initial (adaptive) or fixed (static) concurrency for LLM requests")
     LLM_REQUEST_TIMEOUT: int = Field(default=60, description="LLM HTTP timeout (seconds)")
+    LLM_LIMIT_MODE: str = Field(default="adaptive", description="Concurrency limit per model and endpoint: adaptive | static (LLM_MAX_CONCURRENCY)")
+    LLM_LIMIT_MIN: int = Field(default=1, description="Lowest adaptive concurrency limit")
+    LLM_LIMIT_MAX: int = Field(default=100, description="Highest adaptive concurrency limit")
+    LLM_LIMIT_BACKOFF: float = Field(default=0.7, description="Factor applied to the limit on throttling, errors or latency spikes")
+    LLM_LIMIT_LATENCY_TOLERANCE: float = Field(default=2.0, description="Time-to-first-token above this multiple of the baseline lowers the limit")
+    COMPLETION_CACHE: bool = Field(default=False, description="Cache chat completions of low-temperature requests")
+    COMPLETION_CACHE_TTL_S: int = Field(default=3600, description="Lifetime of a cached completion (seconds)")
+    COMPLETION_CACHE_MAX_ENTRIES: int = Field(default=1000, description="Maximum completions kept in the in-process cache")
+    COMPLETION_CACHE_MAX_TEMPERATURE: float = Field(default=0.3, description="Only requests at or below this temperature are cached")
+    COMPLETION_CACHE_PERSIST: bool = Field(default=False, description="Also keep cached completions in Mongo, shared by all workers")
+    COMPLETION_CACHE_COLLECTION: str = Field(default="completion_cache", description="Mongo collection of the persistent completion cache")
+    LLM_STREAM_USAGE: bool = Field(default=True, description="Ask for token usage in the final chunk of streamed completions (stream_options.include_usage)")
+    LLM_COALESCE: bool = Field(default=True, description="Share one upstream call among identical in-flight embedding and deterministic chat requests")
+    LLM_COALESCE_MAX_TEMPERATURE: float = Field(default=0.0, description="Chat requests at or below this temperature are coalesced")
+    LLM_HEDGE: bool = Field(default=False, description="Send a duplicate of a slow latency-critical LLM call (complete_chat, query embeddings); the first answer wins")
+    LLM_HEDGE_PERCENTILE: float = Field(default=95.0, description="Hedge once a call is slower than this percentile of recent calls of its kind")
+    LLM_HEDGE_MIN_DELAY_MS: int = Field(default=50, description="Never hedge a call earlier than this")
+    LLM_HEDGE_BUDGET: float = Field(default=0.05, description="Hedges allowed per LLM call, capping the extra upstream load")
+    LLM_HTTP2: bool = Field(default=True, description="Use HTTP/2 for LLM API calls (needs the 'h2' package)")
+    LLM_POOL_MAX_CONNECTIONS: int = Field(default=100, description="Maximum open connections to the LLM API per worker")
+    LLM_POOL_MAX_KEEPALIVE: int = Field(default=20, description="Maximum idle kept-alive connections to the LLM API per worker")
+    LLM_POOL_KEEPALIVE_EXPIRY_S: float = Field(default=30.0, description="Idle time before a kept-alive LLM connection is closed (seconds)")
 
     # Data Layer
     MONGODB_URI: str = Field(
@@ -36,17 +70,57 @@ class Settings(BaseSettings):
         description="MongoDB database name",
         validation_alias="MONGO_DB",
     )
+    MONGO_EXECUTOR_WORKERS: int = Field(default=32, description="Threads running blocking Mongo calls for async code paths")
     QDRANT_URL: str = Field(default="http://qdrant:6333", description="Qdrant HTTP URL")
     QDRANT_COLLECTION: str = Field(default="rag_docs", description="Qdrant collection name")
+    QDRANT_API_KEY: str = Field(default="", description="Qdrant API key (empty for none)")
+    QDRANT_USE_GRPC: bool = Field(default=False, description="Talk to Qdrant over gRPC instead of HTTP")
+    QDRANT_GRPC_PORT: int = Field(default=6334, description="Qdrant gRPC port")
+    QDRANT_TIMEOUT_S: int = Field(default=30, description="Timeout of one Qdrant request (s)")
+    QDRANT_POOL_SIZE: int = Field(default=32, description="Pooled HTTP connections to Qdrant per worker")
+
+    # Stream persistence
+    STREAM_PERSIST_MODE: str = Field(default="batched", description="Stream event persistence: sync | batched")
+    STREAM_FLUSH_MAX_EVENTS: int = Field(default=64, description="Flush a task's buffered events once this many are pending")
+    STREAM_FLUSH_INTERVAL_MS: int = Field(default=200, description="Maximum time a buffered event waits before being flushed")
+    STREAM_TAIL_INTERVAL_MS: int = Field(default=250, description="Poll interval of the shared stream tailer when change streams are unavailable")
+    STREAM_TAIL_CHANGE_STREAMS: bool = Field(default=True, description="Follow 'streams' with a Mongo change stream when the deployment supports it")
+    STREAM_WS_FLUSH_MS: int = Field(default=25, description="Flush interval of batched WebSocket frames (opt-in per connection)")
+    STREAM_WS_MAX_BATCH: int = Field(default=256, description="Maximum events per batched WebSocket frame")
+    STREAM_SEQ_MODE: str = Field(default="local", description="Stream seq allocation: local | counter (multiple producers per task)")
+    STREAM_SEQ_IDLE_TTL_S: int = Field(default=3600, description="Forget the in-memory seq of a task without events for this long (seconds)")
+    STREAM_SEQ_MAX_TASKS: int = Field(default=10000, description="Most tasks whose seq is tracked in memory; the least recently used are forgotten")
+    STREAM_COMPACTION: bool = Field(default=True, description="Merge a finished task's events into one compact document")
+    STREAM_COMPACT_DELAY_S: int = Field(default=30, description="Delay between a task's terminal event and its compaction (seconds)")
+    STREAM_RETENTION_HOURS: int = Field(default=168, description="TTL of 'streams' and 'counters' documents (hours); 0 keeps them forever")
+
+    # Event bus
+    EVENT_BUS_BACKEND: str = Field(default="inproc", description="Event bus backend: inproc | mongo (cross-worker)")
+    EVENT_BUS_COLLECTION: str = Field(default="stream_bus", description="Capped collection used by the mongo event bus")
+    EVENT_BUS_QUEUE_SIZE: int = Field(default=1000, description="Maximum queued events per WebSocket subscriber")
+    EVENT_BUS_OVERFLOW: str = Field(default="merge", description="Slow-subscriber policy: merge | backfill | disconnect")
+    EVENT_BUS_CAPPED_BYTES: int = Field(default=64 * 1024 * 1024, description="Size of the mongo event bus capped collection (bytes)")
 
     # RAG settings
     RAG_TOPK: int = Field(default=5, description="Number of documents to retrieve")
+    RAG_CACHE: bool = Field(default=True, description="Cache query vectors and search hits of RAG questions per user and document")
+    RAG_CACHE_TTL_S: int = Field(default=600, description="Lifetime of a cached RAG retrieval (s)")
+    RAG_CACHE_MAX_ENTRIES: int = Field(default=5000, description="Cached RAG retrievals per worker")
+    RAG_SEARCH_MODE: str = Field(default="dense", description="Search mode: dense | hybrid (dense + sparse term vectors fused with RRF)")
+    RAG_HYBRID_CANDIDATES: int = Field(default=20, description="Hits fetched by each of the dense and sparse searches in hybrid mode")
+    RAG_RRF_K: int = Field(default=60, description="Rank constant k of reciprocal rank fusion")
+    RAG_RRF_DENSE_WEIGHT: float = Field(default=1.0, description="Weight of the dense ranking in fusion")
+    RAG_RRF_SPARSE_WEIGHT: float = Field(default=1.0, description="Weight of the sparse ranking in fusion")
     RAG_RERANK_MODE: str = Field(default="none", description="Rerank mode: none | local | api")
+    RAG_RERANK_TOPK: int = Field(default=30, description="Candidates fetched from Qdrant and reranked; the best RAG_TOPK of them are kept")
+    RAG_RERANK_DENSE_WEIGHT: float = Field(default=0.5, description="Weight of the dense score in the local rerank blend (the rest is BM25)")
+    RAG_RERANK_BUDGET_MS: float = Field(default=25.0, description="Latency budget of local reranking; over it the dense order is kept")
     RAG_CHUNK_SIZE: int = Field(default=750, description="Chunk size (characters)")
     RAG_CHUNK_OVERLAP: int = Field(default=100, description="Chunk overlap (characters)")
 
     # Chat history
     HISTORY_MAX_TURNS: int = Field(default=20, description="Maximum number of turns stored in conversation history")
+    PROMPT_MAX_TOKENS: int = Field(default=16000, description="Estimated token budget of an assembled prompt (also capped by the model's context window minus max_tokens)")
 
     model_config = SettingsConfigDict(
         env_file=".env",
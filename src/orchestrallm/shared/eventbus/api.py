@@ -1,64 +1,112 @@
 from __future__ import annotations
 
 import asyncio
-import json
 from typing import Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.eventbus.bus import DISCONNECT, RESYNC
 from orchestrallm.shared.eventbus.events import EVENT_BUS
-from orchestrallm.shared.persistence.mongo import get_db
+from orchestrallm.shared.eventbus.frames import FrameSender, negotiate_encoding
+from orchestrallm.shared.eventbus.tailer import STREAM_TAILER
+from orchestrallm.shared.eventbus.writer import STREAM_WRITER, TERMINAL_TYPES
+from orchestrallm.shared.persistence.mongo import cut_token_run, load_stream_events_async
 
 router = APIRouter(tags=["stream"])
 
-def _ws_send_json(ws: WebSocket, obj: dict):
-    return ws.send_text(json.dumps(obj, ensure_ascii=False, default=str))
+@router.get("/streams/stats")
+def stream_stats():
+    return {
+        "bus": EVENT_BUS.stats(),
+        "writer": STREAM_WRITER.stats(),
+        "tailer": STREAM_TAILER.stats(),
+    }
 
 @router.websocket("/stream/{task_id}")
-async def stream_ws(ws: WebSocket, task_id: str, from_seq: Optional[int] = Query(default=None)):
-    await ws.accept()
-    db = get_db()
+async def stream_ws(
+    ws: WebSocket,
+    task_id: str,
+    from_seq: Optional[int] = Query(default=None),
+    batch: Optional[str] = Query(default=None),
+):
+    encoding, subprotocol = negotiate_encoding(ws.scope.get("subprotocols") or [], batch)
+    await ws.accept(subprotocol=subprotocol)
+    sender = FrameSender(
+        ws,
+        encoding,
+        flush_interval_s=settings.STREAM_WS_FLUSH_MS / 1000.0,
+        max_batch=settings.STREAM_WS_MAX_BATCH,
+    )
     last_seq = int(from_seq) if from_seq is not None else 0
+    finished = False
 
-    for ev in db.streams.find({"task_id": task_id, "seq": {"$gt": last_seq}}).sort("seq", 1):
-        s = int(ev.get("seq", 0))
-        if s > last_seq:
-            last_seq = s
-            await _ws_send_json(ws, ev)
+    async def backfill():
+        nonlocal last_seq, finished
+        for ev in await load_stream_events_async(task_id, last_seq):
+            s = int(ev.get("seq", 0))
+            if s > last_seq:
+                last_seq = s
+                finished = finished or ev.get("type") in TERMINAL_TYPES
+                await sender.send(ev)
+
+    await backfill()
 
     q = await EVENT_BUS.subscribe(task_id)
+    # Events published on other workers (or before the bus subscription) arrive through the
+    # shared tailer once persisted; a finished task needs no tailing.
+    tq = None if finished else await STREAM_TAILER.subscribe(task_id, last_seq)
+
+    async def resync(queue):
+        # The queue overflowed and dropped events: read them from storage until live
+        # delivery can resume without a gap.
+        while True:
+            await STREAM_WRITER.flush(task_id)
+            await backfill()
+            if queue.reattach(last_seq) or finished:
+                return
+            await asyncio.sleep(settings.STREAM_TAIL_INTERVAL_MS / 1000.0)
 
-    async def pump_bus():
+    async def pump(queue):
         nonlocal last_seq
         try:
             while True:
-                ev = await q.get()
-                s = int(ev.get("seq", 0))
-                if s > last_seq:
-                    last_seq = s
-                    await _ws_send_json(ws, ev)
+                ev = await queue.get()
+                if ev is RESYNC:
+                    await resync(queue)
+                    continue
+                if ev is DISCONNECT:
+                    # Deliver what was already batched, and say where to resume.
+                    await sender.flush()
+                    await ws.close(code=1013, reason=f"slow consumer; reconnect with from_seq={last_seq}")
+                    return
+                # Both pumps share last_seq: a merged token run may start with tokens
+                # the other pump has already sent.
+                out = cut_token_run(ev, last_seq)
+                if out is not None:
+                    last_seq = int(ev["seq"])
+                    await sender.send(out)
         except Exception:
             pass
 
-    async def pump_db():
-        nonlocal last_seq
+    async def until_disconnect():
         try:
-            while True:
-                cur = db.streams.find({"task_id": task_id, "seq": {"$gt": last_seq}}).sort("seq", 1)
-                for ev in cur:
-                    s = int(ev.get("seq", 0))
-                    if s > last_seq:
-                        last_seq = s
-                        await _ws_send_json(ws, ev)
-                await asyncio.sleep(0.25)
+            while (await ws.receive()).get("type") != "websocket.disconnect":
+                pass
         except Exception:
             pass
 
-    t1 = asyncio.create_task(pump_bus())
-    t2 = asyncio.create_task(pump_db())
+    pumps = [asyncio.create_task(pump(q)), asyncio.create_task(until_disconnect())]
+    if sender.batched:
+        pumps.append(asyncio.create_task(sender.run()))
+    if tq is not None:
+        pumps.append(asyncio.create_task(pump(tq)))
     try:
-        await asyncio.gather(t1, t2)
+        await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
     except WebSocketDisconnect:
         pass
     finally:
-        t1.cancel(); t2.cancel()
+        for t in pumps:
+            t.cancel()
         await EVENT_BUS.unsubscribe(task_id, q)
+        if tq is not None:
+            await STREAM_TAILER.unsubscribe(task_id, tq)
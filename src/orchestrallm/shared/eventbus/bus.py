@@ -0,0 +1,193 @@
+"""
+Event bus backends. Every backend delivers published events to the asyncio queues of
+local subscribers of the event's task; cross-process backends additionally relay events
+between workers.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Protocol, Tuple
+
+
+class EventBus(Protocol):
+    async def subscribe(self, task_id: str) -> asyncio.Queue: ...
+
+    async def unsubscribe(self, task_id: str, q: asyncio.Queue) -> None: ...
+
+    async def publish(self, ev: Dict[str, Any]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+# Markers put on a subscriber queue after an overflow; see SubscriberQueue.
+RESYNC = object()
+DISCONNECT = object()
+
+# Upper bound for the content of one merged token event.
+_MERGE_MAX_CHARS = 64 * 1024
+
+
+class SubscriberQueue(asyncio.Queue):
+    """
+    Bounded subscriber queue that applies an overflow policy instead of dropping events.
+
+    Policies:
+      - "merge":      coalesce queued runs of consecutive token events into larger
+                      ones (with 'seq_from' and 'sizes', see cut_token_run); falls back
+                      to "backfill" when nothing can be merged.
+      - "backfill":   drop the queued events and put RESYNC. The subscriber is detached
+                      from live delivery until it has read everything up to the last
+                      dropped seq from storage and calls reattach().
+      - "disconnect": drop the queued events and put DISCONNECT.
+    """
+
+    def __init__(self, maxsize: int = 1000, policy: str = "merge") -> None:
+        super().__init__(maxsize=maxsize)
+        self.policy = (policy or "merge").lower()
+        self.overflows: Dict[str, int] = {"merged": 0, "backfill": 0, "disconnect": 0}
+        self.detached = False
+        self.dropped_through = 0
+        self.closed = False
+
+    def offer(self, ev: Dict[str, Any]) -> None:
+        if self.closed:
+            return
+        if self.detached:
+            self.dropped_through = max(self.dropped_through, int(ev.get("seq", 0)))
+            return
+        try:
+            self.put_nowait(ev)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == "merge" and self._merge(ev):
+            self.overflows["merged"] += 1
+        elif self.policy == "disconnect":
+            self.overflows["disconnect"] += 1
+            self.closed = True
+            self._queue.clear()
+            self.put_nowait(DISCONNECT)
+        else:
+            self.overflows["backfill"] += 1
+            self.detached = True
+            self.dropped_through = int(ev.get("seq", 0))
+            self._queue.clear()
+            self.put_nowait(RESYNC)
+
+    def reattach(self, last_seq: int) -> bool:
+        """
+        Resume live delivery once the subscriber has read up to the last dropped seq.
+        """
+        if self.detached and last_seq >= self.dropped_through:
+            self.detached = False
+        return not self.detached
+
+    def _merge(self, ev: Dict[str, Any]) -> bool:
+        if ev.get("type") != "token":
+            return False
+        queued = self._queue
+        if not _mergeable(queued[-1], ev):
+            # Compact runs of adjacent token events to make room.
+            merged: List[Any] = []
+            for item in queued:
+                if merged and _mergeable(merged[-1], item):
+                    merged[-1] = _merged(merged[-1], item)
+                else:
+                    merged.append(item)
+            if len(merged) == len(queued):
+                return False
+            queued.clear()
+            queued.extend(merged)
+            self.put_nowait(ev)
+            return True
+        queued[-1] = _merged(queued[-1], ev)
+        return True
+
+
+def _mergeable(a: Any, b: Any) -> bool:
+    return (
+        isinstance(a, dict)
+        and a.get("type") == "token"
+        and b.get("type") == "token"
+        and int(b.get("seq_from", b.get("seq", 0))) == int(a.get("seq", 0)) + 1
+        and len(a.get("content") or "") + len(b.get("content") or "") <= _MERGE_MAX_CHARS
+    )
+
+
+def _merged(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Token run covering a and b, in the format of compact_stream: 'seq_from' and the size
+    of every original token let a consumer cut off the part it has already delivered.
+    """
+    # Build a new dict: queued events are shared with other subscribers.
+    a_content, b_content = a.get("content") or "", b.get("content") or ""
+    return {
+        **a,
+        "content": a_content + b_content,
+        "seq_from": int(a.get("seq_from", a.get("seq", 0))),
+        "seq": b.get("seq", a.get("seq")),
+        "sizes": list(a.get("sizes") or [len(a_content)]) + list(b.get("sizes") or [len(b_content)]),
+    }
+
+
+class InProcEventBus:
+    """
+    In-process fan-out to subscriber queues.
+
+    The registry maps task_id to an immutable tuple of queues. subscribe/unsubscribe swap
+    in a new tuple, so publish reads it without locking; all access happens on the event
+    loop thread.
+    """
+
+    def __init__(self, *, queue_size: int = 1000, overflow: str = "merge") -> None:
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self._subs: Dict[str, Tuple[SubscriberQueue, ...]] = {}
+        # Overflow counts of subscribers that already unsubscribed.
+        self._retired_overflows: Dict[str, int] = {}
+
+    async def subscribe(self, task_id: str) -> SubscriberQueue:
+        q = SubscriberQueue(maxsize=self.queue_size, policy=self.overflow)
+        self._subs[task_id] = self._subs.get(task_id, ()) + (q,)
+        return q
+
+    async def unsubscribe(self, task_id: str, q: asyncio.Queue) -> None:
+        remaining = tuple(x for x in self._subs.get(task_id, ()) if x is not q)
+        if remaining:
+            self._subs[task_id] = remaining
+        else:
+            self._subs.pop(task_id, None)
+        for k, v in getattr(q, "overflows", {}).items():
+            self._retired_overflows[k] = self._retired_overflows.get(k, 0) + v
+
+    async def publish(self, ev: Dict[str, Any]) -> None:
+        self._fanout(ev)
+
+    def _fanout(self, ev: Dict[str, Any]) -> None:
+        task_id = ev.get("task_id")
+        if not task_id:
+            return
+        for q in self._subs.get(task_id, ()):
+            q.offer(ev)
+
+    async def close(self) -> None:
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        queues = [q for subs in self._subs.values() for q in subs]
+        depths = [q.qsize() for q in queues]
+        overflows = dict(self._retired_overflows)
+        for q in queues:
+            for k, v in q.overflows.items():
+                overflows[k] = overflows.get(k, 0) + v
+        return {
+            "backend": "inproc",
+            "tasks": len(self._subs),
+            "subscribers": len(queues),
+            "overflow_policy": self.overflow,
+            "queue_depth_max": max(depths, default=0),
+            "queue_depth_total": sum(depths),
+            "detached_subscribers": sum(1 for q in queues if q.detached),
+            "overflows": overflows,
+        }
@@ -1,42 +1,46 @@
 from __future__ import annotations
 
-import asyncio
-from typing import Any, Dict, List
-
-from orchestrallm.shared.persistence.mongo import save_stream_event
-
-class InProcEventBus:
-    def __init__(self) -> None:
-        self._subs: Dict[str, List[asyncio.Queue]] = {}
-        self._lock = asyncio.Lock()
-
-    async def subscribe(self, task_id: str) -> asyncio.Queue:
-        q: asyncio.Queue = asyncio.Queue(maxsize=1000)
-        async with self._lock:
-            self._subs.setdefault(task_id, []).append(q)
-        return q
-
-    async def unsubscribe(self, task_id: str, q: asyncio.Queue) -> None:
-        async with self._lock:
-            lst = self._subs.get(task_id, [])
-            if q in lst:
-                lst.remove(q)
-            if not lst and task_id in self._subs:
-                self._subs.pop(task_id, None)
-
-    async def publish(self, ev: Dict[str, Any]) -> None:
-        task_id = ev.get("task_id")
-        if not task_id:
-            return
-        async with self._lock:
-            queues = list(self._subs.get(task_id, []))
-        for q in queues:
-            try:
-                q.put_nowait(ev)
-            except asyncio.QueueFull:
-                pass
-
-EVENT_BUS = InProcEventBus()
+from typing import Any, Dict
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.persistence.mongo import prepare_stream_event
+from orchestrallm.shared.eventbus.bus import EventBus, InProcEventBus
+from orchestrallm.shared.eventbus.mongo_bus import MongoEventBus
+from orchestrallm.shared.eventbus.sequence import STREAM_SEQUENCES
+from orchestrallm.shared.eventbus.writer import STREAM_WRITER
+from orchestrallm.shared.metrics import METRICS
+
+
+def build_event_bus() -> EventBus:
+    """
+    Create the event bus selected by EVENT_BUS_BACKEND (inproc | mongo).
+    """
+    backend = (settings.EVENT_BUS_BACKEND or "inproc").lower()
+    queue_size, overflow = settings.EVENT_BUS_QUEUE_SIZE, settings.EVENT_BUS_OVERFLOW
+    if backend == "mongo":
+        return MongoEventBus(
+            collection=settings.EVENT_BUS_COLLECTION,
+            capped_bytes=settings.EVENT_BUS_CAPPED_BYTES,
+            queue_size=queue_size,
+            overflow=overflow,
+        )
+    return InProcEventBus(queue_size=queue_size, overflow=overflow)
+
+
+EVENT_BUS = build_event_bus()
+
+
+def _bus_queue_depth() -> Dict[tuple, float]:
+    s = EVENT_BUS.stats()
+    return {("max",): s["queue_depth_max"], ("total",): s["queue_depth_total"], ("subscribers",): s["subscribers"]}
+
+
+METRICS.gauge(
+    "orchestrallm_event_bus_queue_depth",
+    "Events waiting in event bus subscriber queues (max over queues, total) and the subscriber count",
+    ("stat",),
+    collect=_bus_queue_depth,
+)
 
 
 def _normalize_event_shape(event: Any) -> Dict[str, Any]:
@@ -68,13 +72,16 @@ async def publish_event_async(event: Any) -> Dict[str, Any]:
     if "task_id" not in ev or not ev["task_id"]:
         raise ValueError("publish_event_async: 'task_id' is required in event")
 
-    saved = save_stream_event(ev)  
-    await EVENT_BUS.publish(saved)  
+    if "seq" not in ev:
+        ev["seq"] = await STREAM_SEQUENCES.next(ev["task_id"])
+    saved = prepare_stream_event(ev)
+    await EVENT_BUS.publish(saved)
+    await STREAM_WRITER.write(saved)
     return saved
 
 
-async def send_status(task_id: str, message: str) -> Dict[str, Any]:
-    return await publish_event_async({"task_id": task_id, "type": "status", "message": message})
+async def send_status(task_id: str, message: str, **fields: Any) -> Dict[str, Any]:
+    return await publish_event_async({**fields, "task_id": task_id, "type": "status", "message": message})
 
 async def send_token(task_id: str, content: str) -> Dict[str, Any]:
     return await publish_event_async({"task_id": task_id, "type": "token", "content": content})
@@ -0,0 +1,126 @@
+"""
+WebSocket frame encoding for stream events.
+
+By default every event is sent as its own JSON text frame. Clients may opt into batched
+frames, either through a WebSocket subprotocol or the `batch` query parameter; pending
+events are then coalesced into one array frame per flush interval, encoded as JSON text
+or as a msgpack binary frame.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import WebSocket
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+
+from orchestrallm.shared.eventbus.writer import TERMINAL_TYPES
+from orchestrallm.shared.metrics import WS_SEND_SECONDS
+
+SUBPROTOCOL_BATCH_JSON = "orchestrallm.batch.json"
+SUBPROTOCOL_BATCH_MSGPACK = "orchestrallm.batch.msgpack"
+
+_SUBPROTOCOLS = {
+    SUBPROTOCOL_BATCH_JSON: "json",
+    SUBPROTOCOL_BATCH_MSGPACK: "msgpack",
+}
+
+
+def negotiate_encoding(offered: Sequence[str], batch: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Pick the batch encoding for a connection.
+    Returns (encoding, subprotocol); encoding None means one JSON frame per event.
+    """
+    for proto in offered or []:
+        enc = _SUBPROTOCOLS.get(proto)
+        if enc == "msgpack" and msgpack is None:
+            continue
+        if enc:
+            return enc, proto
+    if batch:
+        enc = batch.strip().lower()
+        if enc == "msgpack" and msgpack is not None:
+            return "msgpack", None
+        if enc in ("json", "msgpack", "1", "true"):
+            return "json", None
+    return None, None
+
+
+def encode_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+class FrameSender:
+    """
+    Sends stream events over a WebSocket, one frame per event or batched.
+
+    In batched mode events are buffered by push() and written by run(), which flushes
+    every `flush_interval_s`, as soon as `max_batch` events are pending, or at once after
+    a terminal event.
+    """
+
+    def __init__(self, ws: WebSocket, encoding: Optional[str], *, flush_interval_s: float = 0.025, max_batch: int = 256) -> None:
+        self.ws = ws
+        self.encoding = encoding
+        self.flush_interval_s = max(0.0, float(flush_interval_s))
+        self.max_batch = max(1, int(max_batch))
+        self._pending: List[Dict[str, Any]] = []
+        self._has_pending = asyncio.Event()
+        self._flush_now = asyncio.Event()
+        # Keeps batches in order when flush() is called outside run().
+        self._lock = asyncio.Lock()
+
+    @property
+    def batched(self) -> bool:
+        return self.encoding is not None
+
+    async def send(self, ev: Dict[str, Any]) -> None:
+        if not self.batched:
+            with WS_SEND_SECONDS.time(encoding="json"):
+                await self.ws.send_text(encode_json(ev))
+            return
+        self._pending.append(ev)
+        self._has_pending.set()
+        if ev.get("type") in TERMINAL_TYPES or len(self._pending) >= self.max_batch:
+            self._flush_now.set()
+
+    async def run(self) -> None:
+        """
+        Flush loop for batched mode; returns when the socket fails.
+        """
+        if not self.batched:
+            return
+        try:
+            while True:
+                await self._has_pending.wait()
+                if not self._flush_now.is_set():
+                    try:
+                        await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval_s)
+                    except asyncio.TimeoutError:
+                        pass
+                await self.flush()
+        except Exception:
+            pass
+
+    async def flush(self) -> None:
+        """
+        Send the pending events now, e.g. before the socket is closed.
+        """
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            self._has_pending.clear()
+            self._flush_now.clear()
+            for i in range(0, len(batch), self.max_batch):
+                await self._send_batch(batch[i:i + self.max_batch])
+
+    async def _send_batch(self, batch: List[Dict[str, Any]]) -> None:
+        with WS_SEND_SECONDS.time(encoding=f"{self.encoding}-batch"):
+            if self.encoding == "msgpack":
+                await self.ws.send_bytes(msgpack.packb(batch, default=str, use_bin_type=True))
+            else:
+                await self.ws.send_text(encode_json(batch))
@@ -0,0 +1,176 @@
+"""
+Cross-worker event bus on a Mongo capped collection.
+
+Published events are delivered to local subscribers at once and relayed to the other
+workers through a capped collection: a writer thread batches outgoing events into
+insert_many calls, and a reader thread follows the collection with a tailable await
+cursor and hands events of other workers to the local subscribers.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+from orchestrallm.shared.eventbus.bus import InProcEventBus
+from orchestrallm.shared.persistence.mongo import get_db
+
+log = logging.getLogger("eventbus.mongo")
+
+_RELAY_BATCH = 500
+_RESTART_DELAY_S = 1.0
+# Tail restarts resume from the last seen timestamp minus this margin to tolerate clock
+# skew between hosts; re-delivered events are dropped by consumers by 'seq'.
+_RESUME_MARGIN_S = 5.0
+
+
+class MongoEventBus(InProcEventBus):
+    def __init__(
+        self,
+        *,
+        collection: str = "stream_bus",
+        capped_bytes: int = 64 * 1024 * 1024,
+        outbox_size: int = 10000,
+        queue_size: int = 1000,
+        overflow: str = "merge",
+    ) -> None:
+        super().__init__(queue_size=queue_size, overflow=overflow)
+        self.collection = collection
+        self.capped_bytes = int(capped_bytes)
+        self.dropped = 0
+        self.relayed_in = 0
+        self.relayed_out = 0
+        self._outbox: queue.Queue = queue.Queue(maxsize=outbox_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._origin = ""
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        self._ensure_started()
+        return await super().subscribe(task_id)
+
+    async def publish(self, ev: Dict[str, Any]) -> None:
+        if not ev.get("task_id"):
+            return
+        self._ensure_started()
+        self._fanout(ev)
+        try:
+            self._outbox.put_nowait(dict(ev))
+        except queue.Full:
+            self.dropped += 1
+
+    async def close(self) -> None:
+        if not self._threads:
+            return
+        self._stop.set()
+        try:
+            self._outbox.put_nowait(None)
+        except queue.Full:
+            pass
+        await asyncio.to_thread(lambda: [t.join(timeout=2.0) for t in self._threads])
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "backend": "mongo",
+            "origin": self._origin,
+            "outbox": self._outbox.qsize(),
+            "relayed_in": self.relayed_in,
+            "relayed_out": self.relayed_out,
+            "dropped": self.dropped,
+        }
+
+    def _ensure_started(self) -> None:
+        # Threads do not survive a fork (gunicorn preload_app), so start them lazily
+        # inside the worker that uses the bus.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._loop = asyncio.get_running_loop()
+        self._origin = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._outbox = queue.Queue(maxsize=self._outbox.maxsize)
+        self._threads = [
+            threading.Thread(target=self._relay_out, name="eventbus-relay-out", daemon=True),
+            threading.Thread(target=self._relay_in, name="eventbus-relay-in", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _ensure_collection(self) -> None:
+        db = get_db()
+        try:
+            db.create_collection(self.collection, capped=True, size=self.capped_bytes)
+            # A tailable cursor on an empty capped collection dies at once.
+            db[self.collection].insert_one({"origin": "", "ts": 0.0})
+        except (CollectionInvalid, OperationFailure):
+            pass
+        except PyMongoError as e:
+            log.warning("could not create capped collection %s: %s", self.collection, e)
+
+    def _relay_out(self) -> None:
+        # Inserting before the capped collection exists would create a regular one.
+        self._ready.wait()
+        coll = get_db()[self.collection]
+        while not self._stop.is_set():
+            ev = self._outbox.get()
+            if ev is None:
+                break
+            batch = [ev]
+            while len(batch) < _RELAY_BATCH:
+                try:
+                    nxt = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._stop.set()
+                    break
+                batch.append(nxt)
+            now = time.time()
+            try:
+                coll.insert_many([{"origin": self._origin, "ts": now, "ev": e} for e in batch], ordered=True)
+                self.relayed_out += len(batch)
+            except PyMongoError as e:
+                self.dropped += len(batch)
+                log.warning("event relay write failed (%d events): %s", len(batch), e)
+
+    def _relay_in(self) -> None:
+        self._ensure_collection()
+        self._ready.set()
+        coll = get_db()[self.collection]
+        since = time.time()
+        while not self._stop.is_set():
+            try:
+                cursor = coll.find(
+                    {"ts": {"$gte": since - _RESUME_MARGIN_S}},
+                    cursor_type=CursorType.TAILABLE_AWAIT,
+                ).max_await_time_ms(500)
+                while cursor.alive and not self._stop.is_set():
+                    for doc in cursor:
+                        since = max(since, float(doc.get("ts", 0.0)))
+                        if doc.get("origin") in ("", self._origin):
+                            continue
+                        self._deliver_remote(doc.get("ev") or {})
+            except PyMongoError as e:
+                log.warning("event relay tail failed: %s", e)
+            self._stop.wait(_RESTART_DELAY_S)
+
+    def _deliver_remote(self, ev: Dict[str, Any]) -> None:
+        if not ev.get("task_id") or ev["task_id"] not in self._subs or self._loop is None:
+            return
+        self.relayed_in += 1
+        self._loop.call_soon_threadsafe(self._fanout, ev)
@@ -0,0 +1,80 @@
+"""
+Per-task sequence allocation for stream events.
+
+A task's events are produced only by the worker running it, so that worker can hand out
+'seq' numbers from memory. A task seen for the first time (new or resumed) is seeded once
+from the highest stored 'seq'. The 'counters' collection remains available as a fallback
+for deployments where several processes publish into the same task.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.persistence.mongo import max_stream_seq_async, next_sequence_for_task_async
+
+
+class SequenceAllocator:
+    """
+    Hands out monotonic sequence numbers per task.
+
+    Modes:
+      - "local":   numbers come from memory, seeded from storage on first use.
+      - "counter": every number is allocated through the Mongo 'counters' collection.
+
+    Tasks that never report a terminal event (crashed, abandoned) are forgotten once idle
+    for idle_ttl_s, or least recently used first beyond max_tasks; like a released task,
+    a forgotten one is seeded from storage again. idle_ttl_s must stay well above the
+    stream flush interval so that its events are stored by then.
+    """
+
+    def __init__(self, *, mode: str = "local", idle_ttl_s: float = 3600.0, max_tasks: int = 10000) -> None:
+        self.mode = (mode or "local").lower()
+        self.idle_ttl_s = max(0.0, float(idle_ttl_s))
+        self.max_tasks = max(1, int(max_tasks))
+        self.evicted = 0
+        # task_id -> (last seq, last use), least recently used first
+        self._last: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+    async def next(self, task_id: str) -> int:
+        if self.mode == "counter":
+            return await next_sequence_for_task_async(task_id)
+
+        if task_id not in self._last:
+            seed = await max_stream_seq_async(task_id)
+            # Another event of the same task may have been allocated while seeding.
+            seed = max(seed, self._last.get(task_id, (0, 0.0))[0])
+        else:
+            seed = self._last[task_id][0]
+        now = time.monotonic()
+        self._last[task_id] = (seed + 1, now)
+        self._last.move_to_end(task_id)
+        self._evict(now)
+        return seed + 1
+
+    def release(self, task_id: str) -> None:
+        """
+        Forget a finished task. Call only once its events are persisted, since a later
+        event for the same task is seeded from storage again.
+        """
+        self._last.pop(task_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"tracked_tasks": len(self._last), "evicted_tasks": self.evicted}
+
+    def _evict(self, now: float) -> None:
+        while self._last:
+            task_id, (_, used) = next(iter(self._last.items()))
+            if len(self._last) <= self.max_tasks and not (self.idle_ttl_s and now - used > self.idle_ttl_s):
+                return
+            del self._last[task_id]
+            self.evicted += 1
+
+
+STREAM_SEQUENCES = SequenceAllocator(
+    mode=settings.STREAM_SEQ_MODE,
+    idle_ttl_s=settings.STREAM_SEQ_IDLE_TTL_S,
+    max_tasks=settings.STREAM_SEQ_MAX_TASKS,
+)
@@ -0,0 +1,220 @@
+"""
+Per-worker tailer for the 'streams' collection.
+
+All WebSocket subscribers of a worker share one loop: it follows a Mongo change stream
+when the deployment supports it (replica set / sharded cluster) and otherwise issues a
+single batched query per interval covering every subscribed task. A task stops being
+followed once its terminal event has been delivered. Subscriber queues are bounded and
+apply the event bus overflow policy (SubscriberQueue).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo.errors import PyMongoError
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.eventbus.bus import SubscriberQueue
+from orchestrallm.shared.eventbus.writer import TERMINAL_TYPES
+from orchestrallm.shared.persistence.mongo import expand_stream_docs, get_db, run_in_db
+
+log = logging.getLogger("eventbus.tailer")
+
+
+class StreamTailer:
+    def __init__(
+        self,
+        *,
+        interval_s: float = 0.25,
+        use_change_streams: bool = True,
+        queue_size: int = 1000,
+        overflow: str = "merge",
+    ) -> None:
+        self.interval_s = max(0.01, float(interval_s))
+        self.use_change_streams = use_change_streams
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.mode: Optional[str] = None
+        self.queries = 0
+        self._subs: Dict[str, Set[SubscriberQueue]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._finished: Set[str] = set()
+        self._held: Dict[str, List[Dict[str, Any]]] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    async def subscribe(self, task_id: str, after_seq: int = 0) -> SubscriberQueue:
+        """
+        Follow task_id and receive its stored events with seq > after_seq on the returned
+        queue. Token runs of compacted tasks keep 'seq_from' and 'sizes' (see cut_token_run).
+        """
+        q = SubscriberQueue(maxsize=self.queue_size, policy=self.overflow)
+        self._subs.setdefault(task_id, set()).add(q)
+        # Rewind so a late subscriber does not miss what was already delivered to others;
+        # consumers drop duplicates by seq.
+        self._cursor[task_id] = min(self._cursor.get(task_id, after_seq), after_seq)
+        self._finished.discard(task_id)
+
+        if self.mode == "change_stream":
+            # The change stream only reports new inserts: catch up on anything stored
+            # between the caller's own backfill and this subscription.
+            await self._catch_up([task_id])
+        self._ensure_running()
+        return q
+
+    async def unsubscribe(self, task_id: str, q: asyncio.Queue) -> None:
+        subs = self._subs.get(task_id)
+        if subs is None:
+            return
+        subs.discard(q)
+        if not subs:
+            self._subs.pop(task_id, None)
+            self._cursor.pop(task_id, None)
+            self._finished.discard(task_id)
+
+    def stats(self) -> Dict[str, Any]:
+        queues = [q for subs in self._subs.values() for q in subs]
+        return {
+            "mode": self.mode,
+            "tasks": len(self._subs),
+            "followed_tasks": len(self._followed()),
+            "subscribers": len(queues),
+            "queue_depth_max": max((q.qsize() for q in queues), default=0),
+            "detached_subscribers": sum(1 for q in queues if q.detached),
+            "queries": self.queries,
+        }
+
+    def _followed(self) -> List[str]:
+        return [t for t in self._subs if t not in self._finished]
+
+    def _ensure_running(self) -> None:
+        self._wakeup.set()
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        try:
+            if self.use_change_streams and self.mode != "poll":
+                await self._follow_change_stream()
+            while self._subs:
+                if self.mode is None:
+                    self.mode = "poll"
+                followed = self._followed()
+                if followed:
+                    await self._poll(followed)
+                await asyncio.sleep(self.interval_s)
+        except Exception:
+            log.exception("stream tailer stopped unexpectedly")
+
+    async def _poll(self, task_ids: List[str]) -> None:
+        query = {"$or": [{"task_id": t, "seq": {"$gt": self._cursor.get(t, 0)}} for t in task_ids]}
+
+        def _find() -> List[Dict[str, Any]]:
+            return list(get_db().streams.find(query).sort([("task_id", 1), ("seq", 1)]))
+
+        self.queries += 1
+        try:
+            docs = await run_in_db(_find)
+        except PyMongoError as e:
+            log.warning("stream poll failed: %s", e)
+            return
+        for doc in docs:
+            self._dispatch(doc)
+
+    async def _catch_up(self, task_ids: List[str]) -> None:
+        """
+        Query stored events while holding back change-stream events of the same tasks,
+        so newer events cannot overtake the ones being fetched.
+        """
+        if not task_ids:
+            return
+        for t in task_ids:
+            self._held.setdefault(t, [])
+        try:
+            await self._poll(task_ids)
+        finally:
+            for t in task_ids:
+                for doc in self._held.pop(t, []):
+                    self._dispatch(doc)
+
+    async def _follow_change_stream(self) -> None:
+        """
+        Deliver inserts from a change stream until there are no subscribers left.
+        Leaves self.mode as "poll" if change streams are unavailable or the stream fails.
+        """
+        loop = asyncio.get_running_loop()
+        ready: asyncio.Future = loop.create_future()
+        stop = threading.Event()
+
+        def _settle(ok: bool) -> None:
+            if not ready.done():
+                ready.set_result(ok)
+
+        def _watch() -> None:
+            try:
+                with get_db().streams.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    max_await_time_ms=int(self.interval_s * 1000),
+                ) as stream:
+                    loop.call_soon_threadsafe(_settle, True)
+                    while not stop.is_set():
+                        change = stream.try_next()
+                        if change is not None:
+                            loop.call_soon_threadsafe(self._on_change, change["fullDocument"])
+            except PyMongoError as e:
+                log.info("change streams unavailable, falling back to polling: %s", e)
+            finally:
+                loop.call_soon_threadsafe(_settle, False)
+
+        watcher = threading.Thread(target=_watch, name="stream-tailer", daemon=True)
+        watcher.start()
+        if not await ready:
+            self.mode = "poll"
+            return
+
+        self.mode = "change_stream"
+        # Subscribers registered before the stream opened may have missed inserts.
+        await self._catch_up(self._followed())
+        try:
+            while self._subs and watcher.is_alive():
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_s)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            stop.set()
+        if watcher.is_alive() or not self._subs:
+            self.mode = None
+        else:
+            self.mode = "poll"
+
+    def _on_change(self, doc: Dict[str, Any]) -> None:
+        held = self._held.get(doc.get("task_id"))
+        if held is not None:
+            held.append(doc)
+        else:
+            self._dispatch(doc)
+
+    def _dispatch(self, doc: Dict[str, Any]) -> None:
+        task_id = doc.get("task_id")
+        subs = self._subs.get(task_id)
+        if not subs:
+            return
+        for ev in expand_stream_docs([doc], self._cursor.get(task_id, 0), keep_runs=True):
+            self._cursor[task_id] = int(ev.get("seq", 0))
+            for q in list(subs):
+                q.offer(ev)
+            if ev.get("type") in TERMINAL_TYPES:
+                self._finished.add(task_id)
+
+
+STREAM_TAILER = StreamTailer(
+    interval_s=settings.STREAM_TAIL_INTERVAL_MS / 1000.0,
+    use_change_streams=settings.STREAM_TAIL_CHANGE_STREAMS,
+    queue_size=settings.EVENT_BUS_QUEUE_SIZE,
+    overflow=settings.EVENT_BUS_OVERFLOW,
+)
@@ -0,0 +1,174 @@
+"""
+Write-behind persistence for stream events.
+
+Events are handed to the bus by the caller first and buffered here per task. A task's
+buffer is flushed to Mongo with a single insert_many once it holds STREAM_FLUSH_MAX_EVENTS
+events, once STREAM_FLUSH_INTERVAL_MS has elapsed, or at once when a terminal event arrives.
+Some time after a task's terminal flush its documents are compacted into one.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.eventbus.sequence import STREAM_SEQUENCES
+from orchestrallm.shared.persistence.mongo import compact_stream_async, save_stream_events_async
+
+log = logging.getLogger("eventbus.writer")
+
+TERMINAL_TYPES = frozenset({"done", "error"})
+
+
+class StreamEventWriter:
+    """
+    Buffers prepared stream events per task and persists them in batches.
+
+    Modes:
+      - "sync":    every event is persisted before write() returns, which raises if
+                   the insert failed (the events stay buffered and are retried).
+      - "batched": events are persisted in the background; terminal events
+                   flush the task's buffer before write() returns.
+
+    on_finished(task_id) is called once a task's terminal event has been persisted.
+    """
+
+    def __init__(
+        self,
+        *,
+        mode: str = "batched",
+        max_events: int = 64,
+        flush_interval_s: float = 0.2,
+        compact_delay_s: Optional[float] = 30.0,
+        on_finished: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.mode = (mode or "batched").lower()
+        self.max_events = max(1, int(max_events))
+        self.flush_interval_s = max(0.0, float(flush_interval_s))
+        self.compact_delay_s = compact_delay_s
+        self.on_finished = on_finished
+        self.failed_flushes = 0
+        self.compacted = 0
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._compactions: Dict[str, asyncio.TimerHandle] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    async def write(self, ev: Dict[str, Any]) -> None:
+        task_id = ev["task_id"]
+        self._buffers.setdefault(task_id, []).append(ev)
+
+        if self.mode == "sync" or ev.get("type") in TERMINAL_TYPES:
+            await self.flush(task_id, raise_errors=self.mode == "sync")
+        elif len(self._buffers[task_id]) >= self.max_events:
+            self._flush_in_background(task_id)
+        else:
+            self._schedule(task_id)
+
+    async def flush(self, task_id: str, *, raise_errors: bool = False) -> None:
+        """
+        Persist everything buffered for task_id. Flushes of one task are serialized so
+        batches reach Mongo in seq order, which the stream readers rely on. A failed
+        batch is put back and retried later; raise_errors also re-raises the error.
+        """
+        if task_id not in self._buffers and task_id not in self._locks:
+            return
+        timer = self._timers.pop(task_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        lock = self._locks.setdefault(task_id, asyncio.Lock())
+        async with lock:
+            batch = self._buffers.pop(task_id, None)
+            if batch:
+                try:
+                    # Persist copies: insert_many adds '_id' to the documents, while the
+                    # originals may still be serialized by WebSocket senders.
+                    await save_stream_events_async([dict(e) for e in batch])
+                except Exception:
+                    self.failed_flushes += 1
+                    log.exception("stream flush failed for task %s (%d events)", task_id, len(batch))
+                    self._buffers[task_id] = batch + self._buffers.get(task_id, [])
+                    self._schedule(task_id)
+                    if raise_errors:
+                        raise
+                    return
+            finished = batch and batch[-1].get("type") in TERMINAL_TYPES
+            if finished and task_id not in self._buffers:
+                self._locks.pop(task_id, None)
+                if self.on_finished is not None:
+                    self.on_finished(task_id)
+                self._schedule_compaction(task_id)
+
+    async def flush_all(self) -> None:
+        """
+        Flush every buffered task and wait for background flushes. Used on shutdown.
+        """
+        for task_id in list(self._buffers):
+            await self.flush(task_id)
+        # Pending compactions are dropped; those documents simply expire by TTL.
+        for timer in self._compactions.values():
+            timer.cancel()
+        self._compactions.clear()
+        if self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "buffered_tasks": len(self._buffers),
+            "buffered_events": sum(len(b) for b in self._buffers.values()),
+            "failed_flushes": self.failed_flushes,
+            "pending_compactions": len(self._compactions),
+            "compacted_tasks": self.compacted,
+        }
+
+    def _schedule(self, task_id: str) -> None:
+        if task_id in self._timers:
+            return
+        loop = asyncio.get_running_loop()
+        self._timers[task_id] = loop.call_later(self.flush_interval_s, self._flush_in_background, task_id)
+
+    def _flush_in_background(self, task_id: str) -> None:
+        self._in_background(self.flush(task_id))
+
+    def _in_background(self, coro) -> None:
+        t = asyncio.ensure_future(coro)
+        self._background.add(t)
+        t.add_done_callback(self._background.discard)
+
+    def _schedule_compaction(self, task_id: str) -> None:
+        if self.compact_delay_s is None:
+            return
+        # A task that reports a second terminal event is compacted once, after the last.
+        timer = self._compactions.pop(task_id, None)
+        if timer is not None:
+            timer.cancel()
+        loop = asyncio.get_running_loop()
+        self._compactions[task_id] = loop.call_later(
+            self.compact_delay_s, lambda: self._in_background(self._compact(task_id))
+        )
+
+    async def _compact(self, task_id: str) -> None:
+        self._compactions.pop(task_id, None)
+        if task_id in self._buffers or task_id in self._locks:
+            # The task is writing again; its next terminal flush reschedules compaction.
+            return
+        try:
+            if await compact_stream_async(task_id) is not None:
+                self.compacted += 1
+        except Exception:
+            log.exception("stream compaction failed for task %s", task_id)
+
+
+STREAM_WRITER = StreamEventWriter(
+    mode=settings.STREAM_PERSIST_MODE,
+    max_events=settings.STREAM_FLUSH_MAX_EVENTS,
+    flush_interval_s=settings.STREAM_FLUSH_INTERVAL_MS / 1000.0,
+    compact_delay_s=float(settings.STREAM_COMPACT_DELAY_S) if settings.STREAM_COMPACTION else None,
+    # The next event of a task is seeded from storage again, so only forget its
+    # sequence once everything up to the terminal event is stored.
+    on_finished=STREAM_SEQUENCES.release,
+)
@@ -8,7 +8,7 @@ from pymongo.errors import DuplicateKeyError
 from pymongo.errors import OperationFailure
 
 from orchestrallm.shared.config.settings import settings
-from orchestrallm.shared.persistence.mongo import get_db
+from orchestrallm.shared.persistence.mongo import get_db, run_in_db
 
 MONGO_URI: str = getattr(settings, "MONGODB_URI", "mongodb://localhost:27017")
 MONGO_DB: str = getattr(settings, "MONGODB_DB", "ragchat")
@@ -108,4 +108,18 @@ def append_message(*, user_id: str, session_id: str, role: str, content: str) ->
                 "$set": {"updated_at": _now_ts()},
             },
             upsert=False,
-        )
\ No newline at end of file
+        )
+
+
+async def load_history_async(*, user_id: str, session_id: str, limit: int = 10) -> List[Dict[str, str]]:
+    """
+    Async variant of load_history; runs on the Mongo thread pool.
+    """
+    return await run_in_db(load_history, user_id=user_id, session_id=session_id, limit=limit)
+
+
+async def append_message_async(*, user_id: str, session_id: str, role: str, content: str) -> None:
+    """
+    Async variant of append_message; runs on the Mongo thread pool.
+    """
+    await run_in_db(append_message, user_id=user_id, session_id=session_id, role=role, content=content)
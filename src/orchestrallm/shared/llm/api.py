@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+
+from orchestrallm.shared.concurrency import LLM_LIMITERS
+
+from orchestrallm.shared.llm.completion_cache import COMPLETION_CACHE
+from orchestrallm.shared.llm.embedding_cache import EMBEDDING_CACHE
+from orchestrallm.shared.llm.embeddings import EMBEDDINGS
+from orchestrallm.shared.llm.hedging import LLM_HEDGER
+from orchestrallm.shared.llm.http import LLM_HTTP
+from orchestrallm.shared.llm.singleflight import CHAT_FLIGHTS, EMBED_FLIGHTS
+from orchestrallm.shared.llm.upstreams import LLM_UPSTREAMS
+
+router = APIRouter(tags=["llm"])
+
+@router.get("/llm/stats")
+def llm_stats():
+    return {
+        "http": LLM_HTTP.stats(),
+        "limiters": LLM_LIMITERS.stats(),
+        "upstreams": LLM_UPSTREAMS.stats(),
+        "embedding_cache": EMBEDDING_CACHE.stats(),
+        "embeddings": EMBEDDINGS.stats(),
+        "completion_cache": COMPLETION_CACHE.stats(),
+        "coalescing": {"chat": CHAT_FLIGHTS.stats(), "embeddings": EMBED_FLIGHTS.stats()},
+        "hedging": LLM_HEDGER.stats(),
+    }
@@ -0,0 +1,141 @@
+"""
+Opt-in cache of chat completions.
+
+Requests are keyed by model, normalized messages, temperature and max_tokens, and only
+cached when the temperature is at most COMPLETION_CACHE_MAX_TEMPERATURE. Answers are kept
+as the list of streamed tokens, so a hit can be replayed to stream_chat callers as a
+token stream. Two tiers: an in-process LRU with a TTL, and an optional Mongo collection
+shared by all workers (expired by a TTL index).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.persistence.mongo import get_db, run_in_db
+
+log = logging.getLogger("llm.completion_cache")
+
+
+class CompletionCache:
+    def __init__(
+        self,
+        *,
+        enabled: bool = False,
+        ttl_s: float = 3600.0,
+        max_entries: int = 1000,
+        max_temperature: float = 0.3,
+        persist: bool = False,
+        collection: str = "completion_cache",
+    ) -> None:
+        self.enabled = enabled
+        self.ttl_s = float(ttl_s)
+        self.max_entries = max(1, int(max_entries))
+        self.max_temperature = float(max_temperature)
+        self.persist = persist
+        self.collection = collection
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+
+    def cacheable(self, temperature: float) -> bool:
+        return self.enabled and temperature <= self.max_temperature
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        norm = [
+            {"role": (m.get("role") or "").strip(), "content": " ".join((m.get("content") or "").split())}
+            for m in messages
+        ]
+        raw = json.dumps(
+            {"model": model, "messages": norm, "temperature": round(float(temperature), 3), "max_tokens": int(max_tokens)},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[List[str]]:
+        """
+        Return the cached tokens for key, or None.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+        if self.persist:
+            tokens = await run_in_db(self._load_persisted, key)
+            if tokens is not None:
+                self.store_hits += 1
+                self._put_local(key, tokens)
+                return tokens
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, tokens: List[str]) -> None:
+        self._put_local(key, tokens)
+        if self.persist:
+            await run_in_db(self._save_persisted, key, tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.store_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.store_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _put_local(self, key: str, tokens: List[str]) -> None:
+        self._entries[key] = (time.time() + self.ttl_s, list(tokens))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_persisted(self, key: str) -> Optional[List[str]]:
+        try:
+            doc = get_db()[self.collection].find_one({"_id": key})
+        except PyMongoError as e:
+            log.warning("completion cache lookup failed: %s", e)
+            return None
+        # TTL deletion runs once a minute; do not serve entries that are already due.
+        if not doc or doc.get("expires_ts", 0) <= time.time():
+            return None
+        return list(doc.get("tokens") or [])
+
+    def _save_persisted(self, key: str, tokens: List[str]) -> None:
+        try:
+            get_db()[self.collection].replace_one(
+                {"_id": key},
+                {
+                    "tokens": tokens,
+                    "expires_ts": time.time() + self.ttl_s,
+                    "expire_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_s),
+                },
+                upsert=True,
+            )
+        except PyMongoError as e:
+            log.warning("completion cache write failed: %s", e)
+
+
+COMPLETION_CACHE = CompletionCache(
+    enabled=settings.COMPLETION_CACHE,
+    ttl_s=settings.COMPLETION_CACHE_TTL_S,
+    max_entries=settings.COMPLETION_CACHE_MAX_ENTRIES,
+    max_temperature=settings.COMPLETION_CACHE_MAX_TEMPERATURE,
+    persist=settings.COMPLETION_CACHE_PERSIST,
+    collection=settings.COMPLETION_CACHE_COLLECTION,
+)
@@ -0,0 +1,191 @@
+"""
+Content-addressed cache for embeddings.
+
+Entries are keyed by model and the SHA-256 of the text. Two tiers:
+  - an in-process LRU holding packed vectors within a byte budget;
+  - a Mongo collection shared by all workers, vectors stored as packed bytes.
+Vectors are packed as float32 by default, which halves their size but means a cached
+vector matches the API's float64 values only to about 7 significant digits; with
+float32=False they are kept as float64 and returned unchanged.
+Persistent-tier failures are logged and treated as misses; they never fail an embedding.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Sequence
+
+from bson.binary import Binary
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.persistence.mongo import get_db, run_in_db
+
+log = logging.getLogger("llm.embedding_cache")
+
+# Rough per-entry bookkeeping cost (key string, OrderedDict slot, array header).
+_ENTRY_OVERHEAD = 200
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        max_bytes: int = 256 * 1024 * 1024,
+        persist: bool = True,
+        collection: str = "embedding_cache",
+        ttl_days: float = 30.0,
+        float32: bool = True,
+    ) -> None:
+        self.enabled = enabled
+        self.max_bytes = max(0, int(max_bytes))
+        self.persist = persist
+        self.collection = collection
+        self.ttl_days = ttl_days
+        self.typecode = "f" if float32 else "d"
+        self.bytes = 0
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        Look keys up in memory, then in the persistent tier. Returns the found entries.
+        """
+        local = self._get_local(keys)
+        stored: Dict[str, List[float]] = {}
+        rest = [k for k in dict.fromkeys(keys) if k not in local]
+        if rest and self.persist:
+            stored = self._load_persisted(rest)
+            self._put_local(stored)
+        self._count(keys, local, stored)
+        return {**local, **stored}
+
+    async def get_many_async(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        local = self._get_local(keys)
+        stored: Dict[str, List[float]] = {}
+        rest = [k for k in dict.fromkeys(keys) if k not in local]
+        if rest and self.persist:
+            stored = await run_in_db(self._load_persisted, rest)
+            self._put_local(stored)
+        self._count(keys, local, stored)
+        return {**local, **stored}
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        self._put_local(items)
+        if items and self.persist:
+            self._save_persisted(items)
+
+    async def put_many_async(self, items: Dict[str, List[float]]) -> None:
+        self._put_local(items)
+        if items and self.persist:
+            await run_in_db(self._save_persisted, items)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.store_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "precision": "float32" if self.typecode == "f" else "float64",
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.store_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _count(self, keys: Sequence[str], local: Dict[str, Any], stored: Dict[str, Any]) -> None:
+        with self._lock:
+            for k in keys:
+                if k in local:
+                    self.memory_hits += 1
+                elif k in stored:
+                    self.store_hits += 1
+                else:
+                    self.misses += 1
+
+    def _get_local(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for k in keys:
+                vec = self._entries.get(k)
+                if vec is None:
+                    continue
+                self._entries.move_to_end(k)
+                found[k] = vec.tolist()
+        return found
+
+    def _put_local(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for k, vec in items.items():
+                if k in self._entries:
+                    self._entries.move_to_end(k)
+                    continue
+                packed = array(self.typecode, vec)
+                size = len(packed) * packed.itemsize + _ENTRY_OVERHEAD
+                if size > self.max_bytes:
+                    continue
+                self._entries[k] = packed
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self.bytes -= len(old) * old.itemsize + _ENTRY_OVERHEAD
+                    self.evictions += 1
+
+    def _load_persisted(self, keys: List[str]) -> Dict[str, List[float]]:
+        try:
+            docs = get_db()[self.collection].find({"_id": {"$in": keys}}, {"v": 1, "t": 1})
+            found = {}
+            for doc in docs:
+                vec = array(doc.get("t", "f"))
+                vec.frombytes(bytes(doc["v"]))
+                found[doc["_id"]] = vec.tolist()
+        except PyMongoError as e:
+            log.warning("embedding cache lookup failed: %s", e)
+            return {}
+        return found
+
+    def _save_persisted(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        doc: Dict[str, Any] = {"created_at": now}
+        if self.ttl_days and self.ttl_days > 0:
+            doc["expire_at"] = datetime.now(timezone.utc) + timedelta(days=self.ttl_days)
+        ops = [
+            UpdateOne(
+                {"_id": k},
+                {"$setOnInsert": {**doc, "t": self.typecode, "v": Binary(array(self.typecode, vec).tobytes())}},
+                upsert=True,
+            )
+            for k, vec in items.items()
+        ]
+        try:
+            get_db()[self.collection].bulk_write(ops, ordered=False)
+        except PyMongoError as e:
+            log.warning("embedding cache write failed (%d entries): %s", len(ops), e)
+
+
+EMBEDDING_CACHE = EmbeddingCache(
+    enabled=settings.EMBEDDING_CACHE,
+    max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+    persist=settings.EMBEDDING_CACHE_PERSIST,
+    collection=settings.EMBEDDING_CACHE_COLLECTION,
+    ttl_days=settings.EMBEDDING_CACHE_TTL_DAYS,
+    float32=settings.EMBEDDING_CACHE_FLOAT32,
+)
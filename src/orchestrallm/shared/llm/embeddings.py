@@ -0,0 +1,181 @@
+"""
+Async embedding engine for bulk work such as document ingestion.
+
+Texts missing from the embedding cache are packed into batches by estimated token count,
+several batches are kept in flight under a concurrency limit, and failed batches are
+moved to another upstream (OPENAI_UPSTREAMS) or retried with exponential backoff,
+honouring Retry-After on 429/503. Results are returned in input order.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.llm.embedding_cache import EMBEDDING_CACHE
+from orchestrallm.shared.llm.openai_client import post_embeddings
+from orchestrallm.shared.llm.singleflight import EMBED_FLIGHTS
+from orchestrallm.shared.llm.tokens import estimate_tokens
+from orchestrallm.shared.llm.upstreams import retry_after_s
+
+log = logging.getLogger("llm.embeddings")
+
+_RETRY_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class EmbeddingEngine:
+    def __init__(
+        self,
+        *,
+        max_batch_tokens: int = 20000,
+        max_batch_items: int = 512,
+        concurrency: int = 4,
+        max_retries: int = 6,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 30.0,
+    ) -> None:
+        self.max_batch_tokens = max(1, int(max_batch_tokens))
+        self.max_batch_items = max(1, int(max_batch_items))
+        self.concurrency = max(1, int(concurrency))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failed = 0
+
+    async def embed(
+        self,
+        texts: Sequence[str],
+        *,
+        model: Optional[str] = None,
+        request_timeout: Optional[int] = None,
+    ) -> List[List[float]]:
+        if not texts:
+            return []
+        used_model = model or settings.EMBEDDING_MODEL
+        keys = [EMBEDDING_CACHE.key(used_model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        if EMBEDDING_CACHE.enabled:
+            found = await EMBEDDING_CACHE.get_many_async(keys)
+        missing = {k: t for k, t in zip(keys, texts) if k not in found}
+
+        if missing:
+            timeout = httpx.Timeout(request_timeout or settings.LLM_REQUEST_TIMEOUT)
+
+            async def fetch(miss_keys: List[str]) -> Dict[str, List[float]]:
+                return await self._fetch(miss_keys, [missing[k] for k in miss_keys], used_model, timeout)
+
+            if settings.LLM_COALESCE:
+                # Texts other calls are already embedding (e.g. parallel ingests of one
+                # document) are awaited instead of being sent again.
+                found.update(await EMBED_FLIGHTS.run_many(list(missing), fetch))
+            else:
+                found.update(await fetch(list(missing)))
+
+        return [found[k] for k in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "max_batch_tokens": self.max_batch_tokens,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failed": self.failed,
+        }
+
+    async def _fetch(self, keys: List[str], texts: List[str], model: str, timeout: httpx.Timeout) -> Dict[str, List[float]]:
+        out: Dict[str, List[float]] = {}
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def run(start: int, batch: List[str]) -> None:
+            async with sem:
+                vectors = await self._request(batch, model, timeout)
+            for k, vec in zip(keys[start:start + len(batch)], vectors):
+                out[k] = vec
+
+        starts, pos = [], 0
+        batches = self._pack(texts)
+        for batch in batches:
+            starts.append(pos)
+            pos += len(batch)
+        tasks = [asyncio.ensure_future(run(s, b)) for s, b in zip(starts, batches)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other batches instead of leaving them retrying unobserved, holding
+            # semaphore and limiter slots.
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            # Batches that did complete are kept for the next attempt.
+            if EMBEDDING_CACHE.enabled and out:
+                await EMBEDDING_CACHE.put_many_async(out)
+        return out
+
+    def _pack(self, texts: List[str]) -> List[List[str]]:
+        """
+        Split texts, in order, into batches within the token and item limits.
+        A text larger than the token limit gets a batch of its own.
+        """
+        batches: List[List[str]] = []
+        cur: List[str] = []
+        cur_tokens = 0
+        for t in texts:
+            n = estimate_tokens(t)
+            if cur and (cur_tokens + n > self.max_batch_tokens or len(cur) >= self.max_batch_items):
+                batches.append(cur)
+                cur, cur_tokens = [], 0
+            cur.append(t)
+            cur_tokens += n
+        if cur:
+            batches.append(cur)
+        return batches
+
+    async def _request(self, batch: List[str], model: str, timeout: httpx.Timeout) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self.requests += 1
+            wait: Optional[float] = None
+            try:
+                # Other upstreams are tried inside one attempt; backoff starts once all failed.
+                r = await post_embeddings({"input": batch, "model": model}, timeout, kind="batch")
+                if r.status_code not in _RETRY_STATUS:
+                    r.raise_for_status()
+                    data = sorted(r.json().get("data", []), key=lambda item: item.get("index", 0))
+                    if len(data) != len(batch):
+                        raise ValueError(f"embedding response has {len(data)} vectors for {len(batch)} inputs")
+                    return [item["embedding"] for item in data]
+                if r.status_code == 429:
+                    self.throttled += 1
+                wait = retry_after_s(r)
+                error: Exception = httpx.HTTPStatusError(f"HTTP {r.status_code}", request=r.request, response=r)
+            except httpx.TransportError as e:
+                error = e
+
+            if attempt >= self.max_retries:
+                self.failed += 1
+                raise error
+            if wait is None:
+                # Full jitter keeps concurrent batches from retrying in lockstep.
+                wait = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt)))
+            attempt += 1
+            self.retries += 1
+            log.info("embedding batch of %d retrying in %.2fs (attempt %d): %s", len(batch), wait, attempt, error)
+            await asyncio.sleep(min(wait, self.backoff_max_s))
+
+
+EMBEDDINGS = EmbeddingEngine(
+    max_batch_tokens=settings.EMBED_BATCH_MAX_TOKENS,
+    max_batch_items=settings.EMBED_BATCH_MAX_ITEMS,
+    concurrency=settings.EMBED_CONCURRENCY,
+    max_retries=settings.EMBED_MAX_RETRIES,
+)
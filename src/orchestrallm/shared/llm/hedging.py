@@ -0,0 +1,210 @@
+"""
+Hedged requests for latency-critical LLM calls.
+
+When an attempt has not produced its first byte (a streamed token, or a whole response
+for plain requests) within the recent latency percentile of its kind, a duplicate is
+sent; the first attempt to succeed wins and the other is cancelled. Hedges draw from a
+budget that grows by LLM_HEDGE_BUDGET per call, so duplicates stay a bounded fraction
+of upstream traffic even when the upstream as a whole slows down.
+
+An attempt cancelled before it finished (usually the slow one that lost) is recorded as
+a censored sample: its latency is only known to be at least the time it ran. The hedge
+delay is the Kaplan-Meier estimate of the latency percentile, so the slow attempts still
+count and do not bias the delay towards fast calls.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from orchestrallm.shared.config.settings import settings
+
+T = TypeVar("T")
+
+_EMPTY = object()
+
+
+class Hedger:
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        percentile: float = 95.0,
+        min_delay_s: float = 0.05,
+        budget_ratio: float = 0.05,
+        max_budget: float = 10.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ) -> None:
+        self.enabled = enabled
+        self.percentile = min(100.0, max(0.0, percentile))
+        self.min_delay_s = max(0.0, min_delay_s)
+        self.budget_ratio = max(0.0, budget_ratio)
+        self.max_budget = max(1.0, max_budget)
+        self.window = max(1, int(window))
+        self.min_samples = max(1, int(min_samples))
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.over_budget = 0
+        self.censored = 0
+        self._budget = 0.0
+        # key -> (latency_s, censored)
+        self._samples: Dict[str, Deque[Tuple[float, bool]]] = {}
+
+    def delay(self, key: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a call of this kind, or None while there are too
+        few latency samples to tell what is slow.
+        """
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay_s, _km_quantile(samples, self.percentile / 100.0))
+
+    def observe(self, key: str, latency_s: float, *, censored: bool = False) -> None:
+        """
+        Record a latency; censored means the attempt was stopped after latency_s, so its
+        real latency is at least that.
+        """
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append((latency_s, censored))
+        if censored:
+            self.censored += 1
+
+    async def call(self, key: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run attempt(), hedged with a second attempt() if the first is slow. attempt must
+        raise on failure so that the other attempt can still win.
+        """
+        return await self._race(key, attempt)
+
+    async def stream(self, key: str, start: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Iterate the stream returned by start(), hedged on the time to its first item.
+        Only the winning stream is read past its first item.
+        """
+        async def first() -> Any:
+            gen = start()
+            try:
+                return gen, await gen.__anext__()
+            except StopAsyncIteration:
+                return gen, _EMPTY
+            except BaseException:
+                await gen.aclose()
+                raise
+
+        async def discard(opened: Any) -> None:
+            await opened[0].aclose()
+
+        gen, item = await self._race(key, first, discard)
+        try:
+            if item is _EMPTY:
+                return
+            yield item
+            async for item in gen:
+                yield item
+        finally:
+            await gen.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        delays = {k: self.delay(k) for k in self._samples}
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "over_budget": self.over_budget,
+            "censored_samples": self.censored,
+            "delay_ms": {k: round(d * 1000, 1) for k, d in delays.items() if d is not None},
+        }
+
+    def _spend(self) -> bool:
+        if self._budget >= 1.0:
+            self._budget -= 1.0
+            return True
+        self.over_budget += 1
+        return False
+
+    async def _timed(self, key: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        t0 = time.monotonic()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            self.observe(key, time.monotonic() - t0, censored=True)
+            raise
+        self.observe(key, time.monotonic() - t0)
+        return result
+
+    async def _race(
+        self,
+        key: str,
+        attempt: Callable[[], Awaitable[T]],
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        self.calls += 1
+        self._budget = min(self.max_budget, self._budget + self.budget_ratio)
+        delay = self.delay(key) if self.enabled else None
+        if delay is None:
+            return await self._timed(key, attempt)
+
+        primary = asyncio.ensure_future(self._timed(key, attempt))
+        tasks: List[asyncio.Future] = [primary]
+        winner: Optional[asyncio.Future] = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._spend():
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(self._timed(key, attempt)))
+            while winner is None:
+                done, _ = await asyncio.wait([t for t in tasks if not t.done()] or tasks, return_when=asyncio.FIRST_COMPLETED)
+                ok = [t for t in tasks if t.done() and not t.cancelled() and t.exception() is None]
+                if ok:
+                    winner = ok[0]
+                elif all(t.done() for t in tasks):
+                    # Both failed: report the primary's error.
+                    winner = primary
+            if winner is not primary:
+                self.hedge_wins += 1
+            return winner.result()
+        finally:
+            losers = [t for t in tasks if t is not winner]
+            for t in losers:
+                t.cancel()
+            # Let the losers unwind (closing responses, releasing limiter slots) before
+            # returning, and retrieve their errors.
+            await asyncio.gather(*losers, return_exceptions=True)
+            if discard is not None:
+                for t in losers:
+                    if not t.cancelled() and t.exception() is None:
+                        # Finished at the same time as the winner: release it.
+                        await discard(t.result())
+
+
+def _km_quantile(samples: Iterable[Tuple[float, bool]], q: float) -> float:
+    """
+    q-quantile of the Kaplan-Meier estimate of the latency distribution. If censoring
+    leaves the estimate short of q, the largest sample is returned as a lower bound.
+    """
+    ordered = sorted(samples)
+    survival = 1.0
+    at_risk = len(ordered)
+    for latency, censored in ordered:
+        if not censored:
+            survival *= 1.0 - 1.0 / at_risk
+            if 1.0 - survival >= q:
+                return latency
+        at_risk -= 1
+    return ordered[-1][0]
+
+
+LLM_HEDGER = Hedger(
+    enabled=settings.LLM_HEDGE,
+    percentile=settings.LLM_HEDGE_PERCENTILE,
+    min_delay_s=settings.LLM_HEDGE_MIN_DELAY_MS / 1000.0,
+    budget_ratio=settings.LLM_HEDGE_BUDGET,
+)
@@ -0,0 +1,108 @@
+"""
+Long-lived HTTP clients for the LLM API.
+
+One async client (and one sync client for code running in threads) per worker process,
+so LLM calls reuse kept-alive connections instead of paying a TCP/TLS handshake each time.
+HTTP/2 multiplexes concurrent streams over few connections when the 'h2' package is
+installed; otherwise the clients fall back to HTTP/1.1 keep-alive.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+from orchestrallm.shared.config.settings import settings
+
+try:
+    import h2  # noqa: F401
+    _HAS_H2 = True
+except Exception:
+    _HAS_H2 = False
+
+log = logging.getLogger("llm.http")
+
+
+class LLMHttpClients:
+    def __init__(
+        self,
+        *,
+        http2: bool = True,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry_s: float = 30.0,
+        timeout_s: float = 60.0,
+    ) -> None:
+        if http2 and not _HAS_H2:
+            log.warning("LLM_HTTP2 is enabled but the 'h2' package is missing; using HTTP/1.1")
+        self.http2 = bool(http2 and _HAS_H2)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self.timeout = httpx.Timeout(timeout_s)
+        self._async: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync: Optional[httpx.Client] = None
+        self._pid: Optional[int] = None
+
+    def get_async(self) -> httpx.AsyncClient:
+        """
+        Return the worker's shared AsyncClient. Must be called from a running event loop.
+        """
+        self._check_pid()
+        loop = asyncio.get_running_loop()
+        # Connections belong to the loop that opened them; a new loop (tests, scripts
+        # calling asyncio.run repeatedly) gets a fresh client.
+        if self._async is None or self._async.is_closed or self._async_loop is not loop:
+            self._async = httpx.AsyncClient(http2=self.http2, limits=self.limits, timeout=self.timeout)
+            self._async_loop = loop
+        return self._async
+
+    def get_sync(self) -> httpx.Client:
+        """
+        Return the worker's shared sync Client, for code running in threads.
+        """
+        self._check_pid()
+        if self._sync is None or self._sync.is_closed:
+            self._sync = httpx.Client(http2=self.http2, limits=self.limits, timeout=self.timeout)
+        return self._sync
+
+    async def aclose(self) -> None:
+        if self._async is not None and self._async_loop is asyncio.get_running_loop():
+            await self._async.aclose()
+        self._async = None
+        self._async_loop = None
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "async_open": self._async is not None and not self._async.is_closed,
+            "sync_open": self._sync is not None and not self._sync.is_closed,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+    def _check_pid(self) -> None:
+        # Sockets inherited through a fork (gunicorn preload_app) must not be shared.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._async = None
+            self._async_loop = None
+            self._sync = None
+
+
+LLM_HTTP = LLMHttpClients(
+    http2=settings.LLM_HTTP2,
+    max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+    keepalive_expiry_s=settings.LLM_POOL_KEEPALIVE_EXPIRY_S,
+    timeout_s=settings.LLM_REQUEST_TIMEOUT,
+)
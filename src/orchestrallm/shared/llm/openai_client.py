@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import logging
 import time
 from typing import AsyncGenerator, Dict, List, Optional, Sequence
@@ -8,19 +7,18 @@ from typing import AsyncGenerator, Dict, List, Optional, Sequence
 import httpx
 
 from orchestrallm.shared.config.settings import settings
-from orchestrallm.shared.concurrency import LLM_STREAM_SEMAPHORE
+from orchestrallm.shared.concurrency import SlotAbandoned
+from orchestrallm.shared.llm.completion_cache import COMPLETION_CACHE
+from orchestrallm.shared.llm.embedding_cache import EMBEDDING_CACHE
+from orchestrallm.shared.llm.hedging import LLM_HEDGER
+from orchestrallm.shared.llm.http import LLM_HTTP
+from orchestrallm.shared.llm.singleflight import CHAT_FLIGHTS, EMBED_FLIGHTS
+from orchestrallm.shared.llm.sse import ChatStreamResult, aiter_sse, loads
+from orchestrallm.shared.llm.upstreams import FAILOVER_STATUS, LLM_UPSTREAMS, report_status, retry_after_s
+from orchestrallm.shared.metrics import EMBED_BATCH_SECONDS, LLM_RESPONSES, LLM_TOKENS_PER_SECOND, LLM_TTFT
 
 log = logging.getLogger("openai")
 
-_CHAT_URL = f"{settings.OPENAI_BASE_URL.rstrip('/')}/chat/completions"
-_EMB_URL  = f"{settings.OPENAI_BASE_URL.rstrip('/')}/embeddings"
-
-def _headers() -> Dict[str, str]:
-    return {
-        "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
 async def stream_chat(
     messages: List[Dict[str, str]],
     *,
@@ -28,9 +26,15 @@ async def stream_chat(
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
     request_timeout: Optional[int] = None,
+    result: Optional[ChatStreamResult] = None,
+    hedge: bool = False,
 ) -> AsyncGenerator[str, None]:
     """ 
     This function streams chat completions from the OpenAI API.
+    With the completion cache enabled, low-temperature answers are replayed from the cache;
+    identical deterministic requests in flight at the same time share one upstream stream.
+    Pass a ChatStreamResult to receive the finish reason and token usage once the stream ends.
+    With hedge (and LLM_HEDGE on), a request slow to send its first token is duplicated.
     """
     payload = {
         "model": (model or settings.CHAT_MODEL),
@@ -39,26 +43,122 @@ async def stream_chat(
         "stream": True,
         "max_tokens": max_tokens if max_tokens is not None else settings.MAX_TOKENS,
     }
+    if settings.LLM_STREAM_USAGE:
+        payload["stream_options"] = {"include_usage": True}
     timeout = httpx.Timeout(request_timeout or settings.LLM_REQUEST_TIMEOUT)
+    result = result if result is not None else ChatStreamResult()
+    source = _hedged_chat_upstream if hedge and LLM_HEDGER.enabled else _stream_chat_upstream
+
+    cacheable = COMPLETION_CACHE.cacheable(payload["temperature"])
+    coalesce = settings.LLM_COALESCE and payload["temperature"] <= settings.LLM_COALESCE_MAX_TEMPERATURE
+    if not (cacheable or coalesce):
+        async for tok in source(payload, timeout, result):
+            yield tok
+        return
+
+    key = COMPLETION_CACHE.key(payload["model"], messages, payload["temperature"], payload["max_tokens"])
+    if cacheable:
+        cached = await COMPLETION_CACHE.get(key)
+        if cached is not None:
+            result.cached = True
+            for tok in cached:
+                yield tok
+            return
+
+    async def upstream() -> AsyncGenerator[str, None]:
+        tokens: List[str] = []
+        async for tok in source(payload, timeout, result):
+            tokens.append(tok)
+            yield tok
+        # Only complete answers get here: a stream stopped early is closed before this point.
+        if cacheable and tokens:
+            await COMPLETION_CACHE.put(key, tokens)
+
+    async for tok in (CHAT_FLIGHTS.join(key, upstream, result) if coalesce else upstream()):
+        yield tok
+
+async def _hedged_chat_upstream(payload: Dict, timeout: httpx.Timeout, result: ChatStreamResult) -> AsyncGenerator[str, None]:
+    async def attempt() -> AsyncGenerator[str, None]:
+        own = ChatStreamResult()
+        async for tok in _stream_chat_upstream(payload, timeout, own):
+            yield tok
+        # Only the attempt that won the race is read to the end.
+        result.update(own)
+
+    async for tok in LLM_HEDGER.stream(f"chat:{payload['model']}", attempt):
+        yield tok
 
-    async with LLM_STREAM_SEMAPHORE:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            async with client.stream("POST", _CHAT_URL, headers=_headers(), json=payload) as resp:
-                resp.raise_for_status()
-                async for line in resp.aiter_lines():
-                    if not line or not line.startswith("data: "):
-                        continue
-                    data = line[len("data: "):].strip()
-                    if data == "[DONE]":
-                        break
-                    try:
-                        j = json.loads(data)
-                        delta = j["choices"][0].get("delta", {})
-                        tok = delta.get("content")
+async def _stream_chat_upstream(payload: Dict, timeout: httpx.Timeout, result: ChatStreamResult) -> AsyncGenerator[str, None]:
+    """
+    Stream one completion from the upstream router. Until the first token arrives, a
+    throttled, failing or unreachable upstream is swapped for another untried one.
+    """
+    model = payload["model"]
+    tried: List[str] = []
+    while True:
+        up = LLM_UPSTREAMS.pick("chat", model, tried)
+        last = not LLM_UPSTREAMS.has_alternative("chat", model, tried + [up.name])
+        tried.append(up.name)
+        n_tokens = 0
+        first_at = 0.0
+        try:
+            async with LLM_UPSTREAMS.slot(up, "chat", model, tried) as permit:
+                client = LLM_HTTP.get_async()
+                async with client.stream("POST", up.chat_url, headers=up.headers(), json=payload, timeout=timeout) as resp:
+                    report_status(permit, resp.status_code, "chat")
+                    if resp.status_code in FAILOVER_STATUS:
+                        up.record_failure(retry_after_s(resp))
+                        if not last:
+                            LLM_UPSTREAMS.failover(up, resp.status_code)
+                            continue
+                    resp.raise_for_status()
+                    async for data in aiter_sse(resp.aiter_bytes()):
+                        if data == b"[DONE]":
+                            # Read to the end of the body so the connection returns to the pool.
+                            continue
+                        try:
+                            j = loads(data)
+                        except ValueError:
+                            log.debug("skipping malformed stream chunk: %r", data[:200])
+                            continue
+                        if not isinstance(j, dict):
+                            continue
+                        if j.get("usage"):
+                            result.usage = j["usage"]
+                        if j.get("model"):
+                            result.model = j["model"]
+                        choices = j.get("choices")
+                        if not choices:
+                            continue
+                        choice = choices[0]
+                        if choice.get("finish_reason"):
+                            result.finish_reason = choice["finish_reason"]
+                        tok = (choice.get("delta") or {}).get("content")
                         if tok:
+                            if not n_tokens:
+                                permit.first_token()
+                                first_at = time.monotonic()
+                                LLM_TTFT.observe(permit.ttft, model=model)
+                                up.record_success("chat", permit.ttft)
+                            n_tokens += 1
                             yield tok
-                    except Exception:
-                        continue
+        except SlotAbandoned:
+            LLM_UPSTREAMS.failover(up, "throttled while queued")
+            continue
+        except httpx.TransportError as e:
+            if n_tokens:
+                raise
+            up.record_failure()
+            if last:
+                raise
+            LLM_UPSTREAMS.failover(up, e)
+            continue
+        if not n_tokens:
+            up.record_success("chat", None)
+        elapsed = time.monotonic() - first_at
+        if n_tokens > 1 and elapsed > 0:
+            LLM_TOKENS_PER_SECOND.observe((n_tokens - 1) / elapsed, model=model)
+        return
 
 async def complete_chat(
     messages: List[Dict[str, str]],
@@ -70,9 +170,10 @@ async def complete_chat(
 ) -> str:
     """
     This function completes a chat interaction by aggregating streamed tokens.
+    Nobody watches these tokens arrive, so slow requests are hedged (LLM_HEDGE).
     """
     buf: List[str] = []
-    async for tok in stream_chat(messages, model=model, temperature=temperature, max_tokens=max_tokens, request_timeout=request_timeout):
+    async for tok in stream_chat(messages, model=model, temperature=temperature, max_tokens=max_tokens, request_timeout=request_timeout, hedge=True):
         if tok:
             buf.append(tok)
     return "".join(buf)
@@ -86,26 +187,142 @@ def embed_texts_sync(
 ) -> List[List[float]]:
     """
     This function generates embeddings for a list of texts using the OpenAI API.
+    Cached embeddings are reused; only the misses are sent upstream.
     """
     if not texts:
         return []
-    timeout = httpx.Timeout(request_timeout or settings.LLM_REQUEST_TIMEOUT)
     used_model = (model or settings.EMBEDDING_MODEL)
+    if not EMBEDDING_CACHE.enabled:
+        return _embed_upstream_sync(texts, used_model, request_timeout, batch_size)
+
+    keys = [EMBEDDING_CACHE.key(used_model, t) for t in texts]
+    found = EMBEDDING_CACHE.get_many(keys)
+    missing = {k: t for k, t in zip(keys, texts) if k not in found}
+    if missing:
+        vectors = _embed_upstream_sync(list(missing.values()), used_model, request_timeout, batch_size)
+        fresh = dict(zip(missing.keys(), vectors))
+        EMBEDDING_CACHE.put_many(fresh)
+        found.update(fresh)
+    return [found[k] for k in keys]
+
+def _embed_upstream_sync(
+    texts: Sequence[str],
+    model: str,
+    request_timeout: Optional[int],
+    batch_size: int,
+) -> List[List[float]]:
+    timeout = httpx.Timeout(request_timeout or settings.LLM_REQUEST_TIMEOUT)
     out: List[List[float]] = []
-    with httpx.Client(timeout=timeout) as client:
-        for i in range(0, len(texts), batch_size):
-            chunk = texts[i:i+batch_size]
-            r = client.post(_EMB_URL, headers=_headers(), json={"input": list(chunk), "model": used_model})
-            r.raise_for_status()
-            data = r.json()
-            for item in data.get("data", []):
-                out.append(item["embedding"])
-            time.sleep(0.05)  # To avoid rate limits
+    for i in range(0, len(texts), batch_size):
+        chunk = texts[i:i+batch_size]
+        r = post_embeddings_sync({"input": list(chunk), "model": model}, timeout, kind="batch")
+        r.raise_for_status()
+        data = r.json()
+        for item in data.get("data", []):
+            out.append(item["embedding"])
     return out
 
+def post_embeddings_sync(payload: Dict, timeout: httpx.Timeout, *, kind: str) -> httpx.Response:
+    """
+    This function is the blocking counterpart of post_embeddings, with the same upstream
+    choice and failover. The asyncio limiters cannot be held from a blocking caller, so
+    each upstream's blocking calls are capped by its sync gate instead.
+    """
+    model = payload["model"]
+    client = LLM_HTTP.get_sync()
+    tried: List[str] = []
+    while True:
+        up = LLM_UPSTREAMS.pick("embeddings", model, tried)
+        last = not LLM_UPSTREAMS.has_alternative("embeddings", model, tried + [up.name])
+        tried.append(up.name)
+        try:
+            with up.sync_gate():
+                t0 = time.monotonic()
+                with EMBED_BATCH_SECONDS.time(kind=kind):
+                    r = client.post(up.embeddings_url, headers=up.headers(), json=payload, timeout=timeout)
+        except httpx.TransportError as e:
+            up.record_failure()
+            if last:
+                raise
+            LLM_UPSTREAMS.failover(up, e)
+            continue
+        LLM_RESPONSES.inc(endpoint="embeddings", status=r.status_code)
+        if r.status_code not in FAILOVER_STATUS:
+            up.record_success("embeddings", time.monotonic() - t0)
+            return r
+        up.record_failure(retry_after_s(r))
+        if last:
+            return r
+        LLM_UPSTREAMS.failover(up, r.status_code)
+
 def embed_query_sync(query: str, *, model: Optional[str] = None) -> List[float]:
     """
     This function generates an embedding for a single query string.
     """
     vecs = embed_texts_sync([query], model=model)
     return vecs[0] if vecs else []
+
+async def embed_query(query: str, *, model: Optional[str] = None, request_timeout: Optional[int] = None) -> List[float]:
+    """
+    This function generates an embedding for a single query string without blocking the event loop.
+    """
+    used_model = (model or settings.EMBEDDING_MODEL)
+    key = EMBEDDING_CACHE.key(used_model, query)
+    if EMBEDDING_CACHE.enabled:
+        found = await EMBEDDING_CACHE.get_many_async([key])
+        if key in found:
+            return found[key]
+
+    async def fetch(keys: List[str]) -> Dict[str, List[float]]:
+        timeout = httpx.Timeout(request_timeout or settings.LLM_REQUEST_TIMEOUT)
+
+        async def attempt() -> List[float]:
+            r = await post_embeddings({"input": query, "model": used_model}, timeout, kind="query")
+            r.raise_for_status()
+            data = r.json().get("data", [])
+            return data[0]["embedding"] if data else []
+
+        # The query embedding gates retrieval, so a slow one is hedged (LLM_HEDGE).
+        vec = await LLM_HEDGER.call(f"embeddings:{used_model}", attempt)
+        if vec and EMBEDDING_CACHE.enabled:
+            await EMBEDDING_CACHE.put_many_async({key: vec})
+        return {key: vec}
+
+    if settings.LLM_COALESCE:
+        return (await EMBED_FLIGHTS.run_many([key], fetch))[key]
+    return (await fetch([key]))[key]
+
+async def post_embeddings(payload: Dict, timeout: httpx.Timeout, *, kind: str) -> httpx.Response:
+    """
+    This function posts one embeddings request through the upstream router. A throttled,
+    failing or unreachable upstream is swapped for another untried one; the last
+    response (or transport error) is passed on to the caller.
+    """
+    model = payload["model"]
+    tried: List[str] = []
+    while True:
+        up = LLM_UPSTREAMS.pick("embeddings", model, tried)
+        last = not LLM_UPSTREAMS.has_alternative("embeddings", model, tried + [up.name])
+        tried.append(up.name)
+        try:
+            async with LLM_UPSTREAMS.slot(up, "embeddings", model, tried) as permit:
+                t0 = time.monotonic()
+                with EMBED_BATCH_SECONDS.time(kind=kind):
+                    r = await LLM_HTTP.get_async().post(up.embeddings_url, headers=up.headers(), json=payload, timeout=timeout)
+                report_status(permit, r.status_code, "embeddings")
+        except SlotAbandoned:
+            LLM_UPSTREAMS.failover(up, "throttled while queued")
+            continue
+        except httpx.TransportError as e:
+            up.record_failure()
+            if last:
+                raise
+            LLM_UPSTREAMS.failover(up, e)
+            continue
+        if r.status_code not in FAILOVER_STATUS:
+            up.record_success("embeddings", time.monotonic() - t0)
+            return r
+        up.record_failure(retry_after_s(r))
+        if last:
+            return r
+        LLM_UPSTREAMS.failover(up, r.status_code)
@@ -0,0 +1,205 @@
+"""
+Token-budgeted prompt assembly.
+
+Prompts are built from parts (system prompt, retrieved context, history turns, the user
+query, ...) whose sizes are estimated with shared.llm.tokens. When the parts do not fit
+the budget, optional parts are dropped or truncated lowest priority first (e.g. the
+oldest history turn before the newest, the lowest-ranked snippet before the best one);
+required parts are only shortened when nothing else is left. The budget is
+PROMPT_MAX_TOKENS, capped by the model's context window minus the reply's max_tokens.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.llm.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Role markers and separators the API adds around every chat message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# The first matching prefix wins, so more specific names come first.
+_CONTEXT_WINDOWS: Tuple[Tuple[str, int], ...] = (
+    ("gpt-4.1", 1_047_576),
+    ("gpt-4o", 128_000),
+    ("gpt-4-turbo", 128_000),
+    ("gpt-4-32k", 32_768),
+    ("gpt-4", 8_192),
+    ("gpt-3.5-turbo", 16_385),
+    ("o1", 200_000),
+    ("o3", 200_000),
+    ("o4", 200_000),
+)
+_DEFAULT_CONTEXT_WINDOW = 128_000
+_MIN_BUDGET = 256
+
+
+def context_window(model: str) -> int:
+    for prefix, window in _CONTEXT_WINDOWS:
+        if model.startswith(prefix):
+            return window
+    return _DEFAULT_CONTEXT_WINDOW
+
+
+def prompt_budget(model: Optional[str] = None, reply_tokens: Optional[int] = None) -> int:
+    """
+    Estimated tokens a prompt for model may use when reply_tokens are reserved for the answer.
+    """
+    window = context_window(model or settings.CHAT_MODEL)
+    reply = reply_tokens if reply_tokens is not None else settings.MAX_TOKENS
+    return max(_MIN_BUDGET, min(settings.PROMPT_MAX_TOKENS, window - reply))
+
+
+def truncate_to_tokens(text: str, tokens: int, keep: str = "head") -> str:
+    """
+    Cut text to about tokens estimated tokens, keeping its start ("head") or end ("tail").
+    """
+    chars = max(0, tokens - 1) * CHARS_PER_TOKEN
+    if len(text) <= chars:
+        return text
+    if keep == "tail":
+        return "…" + text[len(text) - chars + 1:]
+    return text[:max(0, chars - 1)] + "…"
+
+
+class PromptPart:
+    def __init__(
+        self,
+        kind: str,
+        text: str,
+        *,
+        priority: int = 0,
+        required: bool = False,
+        truncatable: bool = True,
+        keep: str = "head",
+        min_tokens: int = 64,
+        overhead: int = 0,
+    ) -> None:
+        self.kind = kind
+        self.text = text or ""
+        self.priority = priority
+        self.required = required
+        self.truncatable = truncatable
+        self.keep = keep
+        self.min_tokens = min_tokens
+        self.overhead = overhead
+        self.tokens = estimate_tokens(self.text)
+        self.dropped = False
+        self.truncated = False
+
+    @property
+    def cost(self) -> int:
+        return 0 if self.dropped else self.tokens + self.overhead
+
+    def truncate(self, tokens: int) -> int:
+        """
+        Shorten to about tokens; return the estimated tokens freed.
+        """
+        before = self.tokens
+        self.text = truncate_to_tokens(self.text, tokens, self.keep)
+        self.tokens = estimate_tokens(self.text)
+        self.truncated = self.tokens < before
+        return before - self.tokens
+
+    def drop(self) -> int:
+        freed = self.cost
+        self.dropped = True
+        return freed
+
+
+def fit_parts(parts: Sequence[PromptPart], budget: int) -> Dict[str, Any]:
+    """
+    Drop or truncate parts in place until their estimated size fits budget, and return a
+    report with the resulting token counts per kind of part.
+    """
+    over = sum(p.cost for p in parts) - budget
+    # sorted() is stable: equal priorities are given up in list order.
+    for p in sorted((p for p in parts if not p.required), key=lambda p: p.priority):
+        if over <= 0:
+            break
+        if p.truncatable and p.tokens - over >= p.min_tokens:
+            over -= p.truncate(p.tokens - over)
+        else:
+            over -= p.drop()
+    if over > 0:
+        # Only required parts are left: shorten the largest ones.
+        for p in sorted((p for p in parts if p.required and p.truncatable), key=lambda p: -p.tokens):
+            if over <= 0:
+                break
+            over -= p.truncate(max(p.min_tokens, p.tokens - over))
+
+    report: Dict[str, Any] = {"budget": budget, "prompt_tokens": sum(p.cost for p in parts)}
+    for p in parts:
+        key = f"{p.kind}_tokens"
+        report[key] = report.get(key, 0) + p.cost
+    report["dropped"] = sum(1 for p in parts if p.dropped)
+    report["truncated"] = sum(1 for p in parts if p.truncated and not p.dropped)
+    return report
+
+
+def assemble_chat_messages(
+    system: str,
+    query: str,
+    *,
+    history: Optional[Iterable[Dict[str, Any]]] = None,
+    context: Optional[Sequence[str]] = None,
+    format_context: Optional[Callable[[List[str]], str]] = None,
+    model: Optional[str] = None,
+    reply_tokens: Optional[int] = None,
+) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    This function builds [system, *history, user] messages within the prompt budget.
+    context holds retrieved snippets, best first; the kept ones are rendered with
+    format_context and appended to the system prompt. History turns are dropped oldest
+    first, then the lowest-ranked snippets; the system prompt and the query are kept.
+    """
+    turns = [
+        m for m in (history or [])
+        if m.get("role") in ("user", "assistant") and m.get("content")
+    ]
+    snippets = list(context or [])
+
+    system_part = PromptPart("system", system, required=True, overhead=MESSAGE_OVERHEAD_TOKENS)
+    query_part = PromptPart("query", query, required=True, keep="tail", overhead=MESSAGE_OVERHEAD_TOKENS + 3)
+    history_parts = [
+        PromptPart("history", m["content"], priority=i, truncatable=False, overhead=MESSAGE_OVERHEAD_TOKENS)
+        for i, m in enumerate(turns)
+    ]
+    # Snippets outrank every history turn; within them the retrieval order decides.
+    context_parts = [
+        PromptPart("context", s, priority=len(turns) + len(snippets) - i, min_tokens=128, overhead=8)
+        for i, s in enumerate(snippets)
+    ]
+    report = fit_parts([system_part, *context_parts, *history_parts, query_part], prompt_budget(model, reply_tokens))
+
+    system_text = system_part.text
+    if format_context is not None:
+        system_text += format_context([p.text for p in context_parts if not p.dropped])
+    messages: List[Dict[str, str]] = [{"role": "system", "content": system_text}]
+    for m, p in zip(turns, history_parts):
+        if not p.dropped:
+            messages.append({"role": m["role"], "content": m["content"]})
+    messages.append({"role": "user", "content": query_part.text})
+    return messages, report
+
+
+def assemble_sections(
+    sections: Sequence[Tuple[str, str, int]],
+    *,
+    reserved: int = 0,
+    model: Optional[str] = None,
+    reply_tokens: Optional[int] = None,
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    This function fits the named sections of one prompt, given as (name, text, priority),
+    into the budget minus reserved tokens. Priority 0 sections are required. Returns the
+    possibly shortened text per name ("" when dropped) and the report.
+    """
+    parts = [
+        PromptPart(name, text, priority=priority, required=(priority == 0))
+        for name, text, priority in sections
+    ]
+    report = fit_parts(parts, prompt_budget(model, reply_tokens) - reserved)
+    report["budget"] += reserved
+    report["prompt_tokens"] += reserved
+    return {p.kind: ("" if p.dropped else p.text) for p in parts}, report
@@ -0,0 +1,153 @@
+"""
+Single-flight coalescing of identical in-flight upstream requests.
+
+KeyedFlights shares per-key results (e.g. embeddings by cache key): callers asking for
+keys that are already being fetched wait for that fetch instead of sending their own.
+
+StreamFlights shares a token stream: the first caller for a key starts the upstream
+stream in a background task, and every caller, including late joiners, receives all
+tokens from the beginning. The upstream stream is cancelled once no caller is left.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class KeyedFlights:
+    def __init__(self) -> None:
+        self.leaders = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run_many(
+        self,
+        keys: Sequence[str],
+        fetch: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Return {key: value} for keys, calling fetch only for the keys nobody else is
+        fetching right now. fetch must return a value for every key it is given.
+        """
+        loop = asyncio.get_running_loop()
+        own: List[str] = []
+        waiting: Dict[str, asyncio.Future] = {}
+        for k in dict.fromkeys(keys):
+            fut = self._inflight.get(k)
+            if fut is None:
+                self._inflight[k] = loop.create_future()
+                own.append(k)
+            else:
+                waiting[k] = fut
+        self.coalesced += len(waiting)
+
+        out: Dict[str, Any] = {}
+        if own:
+            self.leaders += 1
+            try:
+                fetched = await fetch(own)
+            except BaseException as e:
+                for k in own:
+                    fut = self._inflight.pop(k)
+                    fut.set_exception(e if isinstance(e, Exception) else _LeaderCancelled())
+                    # Mark retrieved: there may be no followers.
+                    fut.exception()
+                raise
+            for k in own:
+                self._inflight.pop(k).set_result(fetched[k])
+            out.update((k, fetched[k]) for k in own)
+        for k, fut in waiting.items():
+            try:
+                out[k] = await asyncio.shield(fut)
+            except _LeaderCancelled:
+                # The caller that was fetching this key went away: fetch it ourselves.
+                out.update(await self.run_many([k], fetch))
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced}
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.state: Any = None
+
+
+class StreamFlights:
+    def __init__(self) -> None:
+        self.leaders = 0
+        self.coalesced = 0
+        self._flights: Dict[str, _Flight] = {}
+
+    async def join(self, key: str, start: Callable[[], AsyncIterator[str]], state: Any = None) -> AsyncIterator[str]:
+        """
+        Yield the tokens of the stream for key, starting it with start() if it is not
+        already running. state is an object start() fills in as the stream goes; callers
+        that joined a running stream get theirs updated from it (state.update(other))
+        once the stream has ended.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.state = state
+            flight.task = asyncio.ensure_future(self._produce(key, flight, start))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.followers += 1
+        i = 0
+        try:
+            while True:
+                if i < len(flight.tokens):
+                    yield flight.tokens[i]
+                    i += 1
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    if state is not None and flight.state is not None and state is not flight.state:
+                        state.update(flight.state)
+                    return
+                flight.changed.clear()
+                await flight.changed.wait()
+        finally:
+            flight.followers -= 1
+            if flight.followers == 0 and not flight.done and flight.task is not None:
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    self._flights.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._flights), "leaders": self.leaders, "coalesced": self.coalesced}
+
+    async def _produce(self, key: str, flight: _Flight, start: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for tok in start():
+                flight.tokens.append(tok)
+                flight.changed.set()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.changed.set()
+            # Later requests start a new flight (or hit the completion cache).
+            if self._flights.get(key) is flight:
+                self._flights.pop(key, None)
+
+
+EMBED_FLIGHTS = KeyedFlights()
+CHAT_FLIGHTS = StreamFlights()
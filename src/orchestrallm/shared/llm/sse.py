@@ -0,0 +1,104 @@
+"""
+Incremental Server-Sent Events decoding for streamed chat completions.
+
+The decoder works on the raw response bytes: chunks are split into lines as they
+arrive (LF, CRLF or CR endings), only "data" fields are kept, and an event's payload is
+returned once the blank line that ends it has been seen. Payloads stay bytes, so they
+can go straight to orjson when it is installed.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+_json_decode = json.JSONDecoder().decode
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    # Payloads are UTF-8 by the SSE spec; skip json.loads' encoding detection.
+    return _json_decode(data.decode("utf-8"))
+
+
+class SSEDecoder:
+    def __init__(self) -> None:
+        self._buf = b""
+        self._data: List[bytes] = []
+        self._pending_cr = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Add a chunk of the response body and return the payloads of the events it completes.
+        """
+        if self._pending_cr and chunk.startswith(b"\n"):
+            # The CRLF of the previous chunk's last line was split across chunks.
+            chunk = chunk[1:]
+        self._pending_cr = chunk.endswith(b"\r")
+        if b"\r" in chunk:
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        buf = self._buf + chunk if self._buf else chunk
+        lines = buf.split(b"\n")
+        self._buf = lines.pop()
+
+        out: List[bytes] = []
+        data = self._data
+        for line in lines:
+            if not line:
+                if data:
+                    out.append(data[0] if len(data) == 1 else b"\n".join(data))
+                    data = self._data = []
+                continue
+            if line.startswith(b"data:"):
+                value = line[5:]
+                data.append(value[1:] if value.startswith(b" ") else value)
+            # Comments (":") and other fields (event, id, retry) are not used by the API.
+        return out
+
+    def close(self) -> List[bytes]:
+        """
+        Return the payload of a final event the stream did not terminate with a blank line.
+        """
+        out = self.feed(b"\n\n") if (self._buf or self._data) else []
+        self._buf, self._data = b"", []
+        return out
+
+
+async def aiter_sse(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Yield the event payloads of an SSE byte stream (e.g. httpx's resp.aiter_bytes()).
+    """
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for data in decoder.feed(chunk):
+            yield data
+    for data in decoder.close():
+        yield data
+
+
+class ChatStreamResult:
+    """
+    What a chat stream reported besides its tokens: the finish reason and the token
+    usage of the final chunk.
+    """
+
+    def __init__(self) -> None:
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.model: Optional[str] = None
+        self.cached = False
+
+    def update(self, other: "ChatStreamResult") -> None:
+        self.finish_reason = other.finish_reason
+        self.usage = other.usage
+        self.model = other.model
+        self.cached = other.cached
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"finish_reason": self.finish_reason, "usage": self.usage, "model": self.model, "cached": self.cached}
@@ -0,0 +1,13 @@
+"""
+Cheap token estimates for budgeting requests without a tokenizer dependency.
+"""
+from __future__ import annotations
+
+# OpenAI tokenizers average roughly four characters per token on English text; other
+# languages (e.g. Turkish) need more tokens, so limits built on this need some headroom.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
@@ -0,0 +1,277 @@
+"""
+OpenAI-compatible upstreams and the router that spreads LLM calls across them.
+
+OPENAI_UPSTREAMS declares the endpoints as a JSON list, e.g.
+  [{"name": "gw-a", "base_url": "https://gw-a/v1", "api_key": "...", "weight": 2, "max_concurrency": 40},
+   {"name": "gw-b", "base_url": "https://gw-b/v1", "weight": 1}]
+(api_key defaults to OPENAI_API_KEY); without it the single OPENAI_BASE_URL is used.
+
+Each upstream tracks an EWMA of its latency per endpoint kind (time to first token for
+chat, request time for embeddings) and of its error rate. Calls are spread randomly in
+proportion to weight / (latency x load x errors), so faster, idler and healthier
+upstreams get more of them. A 429, 5xx or connection failure puts the upstream in a
+cooldown (Retry-After, or an exponential backoff) during which it is skipped, and calls
+queued on its concurrency limiter move to another upstream. Blocking callers, which
+cannot wait on the asyncio limiters, are capped per upstream by sync_gate().
+"""
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from orchestrallm.shared.concurrency import LLM_LIMITERS, LimiterRegistry, Permit
+from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.metrics import LLM_RESPONSES
+
+log = logging.getLogger("llm.upstreams")
+
+FAILOVER_STATUS = frozenset({429, 500, 502, 503, 504})
+
+_EWMA_ALPHA = 0.2
+_COOLDOWN_BASE_S = 0.5
+_COOLDOWN_MAX_S = 30.0
+
+
+class NoUpstreamAvailable(RuntimeError):
+    """
+    Raised by UpstreamRouter.pick() when every upstream has been excluded.
+    """
+
+
+def retry_after_s(resp: httpx.Response) -> Optional[float]:
+    """
+    Seconds the server asked us to wait, from 'retry-after-ms' or 'Retry-After'
+    (delta-seconds or HTTP-date).
+    """
+    ms = resp.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def report_status(permit: Permit, status_code: int, endpoint: str) -> None:
+    """
+    Tell the concurrency limiter (and the metrics) how an upstream response went.
+    """
+    LLM_RESPONSES.inc(endpoint=endpoint, status=status_code)
+    if status_code == 429:
+        permit.throttled()
+    elif status_code >= 500:
+        permit.failed()
+    elif status_code >= 400:
+        permit.neutral()
+
+
+class Upstream:
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        api_key: str,
+        *,
+        weight: float = 1.0,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.weight = max(0.0, float(weight))
+        self.max_concurrency = int(max_concurrency) if max_concurrency else None
+        self.latency_s: Dict[str, float] = {}
+        self.error_rate = 0.0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._throttled: Optional[Tuple[asyncio.Event, asyncio.AbstractEventLoop]] = None
+        self._sync_gate: Optional[threading.BoundedSemaphore] = None
+        self._sync_gate_lock = threading.Lock()
+
+    @property
+    def chat_url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    @property
+    def embeddings_url(self) -> str:
+        return f"{self.base_url}/embeddings"
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def available(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) >= self.cooldown_until
+
+    def throttle_signal(self) -> asyncio.Event:
+        """
+        Event set the next time this upstream goes into cooldown.
+        """
+        if self._throttled is None:
+            self._throttled = (asyncio.Event(), asyncio.get_running_loop())
+        return self._throttled[0]
+
+    def sync_gate(self) -> threading.BoundedSemaphore:
+        """
+        Concurrency cap of blocking calls to this upstream: max_concurrency, or
+        LLM_MAX_CONCURRENCY.
+        """
+        with self._sync_gate_lock:
+            if self._sync_gate is None:
+                self._sync_gate = threading.BoundedSemaphore(self.max_concurrency or settings.LLM_MAX_CONCURRENCY)
+            return self._sync_gate
+
+    def record_success(self, kind: str, latency_s: Optional[float]) -> None:
+        self.error_rate *= 1 - _EWMA_ALPHA
+        self.consecutive_failures = 0
+        if latency_s is not None:
+            prev = self.latency_s.get(kind)
+            self.latency_s[kind] = latency_s if prev is None else prev + _EWMA_ALPHA * (latency_s - prev)
+
+    def record_failure(self, retry_after: Optional[float] = None) -> None:
+        self.error_rate += _EWMA_ALPHA * (1 - self.error_rate)
+        self.failures += 1
+        self.consecutive_failures += 1
+        if retry_after is None:
+            retry_after = min(_COOLDOWN_MAX_S, _COOLDOWN_BASE_S * (2 ** (self.consecutive_failures - 1)))
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + min(retry_after, _COOLDOWN_MAX_S))
+        if self._throttled is not None:
+            # Wake callers queued for this upstream; later ones get a fresh event.
+            event, loop = self._throttled
+            self._throttled = None
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                event.set()
+            elif not loop.is_closed():
+                # Reported by a blocking caller on another thread.
+                loop.call_soon_threadsafe(event.set)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "weight": self.weight,
+            "max_concurrency": self.max_concurrency,
+            "latency_ms": {k: round(v * 1000, 1) for k, v in self.latency_s.items()},
+            "error_rate": round(self.error_rate, 4),
+            "failures": self.failures,
+            "cooldown_s": round(max(0.0, self.cooldown_until - time.monotonic()), 2),
+        }
+
+
+class UpstreamRouter:
+    def __init__(self, upstreams: List[Upstream], limiters: LimiterRegistry) -> None:
+        if not upstreams:
+            raise ValueError("at least one LLM upstream is required")
+        if not any(u.weight > 0 for u in upstreams):
+            raise ValueError("at least one LLM upstream needs a weight above 0")
+        self.upstreams = upstreams
+        self.limiters = limiters
+        self.failovers = 0
+        self._multi = len(upstreams) > 1
+
+    def limiter(self, up: Upstream, kind: str, model: str):
+        # A single upstream keeps the plain "<kind>:<model>" pool names.
+        return self.limiters.get(
+            kind, model, upstream=up.name if self._multi else "", max_limit=up.max_concurrency
+        )
+
+    def _candidates(self, exclude: Iterable[str]) -> List[Upstream]:
+        excluded = set(exclude)
+        return [u for u in self.upstreams if u.name not in excluded and u.weight > 0]
+
+    def pick(self, kind: str, model: str, exclude: Iterable[str] = ()) -> Upstream:
+        """
+        Choose an upstream for the next call; raises NoUpstreamAvailable when every
+        upstream is excluded. Upstreams in cooldown are only chosen when all candidates
+        are cooling down, the one free again soonest first.
+        """
+        exclude = list(exclude)
+        candidates = self._candidates(exclude)
+        if not candidates:
+            raise NoUpstreamAvailable(f"no LLM upstream left for {kind}:{model} (excluded: {', '.join(exclude)})")
+        if len(candidates) == 1:
+            return candidates[0]
+        now = time.monotonic()
+        ready = [u for u in candidates if u.available(now)]
+        if not ready:
+            return min(candidates, key=lambda u: u.cooldown_until)
+
+        known = [u.latency_s[kind] for u in ready if kind in u.latency_s]
+        # Upstreams without samples are scored like the fastest one, so they get tried.
+        floor = min(known) if known else 1.0
+        scores = []
+        for u in ready:
+            pool = self.limiter(u, kind, model)
+            load = (pool.in_flight + pool.queued) / max(1, pool.current_limit)
+            latency = max(1e-3, u.latency_s.get(kind, floor))
+            scores.append(u.weight / (latency * (1 + load) * (1 + 4 * u.error_rate)))
+        return random.choices(ready, weights=scores, k=1)[0]
+
+    def has_alternative(self, kind: str, model: str, exclude: Iterable[str]) -> bool:
+        return bool(self._candidates(exclude))
+
+    @asynccontextmanager
+    async def slot(self, up: Upstream, kind: str, model: str, exclude: Iterable[str] = ()) -> AsyncIterator[Permit]:
+        """
+        Hold a concurrency slot on up. While queued, the wait is abandoned (SlotAbandoned)
+        if up starts throttling and another upstream is left to try.
+        """
+        excluded = set(exclude) | {up.name}
+        abandon = up.throttle_signal() if self.has_alternative(kind, model, excluded) else None
+        async with self.limiter(up, kind, model).slot(abandon) as permit:
+            yield permit
+
+    def failover(self, up: Upstream, reason: Any) -> None:
+        self.failovers += 1
+        log.info("LLM upstream %s unavailable (%s); failing over", up.name, reason)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"failovers": self.failovers, "upstreams": {u.name: u.stats() for u in self.upstreams}}
+
+
+def load_upstreams() -> List[Upstream]:
+    raw = (settings.OPENAI_UPSTREAMS or "").strip()
+    if not raw:
+        return [Upstream("default", settings.OPENAI_BASE_URL, settings.OPENAI_API_KEY)]
+    try:
+        items = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"OPENAI_UPSTREAMS is not valid JSON: {e}") from e
+    upstreams = []
+    for i, item in enumerate(items):
+        upstreams.append(Upstream(
+            str(item.get("name") or f"upstream-{i}"),
+            item["base_url"],
+            item.get("api_key") or settings.OPENAI_API_KEY,
+            weight=item.get("weight", 1.0),
+            max_concurrency=item.get("max_concurrency"),
+        ))
+    return upstreams
+
+
+LLM_UPSTREAMS = UpstreamRouter(load_upstreams(), LLM_LIMITERS)
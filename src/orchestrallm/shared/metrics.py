@@ -0,0 +1,232 @@
+"""
+Minimal Prometheus metrics: counters, gauges and histograms rendered in the text
+exposition format by GET /metrics.
+
+Recording is a dict lookup, a bisect and a few additions under an uncontended lock, so
+the instrumentation can stay on in production; METRICS_ENABLED=false turns it into a
+flag check. Values are per process: with several gunicorn workers every worker has its
+own, and each scrape reaches one of them.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from orchestrallm.shared.config.settings import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_BUCKETS = (1, 5, 10, 20, 40, 60, 80, 100, 150, 200, 300, 500)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, registry: "Registry", name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    A gauge that is either set directly or, with collect, read at scrape time.
+    collect returns {label values: value}.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels: Any) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self._collect is not None:
+            try:
+                items = list(self._collect().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count above the last bucket, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(row)) for k, row in self._values.items()]
+        out: List[str] = []
+        for key, row in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets + (math.inf,), row):
+                cumulative += n
+                le = 'le="' + _num(bound) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {_num(cumulative)}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(row[-1])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {_num(cumulative)}")
+        return out
+
+
+class Registry:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return Counter(self, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = (), collect=None) -> Gauge:
+        return Gauge(self, name, help, labelnames, collect)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return Histogram(self, name, help, labelnames, buckets)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry(enabled=settings.METRICS_ENABLED)
+
+# LLM calls (shared/concurrency.py, shared/llm/openai_client.py)
+LLM_QUEUE_WAIT = METRICS.histogram(
+    "orchestrallm_llm_queue_wait_seconds", "Time spent waiting for an LLM concurrency slot", ("pool",)
+)
+LLM_TTFT = METRICS.histogram(
+    "orchestrallm_llm_ttft_seconds", "Time from sending a chat request to its first token", ("model",)
+)
+LLM_TOKENS_PER_SECOND = METRICS.histogram(
+    "orchestrallm_llm_tokens_per_second", "Streamed chat tokens per second after the first token", ("model",), RATE_BUCKETS
+)
+LLM_RESPONSES = METRICS.counter(
+    "orchestrallm_llm_responses_total", "Upstream LLM responses by endpoint and HTTP status", ("endpoint", "status")
+)
+EMBED_BATCH_SECONDS = METRICS.histogram(
+    "orchestrallm_embedding_batch_seconds", "Latency of one embedding request (batch or query)", ("kind",)
+)
+
+# Vector store and Mongo
+QDRANT_SECONDS = METRICS.histogram(
+    "orchestrallm_qdrant_seconds", "Latency of Qdrant calls", ("op",)
+)
+RAG_RERANK_SECONDS = METRICS.histogram(
+    "orchestrallm_rag_rerank_seconds", "Latency of locally reranking RAG candidates"
+)
+MONGO_WRITE_SECONDS = METRICS.histogram(
+    "orchestrallm_mongo_stream_write_seconds", "Latency of stream event writes to Mongo", ("op",)
+)
+
+# Streaming
+WS_SEND_SECONDS = METRICS.histogram(
+    "orchestrallm_ws_send_seconds", "Latency of one WebSocket frame send", ("encoding",)
+)
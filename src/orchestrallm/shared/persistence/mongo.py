@@ -1,14 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import os
 import time
-from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
 
 from pymongo import MongoClient, ASCENDING, ReturnDocument
 from pymongo.errors import OperationFailure
 from orchestrallm.shared.config.settings import settings
+from orchestrallm.shared.metrics import MONGO_WRITE_SECONDS
 
 _client: Optional[MongoClient] = None
 _db = None
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+
+T = TypeVar("T")
 
 
 def get_client() -> MongoClient:
@@ -25,6 +35,32 @@ def get_db():
     return _db
 
 
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    # Worker threads do not survive a fork (gunicorn preload_app): create the pool in
+    # the process that uses it.
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=settings.MONGO_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+        _executor_pid = os.getpid()
+    return _executor
+
+
+async def run_in_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking pymongo call on the dedicated Mongo thread pool, so the event loop
+    keeps serving other requests during the round trip.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_db_executor() -> None:
+    global _executor
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=True)
+    _executor = None
+
+
 def ensure_indexes() -> None:
     """Create indexes for collections if they do not exist."""
     db = get_db()
@@ -39,6 +75,14 @@ def ensure_indexes() -> None:
             streams.create_index([("task_id", ASCENDING), ("seq", ASCENDING)], name="task_seq")
         if "created_at" not in streams.index_information():
             streams.create_index([("created_at", ASCENDING)], name="created_at")
+        if "expire_at_ttl" not in streams.index_information():
+            streams.create_index([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0)
+        if "expire_at_ttl" not in db.counters.index_information():
+            db.counters.create_index([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0)
+        for name in (settings.EMBEDDING_CACHE_COLLECTION, settings.COMPLETION_CACHE_COLLECTION):
+            cache = db.get_collection(name)
+            if "expire_at_ttl" not in cache.index_information():
+                cache.create_index([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0)
         if "conv_user_session" not in convs.index_information():
             convs.create_index(
                 [("user_id", ASCENDING), ("session_id", ASCENDING)],
@@ -61,18 +105,65 @@ def ensure_indexes() -> None:
         pass
 
 
-def _next_sequence_for_task(task_id: str) -> int:
-    """Generate the next incremental sequence number for a given task_id."""
+def create_task_record(task_id: str, task_type: str, **fields) -> None:
+    """Create (or reset) the record of a task in the 'tasks' collection with status 'queued'."""
+    get_db().tasks.update_one(
+        {"task_id": task_id},
+        {"$set": {"type": task_type, "status": "queued", **fields, "created_at": time.time()}},
+        upsert=True,
+    )
+
+
+def set_task_status(task_id: str, status: str, **fields) -> None:
+    """Update the status (and any extra fields) of a task record."""
+    get_db().tasks.update_one({"task_id": task_id}, {"$set": {"status": status, **fields}})
+
+
+async def create_task_record_async(task_id: str, task_type: str, **fields) -> None:
+    await run_in_db(create_task_record, task_id, task_type, **fields)
+
+
+async def set_task_status_async(task_id: str, status: str, **fields) -> None:
+    await run_in_db(set_task_status, task_id, status, **fields)
+
+
+def stream_expire_at() -> Optional[datetime]:
+    """Return the TTL deadline for stream documents written now, or None if retention is disabled."""
+    if settings.STREAM_RETENTION_HOURS <= 0:
+        return None
+    return datetime.now(timezone.utc) + timedelta(hours=settings.STREAM_RETENTION_HOURS)
+
+
+def next_sequence_for_task(task_id: str) -> int:
+    """Generate the next incremental sequence number for a given task_id from the 'counters' collection."""
     db = get_db()
     doc = db.counters.find_one_and_update(
         {"_id": f"streams:{task_id}"},
-        {"$inc": {"seq": 1}},
+        {"$inc": {"seq": 1}, "$set": {"expire_at": stream_expire_at()}},
         upsert=True,
         return_document=ReturnDocument.AFTER,
     )
     return int(doc.get("seq", 1))
 
 
+def max_stream_seq(task_id: str) -> int:
+    """Return the highest stored sequence number for a given task_id, or 0 if it has no events."""
+    doc = get_db().streams.find_one(
+        {"task_id": task_id},
+        projection={"_id": 0, "seq": 1},
+        sort=[("seq", -1)],
+    )
+    return int((doc or {}).get("seq", 0))
+
+
+async def next_sequence_for_task_async(task_id: str) -> int:
+    return await run_in_db(next_sequence_for_task, task_id)
+
+
+async def max_stream_seq_async(task_id: str) -> int:
+    return await run_in_db(max_stream_seq, task_id)
+
+
 def _normalize_event_args(*args, **kwargs) -> Dict[str, Any]:
     """
     Backward compatibility:
@@ -103,16 +194,11 @@ def _normalize_event_args(*args, **kwargs) -> Dict[str, Any]:
     raise TypeError("save_stream_event: invalid arguments. Use event dict or (task_id, typ, **fields).")
 
 
-def save_stream_event(*args, **kwargs) -> Dict[str, Any]:
+def prepare_stream_event(*args, **kwargs) -> Dict[str, Any]:
     """
-    Persist an event to the 'streams' collection.
-    Compatible signatures:
-      - save_stream_event(event_dict)
-      - save_stream_event(task_id, typ, **fields)
-
-    Automatically adds 'seq' and 'created_at' fields.
+    Normalize an event and stamp it with 'seq' and 'created_at' without persisting it.
+    Accepts the same signatures as save_stream_event.
     """
-    db = get_db()
     ev = _normalize_event_args(*args, **kwargs)
 
     if "task_id" not in ev:
@@ -121,9 +207,171 @@ def save_stream_event(*args, **kwargs) -> Dict[str, Any]:
         raise ValueError("save_stream_event: 'type' is required.")
 
     if "seq" not in ev:
-        ev["seq"] = _next_sequence_for_task(ev["task_id"])
+        ev["seq"] = next_sequence_for_task(ev["task_id"])
     if "created_at" not in ev:
         ev["created_at"] = time.time()
+    return ev
+
+
+def save_stream_event(*args, **kwargs) -> Dict[str, Any]:
+    """
+    Persist an event to the 'streams' collection.
+    Compatible signatures:
+      - save_stream_event(event_dict)
+      - save_stream_event(task_id, typ, **fields)
 
-    db.streams.insert_one(ev)
+    Automatically adds 'seq' and 'created_at' fields.
+    """
+    db = get_db()
+    ev = prepare_stream_event(*args, **kwargs)
+    with MONGO_WRITE_SECONDS.time(op="insert_one"):
+        db.streams.insert_one({**ev, "expire_at": stream_expire_at()})
     return ev
+
+
+def save_stream_events(events: List[Dict[str, Any]]) -> None:
+    """
+    Persist already prepared events to the 'streams' collection in one round trip.
+    """
+    if not events:
+        return
+    expire_at = stream_expire_at()
+    for ev in events:
+        ev["expire_at"] = expire_at
+    with MONGO_WRITE_SECONDS.time(op="insert_many"):
+        get_db().streams.insert_many(events, ordered=True)
+
+
+async def save_stream_event_async(*args, **kwargs) -> Dict[str, Any]:
+    return await run_in_db(save_stream_event, *args, **kwargs)
+
+
+async def save_stream_events_async(events: List[Dict[str, Any]]) -> None:
+    await run_in_db(save_stream_events, events)
+
+
+def _merge_token_runs(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge consecutive token events into runs of the form
+    {"type": "token", "seq_from", "seq", "content", "sizes"}; 'sizes' holds the length of
+    every original token so a run can be cut at any seq. Other events are kept as they are.
+    """
+    out: List[Dict[str, Any]] = []
+    last_seq = 0
+    for ev in sorted(events, key=lambda e: int(e.get("seq_from", e["seq"]))):
+        seq = int(ev["seq"])
+        if seq <= last_seq:
+            continue
+        last_seq = seq
+        ev = {k: v for k, v in ev.items() if k not in ("_id", "task_id", "expire_at")}
+        if ev.get("type") != "token":
+            out.append(ev)
+            continue
+        content = ev.get("content") or ""
+        sizes = list(ev.get("sizes") or [len(content)])
+        first = int(ev.get("seq_from", seq))
+        prev = out[-1] if out else None
+        if prev is not None and prev.get("type") == "token" and first == prev["seq"] + 1:
+            prev["content"] += content
+            prev["sizes"].extend(sizes)
+            prev["seq"] = seq
+        else:
+            out.append({**ev, "seq_from": first, "seq": seq, "content": content, "sizes": sizes})
+    return out
+
+
+def compact_stream(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Replace the per-event documents of a finished task with one compact document holding
+    its status events, merged token runs and the full text. The compact document is
+    written before the originals are deleted, so readers never miss an event; they drop
+    duplicates by seq. Returns the compact document, or None if there was nothing to do.
+    """
+    db = get_db()
+    docs = list(db.streams.find({"task_id": task_id}).sort("seq", ASCENDING))
+    if not docs or (len(docs) == 1 and docs[0].get("compact")):
+        return None
+
+    events: List[Dict[str, Any]] = []
+    for doc in docs:
+        events.extend((doc.get("events") or []) if doc.get("compact") else [doc])
+    events = _merge_token_runs(events)
+    max_seq = max(int(ev["seq"]) for ev in events)
+    compact = {
+        "task_id": task_id,
+        "type": "compact",
+        "compact": True,
+        "seq": max_seq,
+        "events": events,
+        "text": "".join(ev.get("content") or "" for ev in events if ev.get("type") == "token"),
+        "created_at": docs[0].get("created_at", time.time()),
+        "compacted_at": time.time(),
+        "expire_at": stream_expire_at(),
+    }
+    db.streams.replace_one({"_id": f"compact:{task_id}"}, compact, upsert=True)
+    db.streams.delete_many({"task_id": task_id, "compact": {"$ne": True}, "seq": {"$lte": max_seq}})
+    return compact
+
+
+async def compact_stream_async(task_id: str) -> Optional[Dict[str, Any]]:
+    return await run_in_db(compact_stream, task_id)
+
+
+def cut_token_run(ev: Dict[str, Any], after_seq: int, *, keep_run: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Return the part of an event with seq > after_seq, or None if nothing is left. A token
+    run (with 'seq_from' and per-token 'sizes') that straddles after_seq is cut so that
+    only the content of later tokens remains. Unless keep_run is set, 'seq_from' and
+    'sizes' are dropped from the result, which is the shape sent to clients.
+    """
+    seq = int(ev.get("seq", 0))
+    if seq <= after_seq:
+        return None
+    if "seq_from" not in ev:
+        return ev
+    first = int(ev["seq_from"])
+    if first > after_seq and keep_run:
+        return ev
+    out = dict(ev) if keep_run else {k: v for k, v in ev.items() if k not in ("seq_from", "sizes")}
+    if ev.get("type") == "token" and first <= after_seq:
+        sizes = ev.get("sizes") or []
+        n = after_seq - first + 1
+        out["content"] = (ev.get("content") or "")[sum(sizes[:n]):]
+        if keep_run:
+            out["seq_from"] = after_seq + 1
+            out["sizes"] = list(sizes[n:])
+    return out
+
+
+def expand_stream_docs(docs: Iterable[Dict[str, Any]], after_seq: int = 0, *, keep_runs: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the stream events with seq > after_seq held by 'streams' documents, unpacking
+    compact documents. A token run that straddles after_seq is cut so that only the
+    content of later tokens is returned; keep_runs keeps the runs' 'seq_from' and 'sizes'
+    so that consumers can cut them again.
+    """
+    for doc in docs:
+        if not doc.get("compact"):
+            if int(doc.get("seq", 0)) > after_seq:
+                yield doc
+            continue
+        for ev in doc.get("events") or []:
+            out = cut_token_run(ev, after_seq, keep_run=keep_runs)
+            if out is not None:
+                yield dict(out, task_id=doc["task_id"])
+
+
+def load_stream_events(task_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+    """
+    Return the stored events of a task with seq > after_seq in seq order, whether or not
+    the task has been compacted.
+    """
+    docs = get_db().streams.find(
+        {"task_id": task_id, "seq": {"$gt": after_seq}},
+        projection={"_id": 0, "expire_at": 0},
+    ).sort("seq", ASCENDING)
+    return list(expand_stream_docs(docs, after_seq))
+
+
+async def load_stream_events_async(task_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+    return await run_in_db(load_stream_events, task_id, after_seq)
@@ -0,0 +1,134 @@
+"""
+Slow-consumer handling of stream subscribers: merged token runs must not repeat text the
+WebSocket pump already sent through the other queue, and tailer queues stay bounded.
+"""
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from orchestrallm.shared.eventbus.bus import RESYNC, SubscriberQueue
+from orchestrallm.shared.persistence.mongo import cut_token_run
+
+
+def _token(seq: int) -> Dict[str, Any]:
+    return {"task_id": "t1", "type": "token", "seq": seq, "content": f"<{seq}>"}
+
+
+def _text(first: int, last: int) -> str:
+    return "".join(f"<{s}>" for s in range(first, last + 1))
+
+
+def _pump(queue: asyncio.Queue, last_seq: int, sent: List[Dict[str, Any]]) -> int:
+    """
+    Drain a queue the way stream_ws' pump does, with last_seq shared between pumps.
+    """
+    while not queue.empty():
+        out = cut_token_run(queue.get_nowait(), last_seq)
+        if out is not None:
+            last_seq = int(out["seq"])
+            sent.append(out)
+    return last_seq
+
+
+def test_merged_run_is_cut_to_undelivered_tokens():
+    q = SubscriberQueue(maxsize=3, policy="merge")
+    for seq in range(1, 21):
+        q.offer(_token(seq))
+    assert q.qsize() <= 3 and q.overflows["merged"] > 0
+
+    # The tailer pump already delivered seqs 1..7, part of the first merged run.
+    sent: List[Dict[str, Any]] = [dict(_token(s)) for s in range(1, 8)]
+    last_seq = _pump(q, 7, sent)
+
+    assert last_seq == 20
+    assert "".join(e["content"] for e in sent) == _text(1, 20)
+    assert all("seq_from" not in e and "sizes" not in e for e in sent)
+
+
+def test_fully_delivered_run_is_dropped():
+    q = SubscriberQueue(maxsize=2, policy="merge")
+    for seq in range(1, 11):
+        q.offer(_token(seq))
+    sent: List[Dict[str, Any]] = []
+    assert _pump(q, 10, sent) == 10
+    assert sent == []
+
+
+def test_runs_merge_only_across_consecutive_seqs():
+    q = SubscriberQueue(maxsize=1, policy="merge")
+    q.offer(_token(1))
+    q.offer(_token(3))
+    # A gap cannot be described by seq_from/sizes: fall back to backfill.
+    assert q.get_nowait() is RESYNC and q.detached
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    import orchestrallm.shared.eventbus.tailer as tailer_mod
+
+    fake = mongomock.MongoClient().db
+    monkeypatch.setattr(tailer_mod, "get_db", lambda: fake)
+    return fake
+
+
+def _tailer(queue_size: int, overflow: str):
+    from orchestrallm.shared.eventbus.tailer import StreamTailer
+
+    return StreamTailer(interval_s=0.01, use_change_streams=False, queue_size=queue_size, overflow=overflow)
+
+
+async def _until(cond, timeout: float = 5.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not cond():
+        assert loop.time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_tailer_queue_is_bounded_and_merges(db):
+    async def main():
+        tailer = _tailer(4, "merge")
+        q = await tailer.subscribe("t1", 0)
+        db.streams.insert_many([_token(s) for s in range(1, 101)])
+        await _until(lambda: tailer._cursor.get("t1") == 100)
+        assert q.qsize() <= 4
+
+        # Meanwhile the bus pump delivered up to seq 30.
+        sent: List[Dict[str, Any]] = []
+        assert _pump(q, 30, sent) == 100
+        assert "".join(e["content"] for e in sent) == _text(31, 100)
+        await tailer.unsubscribe("t1", q)
+
+    asyncio.run(main())
+
+
+def test_tailer_keeps_compacted_runs_cuttable(db):
+    async def main():
+        tailer = _tailer(100, "merge")
+        q = await tailer.subscribe("t1", 0)
+        run = {"type": "token", "seq_from": 1, "seq": 5, "content": _text(1, 5), "sizes": [3] * 5}
+        db.streams.insert_one({"task_id": "t1", "compact": True, "seq": 6, "events": [run, {"type": "done", "seq": 6}]})
+        await _until(lambda: tailer._cursor.get("t1") == 6)
+
+        sent: List[Dict[str, Any]] = []
+        assert _pump(q, 3, sent) == 6
+        assert [(e["type"], e.get("content")) for e in sent] == [("token", _text(4, 5)), ("done", None)]
+        await tailer.unsubscribe("t1", q)
+
+    asyncio.run(main())
+
+
+def test_tailer_queue_applies_backfill_policy(db):
+    async def main():
+        tailer = _tailer(2, "backfill")
+        q = await tailer.subscribe("t1", 0)
+        db.streams.insert_many([{"task_id": "t1", "type": "status", "seq": s, "message": "x"} for s in range(1, 6)])
+        await _until(lambda: tailer._cursor.get("t1") == 5)
+        assert q.get_nowait() is RESYNC
+        assert q.detached and q.dropped_through == 5
+        assert q.reattach(5)
+        await tailer.unsubscribe("t1", q)
+
+    asyncio.run(main())
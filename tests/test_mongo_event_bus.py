@@ -0,0 +1,188 @@
+"""
+Cross-worker delivery of MongoEventBus: two bus instances (two "workers") relay events
+through a fake capped collection that mimics a tailable await cursor.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List
+
+import pytest
+from pymongo.errors import CollectionInvalid, CursorNotFound
+
+import orchestrallm.shared.eventbus.mongo_bus as mongo_bus
+from orchestrallm.shared.eventbus.mongo_bus import MongoEventBus
+
+
+class FakeCappedCollection:
+    def __init__(self) -> None:
+        self.docs: List[Dict[str, Any]] = []
+        self.cond = threading.Condition()
+        self.cursors: List["FakeTailableCursor"] = []
+        self.finds = 0
+
+    def insert_one(self, doc: Dict[str, Any]) -> None:
+        self.insert_many([doc])
+
+    def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = True) -> None:
+        with self.cond:
+            self.docs.extend(dict(d) for d in docs)
+            self.cond.notify_all()
+
+    def find(self, flt: Dict[str, Any], cursor_type: Any = None) -> "FakeTailableCursor":
+        self.finds += 1
+        cursor = FakeTailableCursor(self, float(flt["ts"]["$gte"]))
+        self.cursors.append(cursor)
+        return cursor
+
+    def kill_cursors(self) -> None:
+        with self.cond:
+            for c in self.cursors:
+                c.killed = True
+            self.cond.notify_all()
+
+
+class FakeTailableCursor:
+    def __init__(self, coll: FakeCappedCollection, min_ts: float) -> None:
+        self.coll = coll
+        self.min_ts = min_ts
+        self.pos = 0
+        self.alive = True
+        self.killed = False
+        self.await_s = 0.5
+
+    def max_await_time_ms(self, ms: int) -> "FakeTailableCursor":
+        self.await_s = ms / 1000.0
+        return self
+
+    def __iter__(self):
+        with self.coll.cond:
+            if self.pos >= len(self.coll.docs) and not self.killed:
+                self.coll.cond.wait(self.await_s)
+            if self.killed:
+                self.alive = False
+                raise CursorNotFound("cursor killed")
+            docs, self.pos = self.coll.docs[self.pos:], len(self.coll.docs)
+        return iter([d for d in docs if float(d.get("ts", 0.0)) >= self.min_ts])
+
+
+class FakeDB:
+    def __init__(self) -> None:
+        self.collections: Dict[str, FakeCappedCollection] = {}
+
+    def create_collection(self, name: str, **kwargs: Any) -> FakeCappedCollection:
+        if name in self.collections:
+            raise CollectionInvalid(f"collection {name} already exists")
+        self.collections[name] = FakeCappedCollection()
+        return self.collections[name]
+
+    def __getitem__(self, name: str) -> FakeCappedCollection:
+        return self.collections.setdefault(name, FakeCappedCollection())
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(mongo_bus, "get_db", lambda: fake)
+    monkeypatch.setattr(mongo_bus, "_RESTART_DELAY_S", 0.05)
+    return fake
+
+
+async def _collect(q: asyncio.Queue, last: int, after: int = 0, timeout: float = 5.0) -> List[Dict[str, Any]]:
+    """
+    Read events after seq `after` up to seq `last`, dropping re-delivered ones by seq like
+    the WebSocket pump.
+    """
+    out: List[Dict[str, Any]] = []
+    seen = after
+    deadline = time.monotonic() + timeout
+    while seen < last:
+        ev = await asyncio.wait_for(q.get(), timeout=max(0.01, deadline - time.monotonic()))
+        if ev["seq"] > seen:
+            seen = ev["seq"]
+            out.append(ev)
+    return out
+
+
+def _ev(task_id: str, seq: int) -> Dict[str, Any]:
+    return {"task_id": task_id, "type": "token", "seq": seq, "content": f"t{seq}"}
+
+
+async def _wait_ready(*buses: MongoEventBus) -> None:
+    for bus in buses:
+        await asyncio.to_thread(bus._ready.wait, 5.0)
+
+
+def test_relays_between_workers_in_order(db):
+    async def main():
+        a, b = MongoEventBus(), MongoEventBus()
+        try:
+            q = await b.subscribe("t1")
+            await a.subscribe("other")
+            await _wait_ready(a, b)
+            for seq in range(1, 201):
+                await a.publish(_ev("t1", seq))
+            got = await _collect(q, 200)
+            assert [e["seq"] for e in got] == list(range(1, 201))
+            assert a.relayed_out == 200 and b.relayed_in >= 200
+            # The publishing worker skips its own relayed events.
+            assert a.relayed_in == 0
+        finally:
+            await a.close()
+            await b.close()
+
+    asyncio.run(main())
+
+
+def test_resumes_after_cursor_restart(db):
+    async def main():
+        a, b = MongoEventBus(), MongoEventBus()
+        try:
+            q = await b.subscribe("t1")
+            await a.subscribe("other")
+            await _wait_ready(a, b)
+            for seq in range(1, 6):
+                await a.publish(_ev("t1", seq))
+            assert [e["seq"] for e in await _collect(q, 5)] == [1, 2, 3, 4, 5]
+
+            coll = db[b.collection]
+            finds = coll.finds
+            coll.kill_cursors()
+            # Published while b's cursor is dead, including one from a host whose clock
+            # lags behind b's last seen timestamp.
+            for seq in range(6, 9):
+                await a.publish(_ev("t1", seq))
+            while a.relayed_out < 8:
+                await asyncio.sleep(0.01)
+            coll.insert_one({"origin": "skewed-host", "ts": time.time() - 2.0, "ev": _ev("t1", 9)})
+            for seq in range(10, 13):
+                await a.publish(_ev("t1", seq))
+
+            got = await _collect(q, 12, after=5)
+            assert [e["seq"] for e in got] == list(range(6, 13))
+            assert coll.finds > finds
+        finally:
+            await a.close()
+            await b.close()
+
+    asyncio.run(main())
+
+
+def test_starts_lazily_per_process(db, monkeypatch):
+    async def main():
+        bus = MongoEventBus()
+        assert bus._threads == []
+        await bus.subscribe("t1")
+        assert [t.is_alive() for t in bus._threads] == [True, True]
+        origin = bus._origin
+        await bus.close()
+        assert bus._threads == []
+
+        # A forked worker inherits the object but not its threads: they start again there.
+        monkeypatch.setattr(mongo_bus.os, "getpid", lambda: -1)
+        await bus.publish(_ev("t1", 1))
+        assert bus._pid == -1 and bus._origin != origin
+        assert [t.is_alive() for t in bus._threads] == [True, True]
+        await bus.close()
+
+    asyncio.run(main())